@@ -0,0 +1,127 @@
+"""
+Alert counts, trends and distributions from one query over all alert tables.
+
+The Financial Alerts dashboard shows totals by type and status, daily counts
+for the last 30 days, the share of each alert type and the pattern deviation
+severities. All of them come from a single UNION ALL of per-table GROUP BYs,
+read in one round trip on one connection; the grouped result has a few
+hundred rows at most, and is split into each view without further scans.
+
+Summaries are cached with query_cache and recomputed only after the alert
+database changes.
+"""
+import logging
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import db_pool
+import query_cache
+
+logger = logging.getLogger(__name__)
+
+ALERTS_DB = "financial_alerts.db"
+ALERT_TABLES = (
+    "daily_balance_alerts",
+    "large_transaction_alerts",
+    "pattern_deviation_alerts",
+    "account_status_alerts"
+)
+ALERT_TYPE_NAMES = {
+    "daily_balance_alerts": "Daily Balance",
+    "large_transaction_alerts": "Large Transaction",
+    "pattern_deviation_alerts": "Pattern Deviation",
+    "account_status_alerts": "Account Status"
+}
+# Only pattern deviation alerts carry a severity
+SEVERITY_TABLE = "pattern_deviation_alerts"
+SEVERITY_ORDER = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+TREND_DAYS = 30
+
+
+def summary_query(tables=ALERT_TABLES):
+    """
+    UNION ALL of the per-table aggregates behind the dashboard.
+
+    Each row is (alert_type, dimension, value, count): counts by status for
+    every table, by day for the trend window, and by severity for pattern
+    deviation alerts. Status counts read the (status, timestamp) index and
+    trends seek the timestamp index (see schema_migrations.INDEXES), so no
+    branch sorts a whole table.
+    """
+    parts = []
+    for table in tables:
+        parts.append(f"""
+    SELECT '{table}' AS alert_type, 'status' AS dimension, status AS value, COUNT(*) AS count
+    FROM {table}
+    GROUP BY status""")
+        parts.append(f"""
+    SELECT '{table}', 'date', date(timestamp), COUNT(*)
+    FROM {table}
+    WHERE timestamp >= date('now', :trend_window)
+    GROUP BY date(timestamp)""")
+        if table == SEVERITY_TABLE:
+            parts.append(f"""
+    SELECT '{table}', 'severity', severity, COUNT(*)
+    FROM {table}
+    GROUP BY severity""")
+    return "\nUNION ALL".join(parts)
+
+
+def _summarize(grouped, tables):
+    by_status = grouped[grouped["dimension"] == "status"]
+    counts = {}
+    for table in tables:
+        rows = by_status[by_status["alert_type"] == table]
+        counts[table] = {
+            "total": int(rows["count"].sum()),
+            "status": {status: int(count) for status, count in zip(rows["value"], rows["count"])}
+        }
+
+    trends = grouped[grouped["dimension"] == "date"]
+    trends = pd.DataFrame({
+        "date": pd.to_datetime(trends["value"]),
+        "count": trends["count"],
+        "alert_type": trends["alert_type"]
+    }).reset_index(drop=True)
+
+    distribution = pd.DataFrame({
+        "alert_type": [ALERT_TYPE_NAMES.get(table, table) for table in tables],
+        "count": [counts[table]["total"] for table in tables]
+    })
+
+    severity = grouped[grouped["dimension"] == "severity"]
+    rank = {level: i for i, level in enumerate(SEVERITY_ORDER)}
+    order = severity["value"].map(lambda level: rank.get(level, len(rank)))
+    severity = pd.DataFrame({"severity": severity["value"], "count": severity["count"]})
+    severity = severity.iloc[order.argsort(kind="stable")].reset_index(drop=True)
+
+    return {
+        "counts": counts,
+        "trends": trends,
+        "distribution": distribution,
+        "severity": severity
+    }
+
+
+def alert_summary(db_file=ALERTS_DB, tables=ALERT_TABLES):
+    """
+    Counts by type and status, 30-day trends, type distribution and severities.
+
+    Returns a dict with "counts" ({table: {"total", "status"}}), "trends",
+    "distribution" and "severity" DataFrames.
+    """
+    # SQLite's 'now' is UTC, so the trend window moves at UTC midnight
+    return _read_summary(db_file, tuple(tables), datetime.now(timezone.utc).date())
+
+
+@query_cache.cached()
+def _read_summary(db_file, tables, utc_day):
+    conn = db_pool.connect(db_file)
+    try:
+        grouped = pd.read_sql_query(
+            summary_query(tables), conn, params={"trend_window": f"-{TREND_DAYS} day"}
+        )
+    finally:
+        conn.close()
+    return _summarize(grouped, tables)
@@ -0,0 +1,406 @@
+"""
+Incremental alert generation for the Financial Alerts page.
+
+Each generator keeps a watermark in monitor_state: the highest source row id
+it has already checked (transactions.id for large transaction and balance
+alerts, fraud_detection_results.id for pattern deviation and account status
+alerts). Both ids are AUTOINCREMENT, so new rows always land above it.
+
+A run attaches transactions.db and fraud_detection.db to the pooled
+financial_alerts.db connection. Each generator is then one INSERT ... SELECT
+over the id range above its watermark, joined against the alert tables
+inside SQLite, and its watermark moves in the same transaction. Ranges are
+taken BATCH_SIZE ids at a time, so a backlog of any size is worked through
+in bounded transactions. A run costs time in proportion to the new rows only.
+
+Balances are kept per account in account_balances and updated from the new
+transactions. Accounts with new activity are queued in pending_checks with
+each range, and low balance alerts are raised once every range is applied,
+against final balances, so the alerts don't depend on the batch size.
+Thresholds are bound as parameters from alert_settings, and
+generators marked inactive there are skipped.
+
+    python alert_engine.py
+    python alert_engine.py --accounts-db transactions.db --fraud-db fraud_detection.db
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import db_pool
+import schema_migrations
+
+logger = logging.getLogger(__name__)
+
+# Constants
+ALERTS_DB_FILE = "financial_alerts.db"
+ACCOUNTS_DB_FILE = "transactions.db"
+FRAUD_DB_FILE = "fraud_detection.db"
+FRAUD_TABLE = "fraud_detection_results"
+# Source ids checked per transaction
+BATCH_SIZE = 200000
+# Source rows older than this never raise alerts, as before
+LOOKBACK = "-30 day"
+# Suspicious results in the past week that restrict an account
+ACCOUNT_STATUS_MIN_SUSPICIOUS = 2
+
+# Alert databases already prepared by this process
+_prepared = set()
+
+ALERTS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS daily_balance_alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        account_id TEXT,
+        alert_type TEXT,
+        current_balance REAL,
+        threshold REAL,
+        status TEXT,
+        description TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS large_transaction_alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        account_id TEXT,
+        transaction_id TEXT,
+        amount REAL,
+        threshold REAL,
+        status TEXT,
+        description TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS pattern_deviation_alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        account_id TEXT,
+        deviation_type TEXT,
+        severity TEXT,
+        status TEXT,
+        description TEXT,
+        transaction_id TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS account_status_alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        account_id TEXT,
+        previous_status TEXT,
+        new_status TEXT,
+        reason TEXT,
+        status TEXT,
+        description TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS alert_settings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        alert_type TEXT UNIQUE,
+        threshold_value REAL,
+        is_active BOOLEAN,
+        last_updated TEXT
+    );
+
+    -- Highest source row already checked, per generator
+    CREATE TABLE IF NOT EXISTS monitor_state (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Running balance per account, up to the daily_balance watermark
+    CREATE TABLE IF NOT EXISTS account_balances (
+        account_id TEXT PRIMARY KEY,
+        balance REAL NOT NULL
+    );
+
+    -- Accounts a deferred generator still has to check, per generator
+    CREATE TABLE IF NOT EXISTS pending_checks (
+        name TEXT NOT NULL,
+        account_id TEXT NOT NULL,
+        PRIMARY KEY (name, account_id)
+    ) WITHOUT ROWID;
+"""
+
+DEFAULT_SETTINGS = {
+    "large_transaction": 10000.0,
+    "daily_balance": 1000.0,
+    "pattern_deviation": 0.8,
+    "account_status": 1.0
+}
+
+LARGE_TRANSACTION_SQL = """
+    INSERT INTO large_transaction_alerts
+        (timestamp, account_id, transaction_id, amount, threshold, status, description)
+    SELECT
+        t.timestamp, t.account_id, t.transaction_id, t.amount, :threshold, 'NEW',
+        printf('Large transaction of $%.2f exceeds threshold of $%.2f', t.amount, :threshold)
+    FROM accounts.transactions t
+    WHERE t.id > :low AND t.id <= :high
+      AND t.amount > :threshold
+      AND t.timestamp >= datetime('now', :lookback)
+      AND NOT EXISTS (
+          SELECT 1 FROM large_transaction_alerts a WHERE a.transaction_id = t.transaction_id
+      )
+"""
+
+PATTERN_DEVIATION_SQL = f"""
+    INSERT INTO pattern_deviation_alerts
+        (timestamp, account_id, transaction_id, deviation_type, severity, status, description)
+    SELECT
+        f.timestamp, f.account_id, f.transaction_id, 'SPENDING_PATTERN',
+        CASE
+            WHEN f.fraud_probability >= 0.9 THEN 'CRITICAL'
+            WHEN f.fraud_probability >= 0.7 THEN 'HIGH'
+            WHEN f.fraud_probability >= 0.5 THEN 'MEDIUM'
+            ELSE 'LOW'
+        END,
+        'NEW', 'Unusual spending pattern detected by fraud detection system'
+    FROM fraud.{FRAUD_TABLE} f
+    WHERE f.id > :low AND f.id <= :high
+      AND f.predicted_suspicious = 1
+      AND f.timestamp >= datetime('now', :lookback)
+      AND NOT EXISTS (
+          SELECT 1 FROM pattern_deviation_alerts a WHERE a.transaction_id = f.transaction_id
+      )
+"""
+
+UPDATE_BALANCES_SQL = """
+    INSERT INTO account_balances (account_id, balance)
+    SELECT account_id, SUM(amount)
+    FROM accounts.transactions
+    WHERE id > :low AND id <= :high
+    GROUP BY account_id
+    ON CONFLICT (account_id) DO UPDATE SET balance = balance + excluded.balance
+"""
+
+QUEUE_BALANCE_CHECKS_SQL = """
+    INSERT OR IGNORE INTO pending_checks (name, account_id)
+    SELECT DISTINCT 'daily_balance', account_id
+    FROM accounts.transactions
+    WHERE id > :low AND id <= :high
+"""
+
+# Run once all ranges are applied, so each queued account is checked against its final balance
+DAILY_BALANCE_SQL = """
+    INSERT INTO daily_balance_alerts
+        (timestamp, account_id, alert_type, current_balance, threshold, status, description)
+    SELECT
+        :now, b.account_id, 'LOW_BALANCE', b.balance, :threshold, 'NEW',
+        printf('Account balance ($%.2f) is below threshold ($%.2f)', b.balance, :threshold)
+    FROM pending_checks n
+    JOIN account_balances b ON b.account_id = n.account_id
+    WHERE n.name = 'daily_balance'
+      AND b.balance < :threshold
+      AND NOT EXISTS (
+          SELECT 1 FROM daily_balance_alerts a
+          WHERE a.account_id = b.account_id AND a.timestamp >= :day_ago
+      )
+"""
+
+ACCOUNT_STATUS_SQL = f"""
+    INSERT INTO account_status_alerts
+        (timestamp, account_id, previous_status, new_status, reason, status, description)
+    SELECT
+        :now, s.account_id, 'ACTIVE', 'RESTRICTED',
+        printf('Multiple limit violations (%d in past week)', s.violation_count), 'NEW',
+        printf('Account restricted due to %d limit violations in the past week', s.violation_count)
+    FROM (
+        SELECT f.account_id, COUNT(*) AS violation_count
+        FROM (
+            SELECT DISTINCT account_id FROM fraud.{FRAUD_TABLE}
+            WHERE id > :low AND id <= :high AND predicted_suspicious = 1
+        ) n
+        JOIN fraud.{FRAUD_TABLE} f ON f.account_id = n.account_id
+        WHERE f.predicted_suspicious = 1
+          AND f.timestamp >= datetime('now', '-7 day')
+          AND f.id <= :high
+        GROUP BY f.account_id
+        HAVING COUNT(*) >= :min_count
+    ) s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM account_status_alerts a
+        WHERE a.account_id = s.account_id AND a.timestamp >= :week_ago
+    )
+"""
+
+# (generator, attached source, source table, statements run per id range,
+# deferred statement). Without a deferred statement the alert count is the
+# rowcount of the last per-range statement; with one, the per-range
+# statements queue accounts in pending_checks and the deferred statement
+# raises the alerts once the ranges are caught up.
+GENERATORS = (
+    ("large_transaction", "accounts", "transactions", (LARGE_TRANSACTION_SQL,), None),
+    ("pattern_deviation", "fraud", FRAUD_TABLE, (PATTERN_DEVIATION_SQL,), None),
+    ("daily_balance", "accounts", "transactions", (UPDATE_BALANCES_SQL, QUEUE_BALANCE_CHECKS_SQL), DAILY_BALANCE_SQL),
+    ("account_status", "fraud", FRAUD_TABLE, (ACCOUNT_STATUS_SQL,), None)
+)
+
+
+def ensure_schema(conn):
+    """Create the alert tables and default settings if they don't exist"""
+    conn.executescript(ALERTS_SCHEMA)
+    # Pattern deviation alerts predate their transaction_id column
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(pattern_deviation_alerts)")}
+    if "transaction_id" not in columns:
+        conn.execute("ALTER TABLE pattern_deviation_alerts ADD COLUMN transaction_id TEXT")
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    conn.executemany(
+        "INSERT OR IGNORE INTO alert_settings (alert_type, threshold_value, is_active, last_updated) "
+        "VALUES (?, ?, 1, ?)",
+        [(alert_type, threshold, now) for alert_type, threshold in DEFAULT_SETTINGS.items()]
+    )
+    conn.commit()
+
+
+def prepare(alerts_db=ALERTS_DB_FILE):
+    """Create the alert tables and their indexes, once per database file"""
+    path = os.path.abspath(alerts_db)
+    if path in _prepared:
+        return
+    conn = db_pool.connect(alerts_db)
+    try:
+        ensure_schema(conn)
+        schema_migrations.ensure_indexes(conn, "alerts")
+    finally:
+        conn.close()
+    _prepared.add(path)
+
+
+def read_settings(conn):
+    """(threshold, is_active) per alert type from alert_settings"""
+    settings = {alert_type: (threshold, True) for alert_type, threshold in DEFAULT_SETTINGS.items()}
+    for alert_type, threshold, is_active in conn.execute(
+        "SELECT alert_type, threshold_value, is_active FROM alert_settings"
+    ):
+        if alert_type in settings:
+            default = settings[alert_type][0]
+            settings[alert_type] = (default if threshold is None else threshold, bool(is_active))
+    return settings
+
+
+def _watermark(conn, name):
+    row = conn.execute("SELECT last_id FROM monitor_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def _source_high(conn, alias, table):
+    exists = conn.execute(
+        f"SELECT 1 FROM {alias}.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    if exists is None:
+        return None
+    return conn.execute(f"SELECT MAX(id) FROM {alias}.{table}").fetchone()[0]
+
+
+def _params(low, high, threshold):
+    now = datetime.now()
+    return {
+        "low": low,
+        "high": high,
+        "threshold": threshold,
+        "lookback": LOOKBACK,
+        "now": now.strftime('%Y-%m-%d %H:%M:%S'),
+        "day_ago": (now - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S'),
+        "week_ago": (now - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S'),
+        "min_count": ACCOUNT_STATUS_MIN_SUSPICIOUS
+    }
+
+
+def run(alerts_db=ALERTS_DB_FILE, accounts_db=ACCOUNTS_DB_FILE, fraud_db=FRAUD_DB_FILE, batch_size=BATCH_SIZE):
+    """
+    Raise alerts for source rows added since the last run.
+
+    Returns a dict with the number of alerts raised per generator, their
+    "total", the rows checked per generator under "checked" and the
+    elapsed time.
+    """
+    start = time.perf_counter()
+    stats = {name: 0 for name, *_ in GENERATORS}
+    stats["checked"] = {name: 0 for name, *_ in GENERATORS}
+
+    # Sources that don't exist yet are skipped rather than created empty by ATTACH
+    sources = {alias: db_file for alias, db_file in (("accounts", accounts_db), ("fraud", fraud_db))
+               if os.path.exists(db_file)}
+    if "fraud" in sources:
+        schema_migrations.migrate(fraud_db, "fraud")
+
+    prepare(alerts_db)
+    conn = db_pool.connect(alerts_db)
+    try:
+        settings = read_settings(conn)
+        for alias, db_file in sources.items():
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (db_file,))
+        try:
+            for name, alias, table, statements, deferred in GENERATORS:
+                threshold, active = settings[name]
+                if not active or alias not in sources:
+                    continue
+                low = _watermark(conn, name)
+                high = _source_high(conn, alias, table)
+                while high is not None and low < high:
+                    batch_high = min(low + batch_size, high)
+                    params = _params(low, batch_high, threshold)
+                    # Alerts and the watermark commit together, so a failed batch is simply repeated
+                    try:
+                        for statement in statements:
+                            cursor = conn.execute(statement, params)
+                        raised = cursor.rowcount
+                        conn.execute("""
+                            INSERT INTO monitor_state (name, last_id, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+                            ON CONFLICT (name) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+                        """, (name, batch_high))
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    if deferred is None:
+                        stats[name] += raised
+                    stats["checked"][name] += batch_high - low
+                    low = batch_high
+
+                if deferred is not None:
+                    # Also picks up accounts queued by an earlier run that stopped before this step
+                    try:
+                        raised = conn.execute(deferred, _params(low, low, threshold)).rowcount
+                        conn.execute("DELETE FROM pending_checks WHERE name = ?", (name,))
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    stats[name] += raised
+        finally:
+            for alias in sources:
+                conn.execute(f"DETACH DATABASE {alias}")
+    finally:
+        conn.close()
+
+    stats["total"] = sum(stats[name] for name, *_ in GENERATORS)
+    stats["elapsed_seconds"] = time.perf_counter() - start
+    logger.info(f"Raised {stats['total']} alerts in {stats['elapsed_seconds']:.2f}s")
+    return stats
+
+
+def main(argv=None):
+    """Command line entry point for scheduled alert runs"""
+    parser = argparse.ArgumentParser(description="Raise alerts for newly ingested transactions and fraud results")
+    parser.add_argument("--alerts-db", default=ALERTS_DB_FILE, help=f"Alerts database (default: {ALERTS_DB_FILE})")
+    parser.add_argument("--accounts-db", default=ACCOUNTS_DB_FILE,
+                        help=f"Multiple Accounts database (default: {ACCOUNTS_DB_FILE})")
+    parser.add_argument("--fraud-db", default=FRAUD_DB_FILE, help=f"Fraud detection database (default: {FRAUD_DB_FILE})")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Source ids checked per transaction (default: {BATCH_SIZE})")
+    args = parser.parse_args(argv)
+
+    stats = run(args.alerts_db, args.accounts_db, args.fraud_db, args.batch_size)
+    print(f"Raised {stats['total']:,} alerts in {stats['elapsed_seconds']:.2f}s:")
+    for name, *_ in GENERATORS:
+        print(f"- {stats[name]:,} {name.replace('_', ' ')} alerts ({stats['checked'][name]:,} source rows checked)")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
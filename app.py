@@ -1,9 +1,11 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+import db_pool
+import kpi_engine
+import query_cache
 from auth import login_page, require_auth
 from theme_utils import apply_custom_theme
 from streamlit_config import use_default_navigation
@@ -17,31 +19,12 @@ DBS = {
 }
 
 # Helper functions
-def fetch_metric(db_file, query):
-    try:
-        conn = sqlite3.connect(db_file)
-        cur = conn.cursor()
-        cur.execute(query)
-        result = cur.fetchone()
-        conn.close()
-        return result[0] if result else 0
-    except Exception as e:
-        return f"Error: {e}"
-
-def fetch_date_range(db_file, table, date_column="timestamp"):
-    try:
-        conn = sqlite3.connect(db_file)
-        df = pd.read_sql_query(f"SELECT MIN({date_column}), MAX({date_column}) FROM {table}", conn)
-        conn.close()
-        return df.iloc[0, 0], df.iloc[0, 1]
-    except:
-        return None, None
-        
 # Helper function to fetch time series data for visualizations
+@query_cache.cached()
 def fetch_time_series_data(db_file, query):
     """Fetch time series data for charts"""
     try:
-        conn = sqlite3.connect(db_file)
+        conn = db_pool.connect(db_file)
         df = pd.read_sql_query(query, conn)
         conn.close()
         return df
@@ -49,33 +32,6 @@ def fetch_time_series_data(db_file, query):
         st.error(f"Error fetching time series data: {str(e)}")
         return pd.DataFrame()
 
-# Helper function to calculate KPI trends
-def calculate_kpi_trend(db_file, query_current, query_previous):
-    """Calculate KPI trend (current vs previous period)"""
-    try:
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-        
-        # Current period value
-        cursor.execute(query_current)
-        current = cursor.fetchone()[0] or 0
-        
-        # Previous period value
-        cursor.execute(query_previous)
-        previous = cursor.fetchone()[0] or 0
-        
-        conn.close()
-        
-        if previous == 0:
-            # Avoid division by zero
-            percent_change = 100 if current > 0 else 0
-        else:
-            percent_change = ((current - previous) / previous) * 100
-            
-        return current, percent_change
-    except Exception as e:
-        return 0, 0
-
 # Page layout with hidden sidebar
 st.set_page_config(page_title="📊 Unified Financial Dashboard", layout="wide", menu_items=None)
 
@@ -87,7 +43,7 @@ remove_streamlit_sidebar()
 def get_system_users():
     """Get system users statistics from the database"""
     try:
-        conn = sqlite3.connect("fraud_detection.db")
+        conn = db_pool.connect("fraud_detection.db")
         cursor = conn.cursor()
         
         # Get total users
@@ -823,28 +779,24 @@ if is_authenticated:
     st.markdown('<div class="metrics-overview">', unsafe_allow_html=True)
     metrics_cols = st.columns([1,1,1,1])
     
+    # All dashboard metrics: one aggregate query per database, run concurrently
+    kpis = kpi_engine.fetch_dashboard_kpis(
+        DBS["Accounts Analysis"], DBS["Limit Monitoring"], DBS["Fraud Detection"]
+    )
+    accounts_kpis, limits_kpis, fraud_kpis = kpis["accounts"], kpis["limits"], kpis["fraud"]
+    
     # --- Transactions.db ---
     with metrics_cols[0]:
-        total_tx = fetch_metric(DBS["Accounts Analysis"], "SELECT COUNT(*) FROM transactions")
-        unique_individuals = fetch_metric(DBS["Accounts Analysis"], "SELECT COUNT(DISTINCT individual_id) FROM transactions")
-        total_amt = fetch_metric(DBS["Accounts Analysis"], "SELECT SUM(amount) FROM transactions")
+        total_tx = accounts_kpis["total_tx"]
+        unique_individuals = accounts_kpis["unique_individuals"]
+        total_amt = accounts_kpis["total_amount"]
         
         # Format the total amount correctly
         formatted_amount = f"${total_amt:,.2f}" if isinstance(total_amt, (int, float)) else "$0.00"
         
-        # Get current month stats
-        current_month = datetime.now().strftime("%Y-%m")
-        current_month_tx = fetch_metric(
-            DBS["Accounts Analysis"], 
-            f"SELECT COUNT(*) FROM transactions WHERE strftime('%Y-%m', timestamp) = '{current_month}'"
-        )
-        
-        # Calculate month-over-month change
-        previous_month = (datetime.now() - timedelta(days=30)).strftime("%Y-%m")
-        previous_month_tx = fetch_metric(
-            DBS["Accounts Analysis"], 
-            f"SELECT COUNT(*) FROM transactions WHERE strftime('%Y-%m', timestamp) = '{previous_month}'"
-        )
+        # Current and previous month stats
+        current_month_tx = accounts_kpis["current_month_tx"]
+        previous_month_tx = accounts_kpis["previous_month_tx"]
         
         # Calculate percent change
         if previous_month_tx > 0:
@@ -893,19 +845,13 @@ if is_authenticated:
     
     # --- transaction_monitoring.db ---
     with metrics_cols[1]:
-        violations = fetch_metric(DBS["Limit Monitoring"], "SELECT COUNT(*) FROM violations")
-        files = fetch_metric(DBS["Limit Monitoring"], "SELECT COUNT(*) FROM uploaded_files")
-        settings = fetch_metric(DBS["Limit Monitoring"], "SELECT COUNT(*) FROM settings")
+        violations = limits_kpis["violations"]
+        files = limits_kpis["files"]
+        settings = limits_kpis["settings"]
         
         # Calculate day-to-day change in violations
-        violations_today = fetch_metric(
-            DBS["Limit Monitoring"],
-            "SELECT COUNT(*) FROM violations WHERE DATE(timestamp) = DATE('now')"
-        )
-        violations_yesterday = fetch_metric(
-            DBS["Limit Monitoring"],
-            "SELECT COUNT(*) FROM violations WHERE DATE(timestamp) = DATE('now', '-1 day')"
-        )
+        violations_today = limits_kpis["violations_today"]
+        violations_yesterday = limits_kpis["violations_yesterday"]
         
         # Ensure we're working with numbers for calculation
         try:
@@ -960,9 +906,9 @@ if is_authenticated:
     
     # --- fraud_detection.db ---
     with metrics_cols[2]:
-        frauds = fetch_metric(DBS["Fraud Detection"], "SELECT COUNT(*) FROM fraud_detection_results")
-        suspicious = fetch_metric(DBS["Fraud Detection"], "SELECT COUNT(*) FROM fraud_detection_results WHERE predicted_suspicious = 1")
-        users = fetch_metric(DBS["Fraud Detection"], "SELECT COUNT(*) FROM users")
+        frauds = fraud_kpis["analyses"]
+        suspicious = fraud_kpis["suspicious"]
+        users = fraud_kpis["users"]
         
         # Calculate fraud detection rate
         detection_rate = 0
@@ -970,14 +916,8 @@ if is_authenticated:
             detection_rate = (suspicious / frauds) * 100
             
         # Get recent trend in fraud detection
-        recent_suspicious = fetch_metric(
-            DBS["Fraud Detection"], 
-            "SELECT COUNT(*) FROM fraud_detection_results WHERE predicted_suspicious = 1 AND date(timestamp) >= date('now', '-7 day')"
-        )
-        previous_suspicious = fetch_metric(
-            DBS["Fraud Detection"], 
-            "SELECT COUNT(*) FROM fraud_detection_results WHERE predicted_suspicious = 1 AND date(timestamp) BETWEEN date('now', '-14 day') AND date('now', '-8 day')"
-        )
+        recent_suspicious = fraud_kpis["recent_suspicious"]
+        previous_suspicious = fraud_kpis["previous_suspicious"]
         
         # Calculate week-over-week change
         if previous_suspicious > 0:
@@ -1085,7 +1025,7 @@ if is_authenticated:
     date_cols = st.columns(3)
     
     with date_cols[0]:
-        s, e = fetch_date_range(DBS["Accounts Analysis"], "transactions")
+        s, e = accounts_kpis["first_timestamp"], accounts_kpis["last_timestamp"]
         st.markdown(f"""
         <div class="timeline-card timeline-card-accounts">
             <div class="timeline-title timeline-title-accounts">Account Analysis Period</div>
@@ -1102,7 +1042,7 @@ if is_authenticated:
         """, unsafe_allow_html=True)
     
     with date_cols[1]:
-        s, e = fetch_date_range(DBS["Limit Monitoring"], "violations", "created_at")
+        s, e = limits_kpis["first_timestamp"], limits_kpis["last_timestamp"]
         st.markdown(f"""
         <div class="timeline-card timeline-card-limits">
             <div class="timeline-title timeline-title-limits">Limit Monitoring Period</div>
@@ -1119,7 +1059,7 @@ if is_authenticated:
         """, unsafe_allow_html=True)
     
     with date_cols[2]:
-        s, e = fetch_date_range(DBS["Fraud Detection"], "fraud_detection_results", "timestamp")
+        s, e = fraud_kpis["first_timestamp"], fraud_kpis["last_timestamp"]
         st.markdown(f"""
         <div class="timeline-card timeline-card-fraud">
             <div class="timeline-title timeline-title-fraud">Fraud Detection Period</div>
@@ -1226,20 +1166,8 @@ if is_authenticated:
     # -- KPI 1: Transaction Volume Trend --
     with kpi_cols[0]:
         # Calculate current month vs previous month transaction volume
-        current_query = f"""
-        SELECT COUNT(*) FROM transactions 
-        WHERE strftime('%Y-%m', timestamp) = strftime('%Y-%m', 'now')
-        """
-        previous_query = f"""
-        SELECT COUNT(*) FROM transactions 
-        WHERE strftime('%Y-%m', timestamp) = strftime('%Y-%m', datetime('now', '-1 month'))
-        """
-        
-        tx_count, tx_change = calculate_kpi_trend(
-            DBS["Accounts Analysis"], 
-            current_query, 
-            previous_query
-        )
+        tx_count = accounts_kpis["kpi_current_tx"]
+        tx_change = kpi_engine.trend_change(tx_count, accounts_kpis["kpi_previous_tx"])
         
         # Determine trend direction and icon
         if tx_change > 0:
@@ -1273,22 +1201,8 @@ if is_authenticated:
     # -- KPI 2: Fraud Detection Rate --
     with kpi_cols[1]:
         # Calculate current week vs previous week fraud detection rate
-        current_query = f"""
-        SELECT COUNT(*) FROM fraud_detection_results 
-        WHERE predicted_suspicious = 1
-        AND strftime('%Y-%W', timestamp) = strftime('%Y-%W', 'now')
-        """
-        previous_query = f"""
-        SELECT COUNT(*) FROM fraud_detection_results 
-        WHERE predicted_suspicious = 1
-        AND strftime('%Y-%W', timestamp) = strftime('%Y-%W', datetime('now', '-7 days'))
-        """
-        
-        fraud_count, fraud_change = calculate_kpi_trend(
-            DBS["Fraud Detection"], 
-            current_query, 
-            previous_query
-        )
+        fraud_count = fraud_kpis["kpi_current_suspicious"]
+        fraud_change = kpi_engine.trend_change(fraud_count, fraud_kpis["kpi_previous_suspicious"])
         
         # Determine trend direction and icon (for fraud, down is good)
         if fraud_change < 0:
@@ -1322,20 +1236,8 @@ if is_authenticated:
     # -- KPI 3: Limit Violation Rate --
     with kpi_cols[2]:
         # Calculate current week vs previous week violation rate
-        current_query = f"""
-        SELECT COUNT(*) FROM violations 
-        WHERE strftime('%Y-%W', created_at) = strftime('%Y-%W', 'now')
-        """
-        previous_query = f"""
-        SELECT COUNT(*) FROM violations 
-        WHERE strftime('%Y-%W', created_at) = strftime('%Y-%W', datetime('now', '-7 days'))
-        """
-        
-        violation_count, violation_change = calculate_kpi_trend(
-            DBS["Limit Monitoring"], 
-            current_query, 
-            previous_query
-        )
+        violation_count = limits_kpis["kpi_current_violations"]
+        violation_change = kpi_engine.trend_change(violation_count, limits_kpis["kpi_previous_violations"])
         
         # Determine trend direction and icon (for violations, down is good)
         if violation_change < 0:
@@ -1369,30 +1271,8 @@ if is_authenticated:
     # -- KPI 4: Multiple Accounts Detected --
     with kpi_cols[3]:
         # Calculate current month vs previous month multiple accounts
-        current_query = f"""
-        SELECT COUNT(DISTINCT individual_id) FROM transactions 
-        WHERE individual_id IN (
-            SELECT individual_id FROM transactions 
-            GROUP BY individual_id 
-            HAVING COUNT(DISTINCT bank_name) > 1
-        )
-        AND strftime('%Y-%m', timestamp) = strftime('%Y-%m', 'now')
-        """
-        previous_query = f"""
-        SELECT COUNT(DISTINCT individual_id) FROM transactions 
-        WHERE individual_id IN (
-            SELECT individual_id FROM transactions 
-            GROUP BY individual_id 
-            HAVING COUNT(DISTINCT bank_name) > 1
-        )
-        AND strftime('%Y-%m', timestamp) = strftime('%Y-%m', datetime('now', '-1 month'))
-        """
-        
-        multi_acct_count, multi_acct_change = calculate_kpi_trend(
-            DBS["Accounts Analysis"], 
-            current_query, 
-            previous_query
-        )
+        multi_acct_count = accounts_kpis["multi_bank_current"]
+        multi_acct_change = kpi_engine.trend_change(multi_acct_count, accounts_kpis["multi_bank_previous"])
         
         # Determine trend direction and icon
         if multi_acct_change > 0:
@@ -1434,9 +1314,8 @@ if is_authenticated:
         try:
             # Get transaction volume by bank
             query = """
-            SELECT bank_name, COUNT(*) as transaction_count
-            FROM transactions
-            GROUP BY bank_name
+            SELECT bank_name, tx_count as transaction_count
+            FROM bank_rollup
             ORDER BY transaction_count DESC
             LIMIT 10
             """
@@ -1524,12 +1403,14 @@ if is_authenticated:
             # Get fraud detection trend data
             query = """
             SELECT 
-                strftime('%Y-%m-%d', timestamp) as date,
-                COUNT(*) as total_analyzed,
-                SUM(CASE WHEN predicted_suspicious = 1 THEN 1 ELSE 0 END) as suspicious
-            FROM fraud_detection_results
-            GROUP BY date
-            ORDER BY date DESC
+                day as date,
+                SUM(tx_count) as total_analyzed,
+                SUM(CASE WHEN predicted_suspicious = 1 THEN tx_count ELSE 0 END) as suspicious
+            FROM fraud_day_rollup
+            WHERE day != ''
+            GROUP BY day
+            HAVING SUM(tx_count) > 0
+            ORDER BY day DESC
             LIMIT 14
             """
             
@@ -1802,10 +1683,9 @@ if is_authenticated:
             # Get accounts distribution data
             query = """
             SELECT 
-                COUNT(DISTINCT bank_name) as bank_count,
-                COUNT(DISTINCT individual_id) as individual_count
-            FROM transactions
-            GROUP BY individual_id
+                bank_count,
+                1 as individual_count
+            FROM individual_rollup
             """
             
             # Fetch data
@@ -1,5 +1,6 @@
 import streamlit as st
 import sqlite3
+import db_pool
 import hashlib
 import re
 from datetime import datetime
@@ -9,7 +10,7 @@ DB_FILE = "fraud_detection.db"
 
 def init_auth_database():
     """Initialize the authentication database if it doesn't exist"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = db_pool.connect(DB_FILE)
     cursor = conn.cursor()
     
     # Create users table if it doesn't exist
@@ -56,7 +57,7 @@ def validate_username(username):
         return False, "Username can only contain letters, numbers, and underscores"
     
     # Check if username already exists
-    conn = sqlite3.connect(DB_FILE)
+    conn = db_pool.connect(DB_FILE)
     cursor = conn.cursor()
     cursor.execute("SELECT username FROM users WHERE username = ?", (username,))
     exists = cursor.fetchone() is not None
@@ -82,7 +83,7 @@ def create_user(username, password, full_name, role="analyst"):
     password_hash = hash_password(password)
     
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = db_pool.connect(DB_FILE)
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO users (username, password_hash, full_name, role, last_login, is_active)
@@ -100,7 +101,7 @@ def authenticate_user(username, password):
     """Authenticate a user based on username and password"""
     password_hash = hash_password(password)
     
-    conn = sqlite3.connect(DB_FILE)
+    conn = db_pool.connect(DB_FILE)
     cursor = conn.cursor()
     cursor.execute('''
         SELECT id, username, full_name, role 
@@ -0,0 +1,170 @@
+"""
+Headless batch fraud scoring for scheduled runs.
+
+Scores a CSV, Parquet or Arrow IPC file, or a date range of the Multiple Accounts
+database, with the FraudDetector used by the Fraud Detection page, and
+stores the results in fraud_detection.db through DatabaseManager. Nothing
+on this path imports Streamlit.
+
+The input is streamed twice in chunks: once to build batch-wide aggregates
+merged with the stored feature history, and once to score and save. Memory
+depends on the chunk size and the number of distinct individual and period
+keys (individuals times days, weeks and months seen), not on the number of
+rows. Transactions already stored are skipped, so a run can be repeated.
+
+    python batch_score.py transactions.csv
+    python batch_score.py transactions.parquet --chunk-size 200000
+    python batch_score.py transactions.arrow
+    python batch_score.py --from-db transactions.db --start 2025-01-01 --end 2025-01-31
+"""
+import argparse
+import logging
+import sys
+import time
+
+import pandas as pd
+
+import db_pool
+from fraud_engine import DB_FILE, FRAUD_TABLE, MODEL_PATH, REQUIRED_COLUMNS, RESULT_COLUMNS, DatabaseManager, FraudDetector
+from ingest import DEFAULT_CHUNK_SIZE, iter_chunks
+
+logger = logging.getLogger(__name__)
+
+
+def iter_db_chunks(db_file, start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream transactions of a Multiple Accounts database in timestamp order.
+
+    start and end are inclusive dates (YYYY-MM-DD); either may be None.
+    Chunks are read by (timestamp, id) keyset, so each one is a single
+    index seek on the timestamp index.
+    """
+    clauses = []
+    params = []
+    if start:
+        clauses.append("timestamp >= date(?)")
+        params.append(start)
+    if end:
+        clauses.append("timestamp < date(?, '+1 day')")
+        params.append(end)
+
+    columns = ", ".join(REQUIRED_COLUMNS)
+    last = None
+    conn = db_pool.connect(db_file)
+    try:
+        while True:
+            page_clauses = list(clauses)
+            page_params = list(params)
+            if last is not None:
+                page_clauses.append("(timestamp, id) > (?, ?)")
+                page_params.extend(last)
+            query = f"SELECT id, {columns} FROM transactions"
+            if page_clauses:
+                query += " WHERE " + " AND ".join(page_clauses)
+            query += " ORDER BY timestamp, id LIMIT ?"
+            chunk = pd.read_sql_query(query, conn, params=page_params + [chunk_size])
+            if chunk.empty:
+                return
+            last = (chunk["timestamp"].iloc[-1], int(chunk["id"].iloc[-1]))
+            chunk = chunk.drop(columns="id")
+            chunk["timestamp"] = pd.to_datetime(chunk["timestamp"])
+            yield chunk
+            if len(chunk) < chunk_size:
+                return
+    finally:
+        conn.close()
+
+
+def chunk_source(source=None, from_db=None, start=None, end=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return a function that opens a fresh chunk iterator over the input"""
+    if from_db:
+        return lambda: iter_db_chunks(from_db, start, end, chunk_size)
+    return lambda: iter_chunks(source, required_columns=REQUIRED_COLUMNS, chunk_size=chunk_size)
+
+
+def score(open_chunks, db_file=DB_FILE, model_path=MODEL_PATH, save=True, progress_callback=None):
+    """
+    Score every chunk from open_chunks() and save the results.
+
+    progress_callback, if given, is called after each chunk with
+    (rows_done, rows_per_sec). Returns a dict of run statistics.
+    """
+    fraud_detector = FraudDetector(model_path)
+    if fraud_detector.pipeline is None:
+        raise RuntimeError(f"Fraud detection model could not be loaded from {model_path}")
+    db_manager = DatabaseManager(db_file)
+
+    start = time.perf_counter()
+    aggregates = fraud_detector.aggregate_batch(open_chunks(), history_db=db_file)
+    aggregate_seconds = time.perf_counter() - start
+
+    stats = {"rows": 0, "suspicious": 0, "saved": 0, "failed_chunks": 0}
+    for scored in fraud_detector.score_chunks(open_chunks(), aggregates):
+        stats["rows"] += len(scored)
+        stats["suspicious"] += int(scored["predicted_suspicious"].sum())
+        if save:
+            db_df = scored[RESULT_COLUMNS].copy()
+            db_df["timestamp"] = db_df["timestamp"].astype(str)
+            if db_manager.save_results(db_df, skip_existing=True):
+                stats["saved"] += db_manager.last_saved_count
+            else:
+                stats["failed_chunks"] += 1
+
+        if progress_callback is not None:
+            elapsed = time.perf_counter() - start
+            progress_callback(stats["rows"], stats["rows"] / elapsed if elapsed > 0 else 0.0)
+
+    stats["unknown_banks"] = fraud_detector.batch_oov_count
+    stats["aggregate_seconds"] = aggregate_seconds
+    stats["elapsed_seconds"] = time.perf_counter() - start
+    stats["rows_per_sec"] = stats["rows"] / stats["elapsed_seconds"] if stats["elapsed_seconds"] > 0 else 0.0
+    return stats
+
+
+def main(argv=None):
+    """Command line entry point for batch scoring"""
+    parser = argparse.ArgumentParser(description=f"Score transactions for fraud and store them in {FRAUD_TABLE}")
+    parser.add_argument("source", nargs="?", help="CSV, Parquet or Arrow file with " + ", ".join(REQUIRED_COLUMNS))
+    parser.add_argument("--from-db", metavar="DB", help="Score transactions from a Multiple Accounts database instead")
+    parser.add_argument("--start", help="First date to score with --from-db (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last date to score with --from-db (YYYY-MM-DD)")
+    parser.add_argument("--db", default=DB_FILE, help=f"Fraud results database (default: {DB_FILE})")
+    parser.add_argument("--model", default=MODEL_PATH, help=f"Model pipeline (default: {MODEL_PATH})")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Rows per chunk (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--dry-run", action="store_true", help="Score without saving results")
+    args = parser.parse_args(argv)
+
+    if bool(args.source) == bool(args.from_db):
+        parser.error("give either a source file or --from-db")
+    if (args.start or args.end) and not args.from_db:
+        parser.error("--start and --end only apply with --from-db")
+
+    open_chunks = chunk_source(args.source, args.from_db, args.start, args.end, args.chunk_size)
+
+    def report(rows_done, rows_per_sec):
+        print(f"{rows_done:,} rows scored ({rows_per_sec:,.0f} rows/sec)")
+
+    try:
+        stats = score(open_chunks, db_file=args.db, model_path=args.model, save=not args.dry_run,
+                      progress_callback=report)
+    except (ValueError, RuntimeError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    print(
+        f"Scored {stats['rows']:,} transactions in {stats['elapsed_seconds']:.2f}s "
+        f"({stats['rows_per_sec']:,.0f} rows/sec, {stats['aggregate_seconds']:.2f}s building aggregates): "
+        f"{stats['suspicious']:,} suspicious, {stats['saved']:,} new results saved"
+    )
+    if stats["unknown_banks"]:
+        print(f"{stats['unknown_banks']:,} transactions had a bank the model was not trained on")
+    if stats["failed_chunks"]:
+        print(f"{stats['failed_chunks']:,} chunks could not be saved; see the log", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
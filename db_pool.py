@@ -0,0 +1,192 @@
+"""
+Shared SQLite connection pool for all pages.
+
+Connections are kept open per database file and handed out again instead of
+running sqlite3.connect for every query. Each connection is configured with
+PRAGMAS once, when it is opened.
+
+db_pool.connect(db_file) is a drop-in replacement for sqlite3.connect:
+calling close() on the connection returns it to the pool. As with sqlite3,
+a "with conn:" block only commits or rolls back; it does not release the
+connection. Any open transaction is rolled back and row_factory is reset
+before the connection is reused.
+
+    with db_pool.connection(db_file) as conn:   # commit or rollback, then close()
+        conn.execute(...)
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Applied once to every new connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA temp_store=MEMORY"
+)
+# Idle connections kept per database file; extra ones are closed on return
+MAX_IDLE = 8
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that goes back to its pool when closed"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None
+        self._in_pool = False
+        self._checked_out_at = 0.0
+
+    def close(self):
+        if self._pool is None:
+            super().close()
+        else:
+            self._pool.checkin(self)
+
+
+class ConnectionPool:
+    """Thread-safe pool of connections to one SQLite database file"""
+
+    def __init__(self, db_file, max_idle=MAX_IDLE, pragmas=PRAGMAS):
+        self.db_file = db_file
+        self.max_idle = max_idle
+        self.pragmas = pragmas
+        self._idle = []
+        self._lock = threading.Lock()
+        self._stats = {
+            "opened": 0,
+            "reused": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "in_use": 0,
+            "checkout_seconds": 0.0,
+            "max_checkout_seconds": 0.0,
+            "returns": 0,
+            "held_seconds": 0.0,
+            "max_held_seconds": 0.0
+        }
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_file, factory=PooledConnection, check_same_thread=False)
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+    def _discard(self, conn):
+        conn._pool = None
+        try:
+            sqlite3.Connection.close(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Error closing pooled connection to {self.db_file}: {e}")
+        with self._lock:
+            self._stats["closed"] += 1
+
+    def checkout(self):
+        """Return an idle connection, opening a new one if none is available"""
+        start = time.perf_counter()
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+
+        reused = conn is not None
+        if conn is None:
+            conn = self._open()
+
+        conn._pool = self
+        conn._in_pool = False
+        conn._checked_out_at = time.perf_counter()
+        wait = conn._checked_out_at - start
+
+        with self._lock:
+            self._stats["reused" if reused else "opened"] += 1
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["checkout_seconds"] += wait
+            self._stats["max_checkout_seconds"] = max(self._stats["max_checkout_seconds"], wait)
+        return conn
+
+    def checkin(self, conn):
+        """Reset a connection and keep it for reuse, or close it if the pool is full"""
+        if conn._in_pool:
+            return
+        held = time.perf_counter() - conn._checked_out_at
+
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            healthy = False
+
+        with self._lock:
+            self._stats["in_use"] -= 1
+            self._stats["returns"] += 1
+            self._stats["held_seconds"] += held
+            self._stats["max_held_seconds"] = max(self._stats["max_held_seconds"], held)
+            keep = healthy and len(self._idle) < self.max_idle
+            if keep:
+                conn._in_pool = True
+                self._idle.append(conn)
+
+        if not keep:
+            self._discard(conn)
+
+    def metrics(self):
+        """Return pool counters plus average checkout and hold times in milliseconds"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle)
+        stats["avg_checkout_ms"] = stats["checkout_seconds"] / stats["checkouts"] * 1000 if stats["checkouts"] else 0.0
+        stats["avg_held_ms"] = stats["held_seconds"] / stats["returns"] * 1000 if stats["returns"] else 0.0
+        return stats
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+
+def get_pool(db_file):
+    """Return the pool for a database file, creating it on first use"""
+    key = os.path.abspath(db_file)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_file)
+            _pools[key] = pool
+        return pool
+
+
+def connect(db_file):
+    """Check out a pooled connection to db_file; close() returns it to the pool"""
+    return get_pool(db_file).checkout()
+
+
+@contextmanager
+def connection(db_file):
+    """Check out a pooled connection for one block: commit or roll back, then return it"""
+    conn = connect(db_file)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def pool_metrics():
+    """Return metrics for every pool, keyed by database file"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.db_file: pool.metrics() for pool in pools}
@@ -0,0 +1,75 @@
+"""
+Download formats for the pages' export buttons.
+
+CSV stays the default. Parquet and Arrow IPC (Feather v2) keep column
+types, are much smaller, and load straight into pandas or any Arrow-based
+tool without parsing text. render_download_buttons puts one download button
+per format next to each other.
+"""
+import io
+
+# Label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Arrow": ("arrow", "application/vnd.apache.arrow.file")
+}
+
+
+def to_csv(df):
+    """CSV bytes of df, without the index"""
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def to_parquet(df):
+    """Parquet bytes of df, without the index"""
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def to_arrow(df):
+    """Arrow IPC file (Feather v2) bytes of df"""
+    buffer = io.BytesIO()
+    df.reset_index(drop=True).to_feather(buffer)
+    return buffer.getvalue()
+
+
+WRITERS = {
+    "CSV": to_csv,
+    "Parquet": to_parquet,
+    "Arrow": to_arrow
+}
+
+
+def export_bytes(df, fmt):
+    """df in the given EXPORT_FORMATS format, as bytes"""
+    return WRITERS[fmt](df)
+
+
+def file_name(base, fmt):
+    """base with the extension of the given format"""
+    return f"{base}.{EXPORT_FORMATS[fmt][0]}"
+
+
+def render_download_buttons(df, base_name, key=None, formats=tuple(EXPORT_FORMATS)):
+    """
+    Show one download button per format for df, side by side.
+
+    key prefixes the widget keys when the same data is offered more than
+    once on a page.
+    """
+    # Imported here so the writers stay usable from headless scripts
+    import streamlit as st
+
+    columns = st.columns(len(formats))
+    for column, fmt in zip(columns, formats):
+        extension, mime = EXPORT_FORMATS[fmt]
+        with column:
+            st.download_button(
+                label=f"Download {fmt}",
+                data=export_bytes(df, fmt),
+                file_name=file_name(base_name, fmt),
+                mime=mime,
+                key=f"{key}_{extension}" if key else None
+            )
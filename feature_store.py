@@ -0,0 +1,350 @@
+"""
+Persistent per-individual aggregates for fraud detection features.
+
+Keeps running totals and transaction counts per individual for every day,
+week and month seen so far, plus the set of accounts each individual uses.
+Rows are applied once, when transactions are ingested into transactions.db
+(see ingest.bulk_save_transactions) or results are saved to
+fraud_detection.db, so scoring can look up prior history instead of
+regrouping whole batches. counted_transactions only guards against counting
+a transaction twice; whether a result is saved is up to the results table.
+
+Period keys are shared with FraudDetector.add_time_features: the ISO date,
+the ISO year and week ("2025-W07") and the year and month ("2025-02"), so
+the same week or month of different years never adds up.
+"""
+import logging
+import os
+
+import pandas as pd
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DB_FILE = "fraud_detection.db"
+PERIODS = ("daily", "weekly", "monthly")
+
+FEATURE_STORE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS individual_aggregates (
+        individual_id TEXT NOT NULL,
+        period TEXT NOT NULL,
+        period_key TEXT NOT NULL,
+        total REAL NOT NULL DEFAULT 0,
+        txn_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (individual_id, period, period_key)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS individual_accounts (
+        individual_id TEXT NOT NULL,
+        account_id TEXT NOT NULL,
+        PRIMARY KEY (individual_id, account_id)
+    ) WITHOUT ROWID;
+
+    -- Transactions already counted in the aggregates. This is not a record of
+    -- saved fraud results; that is the UNIQUE transaction_id of the results table.
+    CREATE TABLE IF NOT EXISTS counted_transactions (
+        transaction_id TEXT PRIMARY KEY
+    ) WITHOUT ROWID;
+
+    -- Key format and backfills applied to the store
+    CREATE TABLE IF NOT EXISTS feature_store_state (
+        name TEXT PRIMARY KEY
+    ) WITHOUT ROWID;
+"""
+
+# State row of the current period key format. Stores without it keyed weeks
+# and months without the year, and are cleared so they get rebuilt.
+KEY_FORMAT = "key_format:iso_year"
+
+# Per-connection temp tables, created with plain execute so that they never
+# commit a transaction the caller has open
+STAGING_TABLES = (
+    """
+    CREATE TEMP TABLE IF NOT EXISTS staging_features (
+        transaction_id TEXT PRIMARY KEY,
+        individual_id TEXT,
+        account_id TEXT,
+        amount REAL,
+        daily TEXT,
+        weekly TEXT,
+        monthly TEXT
+    )
+    """,
+    """
+    CREATE TEMP TABLE IF NOT EXISTS staging_ids (
+        transaction_id TEXT PRIMARY KEY
+    )
+    """,
+    """
+    CREATE TEMP TABLE IF NOT EXISTS staging_keys (
+        individual_id TEXT,
+        period TEXT,
+        period_key TEXT
+    )
+    """
+)
+
+# Accounts database whose transactions are backfilled along with the results
+ACCOUNTS_DB_FILE = "transactions.db"
+
+# Database files whose store schema this process has checked
+_ready = set()
+
+
+def _has_state(conn, name):
+    return conn.execute("SELECT 1 FROM feature_store_state WHERE name = ?", (name,)).fetchone() is not None
+
+
+def _database_path(conn):
+    return next(row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main")
+
+
+def ensure_staging(conn):
+    """Create this connection's staging tables if they don't exist"""
+    for statement in STAGING_TABLES:
+        conn.execute(statement)
+
+
+def ensure_schema(conn):
+    """
+    Create the feature store tables if they don't exist, clearing stores with old period keys.
+
+    Runs once per database file and process; commits.
+    """
+    path = _database_path(conn)
+    if path and path in _ready:
+        return
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "aggregated_transactions" in tables and "counted_transactions" not in tables:
+        conn.execute("ALTER TABLE aggregated_transactions RENAME TO counted_transactions")
+    conn.executescript(FEATURE_STORE_SCHEMA)
+    if not _has_state(conn, KEY_FORMAT):
+        conn.execute("DELETE FROM individual_aggregates")
+        conn.execute("DELETE FROM counted_transactions")
+        conn.execute("DELETE FROM feature_store_state")
+        conn.execute("INSERT INTO feature_store_state (name) VALUES (?)", (KEY_FORMAT,))
+    conn.commit()
+    if path:
+        _ready.add(path)
+
+
+def period_keys(timestamps):
+    """Return the daily, weekly and monthly keys for a Series of timestamps"""
+    timestamps = pd.to_datetime(timestamps)
+    iso = timestamps.dt.isocalendar()
+    return {
+        "daily": timestamps.dt.strftime("%Y-%m-%d"),
+        "weekly": iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2),
+        "monthly": timestamps.dt.strftime("%Y-%m")
+    }
+
+
+def connect(db_file=DB_FILE):
+    """Open a connection to the feature store, creating its tables if needed"""
+    conn = db_pool.connect(db_file)
+    ensure_schema(conn)
+    return conn
+
+
+def _connect(conn, db_file):
+    if conn is not None:
+        return conn, False
+    return connect(db_file), True
+
+
+def uncounted_mask(df, conn=None, db_file=DB_FILE):
+    """
+    Return a boolean Series marking rows of df not yet counted in the aggregates.
+
+    Only for double-count protection: ingested transactions are counted before
+    they are ever scored, so this says nothing about saved fraud results.
+    """
+    conn, close_conn = _connect(conn, db_file)
+    try:
+        ensure_staging(conn)
+        ids = df["transaction_id"].astype(str)
+        conn.execute("DELETE FROM staging_ids")
+        conn.executemany("INSERT OR IGNORE INTO staging_ids VALUES (?)", ((tid,) for tid in ids))
+        applied = {row[0] for row in conn.execute("""
+            SELECT s.transaction_id
+            FROM staging_ids s
+            JOIN counted_transactions a ON a.transaction_id = s.transaction_id
+        """)}
+        conn.execute("DELETE FROM staging_ids")
+        return ~ids.isin(applied)
+    finally:
+        if close_conn:
+            conn.close()
+
+
+def apply_transactions(df, conn=None, db_file=DB_FILE):
+    """
+    Add transactions to the stored aggregates.
+
+    Rows whose transaction_id was counted before are skipped, so a
+    transaction ingested and later scored and saved is counted once. The caller commits when a
+    connection is passed in. Returns the number of transactions applied.
+    """
+    conn, close_conn = _connect(conn, db_file)
+    try:
+        ensure_staging(conn)
+        keys = period_keys(df["timestamp"])
+        rows = zip(
+            df["transaction_id"].astype(str),
+            df["individual_id"].astype(str),
+            df["account_id"].astype(str),
+            pd.to_numeric(df["amount"]).astype(float),
+            keys["daily"],
+            keys["weekly"],
+            keys["monthly"]
+        )
+
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM staging_features")
+        cursor.executemany("INSERT OR IGNORE INTO staging_features VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        cursor.execute("""
+            DELETE FROM staging_features
+            WHERE transaction_id IN (SELECT transaction_id FROM counted_transactions)
+        """)
+
+        for period in PERIODS:
+            # WHERE true keeps the upsert from being parsed as a join constraint
+            cursor.execute(f"""
+                INSERT INTO individual_aggregates (individual_id, period, period_key, total, txn_count)
+                SELECT individual_id, '{period}', {period}, SUM(amount), COUNT(*)
+                FROM staging_features
+                WHERE true
+                GROUP BY individual_id, {period}
+                ON CONFLICT (individual_id, period, period_key) DO UPDATE SET
+                    total = total + excluded.total,
+                    txn_count = txn_count + excluded.txn_count
+            """)
+
+        cursor.execute("""
+            INSERT OR IGNORE INTO individual_accounts (individual_id, account_id)
+            SELECT DISTINCT individual_id, account_id FROM staging_features
+        """)
+        cursor.execute("""
+            INSERT INTO counted_transactions (transaction_id)
+            SELECT transaction_id FROM staging_features
+        """)
+        applied = cursor.rowcount
+        cursor.execute("DELETE FROM staging_features")
+
+        if close_conn:
+            conn.commit()
+        return applied
+    finally:
+        if close_conn:
+            conn.close()
+
+
+def merge_history(aggregates, conn=None, db_file=DB_FILE):
+    """
+    Add stored history to batch aggregates from FraudDetector.aggregate_batch.
+
+    Period totals and counts for every (individual, period) key in the batch
+    are increased by the stored values, and n_accounts becomes the number of
+    distinct accounts across the batch and the store. The batch aggregates
+    should only cover rows not yet counted (see uncounted_mask).
+    """
+    conn, close_conn = _connect(conn, db_file)
+    try:
+        ensure_staging(conn)
+        conn.execute("DELETE FROM staging_keys")
+        for period in PERIODS:
+            frame = aggregates[period]
+            conn.executemany(
+                "INSERT INTO staging_keys VALUES (?, ?, ?)",
+                zip(
+                    frame.index.get_level_values(0).astype(str),
+                    [period] * len(frame),
+                    frame.index.get_level_values(1).astype(str)
+                )
+            )
+
+        stored = pd.read_sql_query("""
+            SELECT s.individual_id, s.period, s.period_key, a.total, a.txn_count
+            FROM staging_keys s
+            JOIN individual_aggregates a
+              ON a.individual_id = s.individual_id
+             AND a.period = s.period
+             AND a.period_key = s.period_key
+        """, conn)
+
+        individuals = aggregates["account_pairs"]["individual_id"].unique()
+        conn.execute("DELETE FROM staging_keys")
+        conn.executemany("INSERT INTO staging_keys (individual_id) VALUES (?)", ((i,) for i in individuals))
+        stored_accounts = pd.read_sql_query("""
+            SELECT a.individual_id, a.account_id
+            FROM individual_accounts a
+            WHERE a.individual_id IN (SELECT individual_id FROM staging_keys)
+        """, conn)
+        conn.execute("DELETE FROM staging_keys")
+    finally:
+        if close_conn:
+            conn.close()
+
+    for period in PERIODS:
+        frame = aggregates[period]
+        history = stored[stored["period"] == period].set_index(["individual_id", "period_key"])
+        lookup = pd.MultiIndex.from_arrays([
+            frame.index.get_level_values(0).astype(str),
+            frame.index.get_level_values(1).astype(str)
+        ])
+        history = history.reindex(lookup)
+        frame = frame.copy()
+        frame["total"] = frame["total"].to_numpy() + history["total"].fillna(0).to_numpy()
+        frame["txn_count"] = frame["txn_count"].to_numpy() + history["txn_count"].fillna(0).to_numpy()
+        aggregates[period] = frame
+
+    account_pairs = pd.concat([aggregates["account_pairs"], stored_accounts], ignore_index=True).drop_duplicates()
+    aggregates["account_pairs"] = account_pairs
+    aggregates["n_accounts"] = account_pairs.groupby("individual_id")["account_id"].count()
+    logger.info(f"Merged stored history for {len(stored)} period totals and {len(stored_accounts)} accounts")
+    return aggregates
+
+
+def backfilled(table, conn=None, db_file=DB_FILE):
+    """Whether the rows of table have been counted in the store with the current key format"""
+    conn, close_conn = _connect(conn, db_file)
+    try:
+        return _has_state(conn, f"backfill:{table}")
+    finally:
+        if close_conn:
+            conn.close()
+
+
+def backfill(table, conn=None, db_file=DB_FILE, chunk_size=50000, source_db=None):
+    """
+    Apply every row of an existing table to the store, in chunks.
+
+    table is read from the store's own database, or from source_db when given
+    (the transactions table of the accounts database). A missing source_db
+    has nothing to backfill; later ingests feed the store directly.
+    """
+    conn, close_conn = _connect(conn, db_file)
+    applied = 0
+    source = None
+    try:
+        if source_db is not None and os.path.exists(source_db):
+            source = db_pool.connect(source_db)
+        readable = source_db is None or (source is not None and source.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone() is not None)
+        if readable:
+            query = f"SELECT transaction_id, individual_id, account_id, amount, timestamp FROM {table}"
+            for chunk in pd.read_sql_query(query, source or conn, chunksize=chunk_size):
+                applied += apply_transactions(chunk, conn=conn)
+                conn.commit()
+        conn.execute("INSERT OR IGNORE INTO feature_store_state (name) VALUES (?)", (f"backfill:{table}",))
+        conn.commit()
+    finally:
+        if source is not None:
+            source.close()
+        if close_conn:
+            conn.close()
+    logger.info(f"Backfilled feature store with {applied} transactions from {table}")
+    return applied
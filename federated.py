@@ -0,0 +1,263 @@
+"""
+Cross-module queries with all four databases attached to one connection.
+
+connect() checks out a pooled connection to transactions.db and attaches
+transaction_monitoring.db, fraud_detection.db and financial_alerts.db as
+limits, fraud and alerts. It also creates TEMP views that join them per
+individual, so a cross-module question is one SQL query that SQLite answers
+with the indexes of each file. Nothing is loaded into pandas before the join.
+
+    individual_transactions  transactions with their fraud score and review status
+    individual_violations    limit violations
+    individual_fraud_scores  fraud detection results
+    individual_alerts        alerts of every type on the individual's accounts
+    individual_summary       one row per individual with counts from every module
+
+Databases that don't exist yet are not attached (ATTACH would create them
+empty), and views over them are left out; the helpers then return empty
+results for that module. The first connect() of a process creates the
+transaction rollups and the per-individual indexes the views seek (see
+schema_migrations.INDEXES).
+"""
+import logging
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+
+import alert_analytics
+import db_pool
+import rollups
+import schema_migrations
+
+logger = logging.getLogger(__name__)
+
+# Database files by alias; "accounts" is the main database of the connection
+DATABASES = {
+    "accounts": "transactions.db",
+    "limits": "transaction_monitoring.db",
+    "fraud": "fraud_detection.db",
+    "alerts": "financial_alerts.db"
+}
+FRAUD_TABLE = "fraud_detection_results"
+ALERT_TABLES = alert_analytics.ALERT_TABLES
+
+# Tables each module contributes, as (schema, table)
+SOURCES = {
+    "transactions": ("main", "transactions"),
+    "accounts": ("main", "accounts"),
+    "rollup": ("main", "individual_rollup"),
+    "violations": ("limits", "violations"),
+    "fraud": ("fraud", FRAUD_TABLE)
+}
+
+# Database files already prepared by this process
+_prepared = set()
+
+
+def _alert_arms(tables):
+    # account_id is the only link from alerts to an individual; accounts maps it
+    return [
+        f"""
+        SELECT a.individual_id, '{table}' AS alert_table, x.id AS alert_id, x.timestamp,
+               x.account_id, x.status, x.description
+        FROM main.accounts a
+        JOIN alerts.{table} x ON x.account_id = a.account_id"""
+        for table in tables
+    ]
+
+
+def view_statements(available):
+    """
+    CREATE TEMP VIEW statements for the tables in available.
+
+    available is a set of (schema, table) pairs. Returns (view name, SQL)
+    pairs, leaving out views whose sources are missing.
+    """
+    has = {name: source in available for name, source in SOURCES.items()}
+    alert_tables = [table for table in ALERT_TABLES if ("alerts", table) in available]
+    has_alerts = has["accounts"] and bool(alert_tables)
+    views = []
+
+    if has["transactions"]:
+        if has["fraud"]:
+            views.append(("individual_transactions", f"""
+                CREATE TEMP VIEW individual_transactions AS
+                SELECT t.id, t.transaction_id, t.individual_id, t.account_id, t.bank_name, t.amount, t.timestamp,
+                       f.fraud_probability, f.predicted_suspicious, f.status AS review_status
+                FROM main.transactions t
+                LEFT JOIN fraud.{FRAUD_TABLE} f ON f.transaction_id = t.transaction_id
+            """))
+        else:
+            views.append(("individual_transactions", """
+                CREATE TEMP VIEW individual_transactions AS
+                SELECT t.id, t.transaction_id, t.individual_id, t.account_id, t.bank_name, t.amount, t.timestamp,
+                       NULL AS fraud_probability, NULL AS predicted_suspicious, NULL AS review_status
+                FROM main.transactions t
+            """))
+
+    if has["violations"]:
+        views.append(("individual_violations", """
+            CREATE TEMP VIEW individual_violations AS
+            SELECT individual_id, period_type, period_date, amount, limit_value, violation_type,
+                   num_accounts, num_banks, bank_names, account_ids, transaction_count, created_at
+            FROM limits.violations
+        """))
+
+    if has["fraud"]:
+        views.append(("individual_fraud_scores", f"""
+            CREATE TEMP VIEW individual_fraud_scores AS
+            SELECT individual_id, transaction_id, account_id, bank_name, amount, fraud_probability,
+                   predicted_suspicious, status, timestamp, processed_at
+            FROM fraud.{FRAUD_TABLE}
+        """))
+
+    if has_alerts:
+        views.append(("individual_alerts", """
+            CREATE TEMP VIEW individual_alerts AS""" + "\n        UNION ALL".join(_alert_arms(alert_tables))))
+
+    if has["rollup"]:
+        # Correlated per-individual subqueries, each one an index seek; the unary +
+        # keeps the planner off the predicted_suspicious index, which would scan
+        # every suspicious result once per individual
+        violations = (
+            "(SELECT COUNT(*) FROM limits.violations v WHERE v.individual_id = r.individual_id)"
+            if has["violations"] else "0"
+        )
+        suspicious = (
+            f"(SELECT COUNT(*) FROM fraud.{FRAUD_TABLE} f "
+            f"WHERE f.individual_id = r.individual_id AND +f.predicted_suspicious = 1)"
+            if has["fraud"] else "0"
+        )
+        max_probability = (
+            f"(SELECT MAX(f.fraud_probability) FROM fraud.{FRAUD_TABLE} f WHERE f.individual_id = r.individual_id)"
+            if has["fraud"] else "NULL"
+        )
+        alerts = " + ".join(
+            f"(SELECT COUNT(*) FROM main.accounts a JOIN alerts.{table} x ON x.account_id = a.account_id "
+            f"WHERE a.individual_id = r.individual_id)"
+            for table in alert_tables
+        ) if has_alerts else "0"
+        views.append(("individual_summary", f"""
+            CREATE TEMP VIEW individual_summary AS
+            SELECT r.individual_id, r.tx_count, r.total_amount, r.bank_count,
+                   {violations} AS violations,
+                   {suspicious} AS suspicious_transactions,
+                   {max_probability} AS max_fraud_probability,
+                   {alerts} AS alerts
+            FROM main.individual_rollup r
+        """))
+    return views
+
+
+def prepare(databases):
+    """Create the rollups and indexes the views rely on, once per database file"""
+    for key, db_file in databases.items():
+        path = os.path.abspath(db_file)
+        if path in _prepared or not os.path.exists(db_file):
+            continue
+        conn = db_pool.connect(db_file)
+        try:
+            if key == "accounts" and conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions'"
+            ).fetchone():
+                rollups.ensure_transaction_rollups(conn)
+            schema_migrations.ensure_indexes(conn, key)
+        finally:
+            conn.close()
+        _prepared.add(path)
+
+
+@contextmanager
+def connect(databases=None):
+    """
+    Pooled connection with all databases attached and the views created.
+
+    databases overrides entries of DATABASES. The views are dropped and the
+    databases detached before the connection goes back to the pool.
+    """
+    databases = dict(DATABASES, **(databases or {}))
+    prepare(databases)
+    conn = db_pool.connect(databases["accounts"])
+    attached = []
+    views = []
+    try:
+        for alias in ("limits", "fraud", "alerts"):
+            if os.path.exists(databases[alias]):
+                conn.execute(f"ATTACH DATABASE ? AS {alias}", (databases[alias],))
+                attached.append(alias)
+        available = {
+            (schema, name)
+            for schema in ["main"] + attached
+            for (name,) in conn.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'")
+        }
+        for name, statement in view_statements(available):
+            conn.execute(statement)
+            views.append(name)
+        yield conn
+    finally:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            for name in views:
+                conn.execute(f"DROP VIEW IF EXISTS temp.{name}")
+            for alias in attached:
+                conn.execute(f"DETACH DATABASE {alias}")
+        finally:
+            conn.close()
+
+
+def _view_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM temp.sqlite_master WHERE type = 'view' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def individual_profile(individual_id, databases=None):
+    """
+    Everything every module knows about one individual.
+
+    Returns a dict with the "summary" row (a dict, or None) and the
+    "transactions", "violations", "fraud_scores" and "alerts" DataFrames,
+    newest first.
+    """
+    queries = {
+        "transactions": ("individual_transactions", "timestamp DESC, id DESC"),
+        "violations": ("individual_violations", "created_at DESC"),
+        "fraud_scores": ("individual_fraud_scores", "timestamp DESC"),
+        "alerts": ("individual_alerts", "timestamp DESC")
+    }
+    profile = {}
+    with connect(databases) as conn:
+        for key, (view, order) in queries.items():
+            if _view_exists(conn, view):
+                profile[key] = pd.read_sql_query(
+                    f"SELECT * FROM {view} WHERE individual_id = ? ORDER BY {order}", conn, params=(individual_id,)
+                )
+            else:
+                profile[key] = pd.DataFrame()
+        summary = None
+        if _view_exists(conn, "individual_summary"):
+            cursor = conn.execute("SELECT * FROM individual_summary WHERE individual_id = ?", (individual_id,))
+            row = cursor.fetchone()
+            if row is not None:
+                summary = dict(zip([col[0] for col in cursor.description], row))
+    profile["summary"] = summary
+    return profile
+
+
+def individual_summaries(min_banks=1, limit=100, databases=None):
+    """
+    Individuals holding accounts at min_banks or more banks, riskiest first.
+
+    Risk orders by alerts, then violations, then suspicious transactions.
+    """
+    with connect(databases) as conn:
+        if not _view_exists(conn, "individual_summary"):
+            return pd.DataFrame()
+        return pd.read_sql_query("""
+            SELECT * FROM individual_summary
+            WHERE bank_count >= ?
+            ORDER BY alerts DESC, violations DESC, suspicious_transactions DESC, total_amount DESC
+            LIMIT ?
+        """, conn, params=(min_banks, limit))
@@ -0,0 +1,598 @@
+"""
+Fraud scoring and result storage, shared by the Fraud Detection page and
+the batch scorer.
+
+FraudDetector loads the model pipeline, builds the model features and scores
+transactions; DatabaseManager owns fraud_detection.db. Nothing here imports
+Streamlit, so headless jobs can use both classes directly.
+"""
+import logging
+import os
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import db_pool
+import feature_store
+import model_artifacts
+import model_registry
+import pagination
+import query_cache
+import rollups
+import schema_migrations
+import status_updates
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DB_FILE = "fraud_detection.db"
+FRAUD_TABLE = "fraud_detection_results"
+USER_TABLE = "users"
+PAGE_SIZE = 50  # Records per page
+MODEL_PATH = "fraud_detection_pipeline.pkl"
+REQUIRED_COLUMNS = ["transaction_id", "individual_id", "account_id", "bank_name", "amount", "timestamp"]
+PERIOD_KEYS = {"daily": "date", "weekly": "week", "monthly": "month"}
+# Model input columns, in the order the model was trained on
+MODEL_FEATURES = [
+    "amount", "bank_name", "hour", "weekday", 
+    "daily_total", "weekly_total", "monthly_total",
+    "daily_txn_count", "weekly_txn_count", "monthly_txn_count",
+    "n_accounts", "exceeds_daily", "exceeds_weekly", "exceeds_monthly",
+    "avg_amount_per_account_daily", "avg_amount_per_account_weekly", 
+    "avg_amount_per_account_monthly"
+]
+# Reserved code for banks the label encoder never saw. XGBoost treats NaN as a
+# missing value and sends it down each split's learned default branch.
+UNKNOWN_BANK_CODE = np.nan
+# Threads XGBoost may use for inference during batch scoring
+SCORING_THREADS = os.cpu_count() or 1
+# Columns standardized by the pipeline's scaler, in scaler order
+SCALED_FEATURES = [
+    "amount", "daily_total", "weekly_total", "monthly_total",
+    "daily_txn_count", "weekly_txn_count", "monthly_txn_count",
+    "n_accounts", "avg_amount_per_account_daily",
+    "avg_amount_per_account_weekly", "avg_amount_per_account_monthly"
+]
+# Chunks whose partial aggregates are kept before they are reduced into one
+AGGREGATE_REDUCE_EVERY = 16
+# Columns stored in the results table for each scored transaction
+RESULT_COLUMNS = [
+    "transaction_id", "individual_id", "account_id", "bank_name",
+    "amount", "daily_total", "weekly_total", "monthly_total",
+    "n_accounts", "fraud_probability", "predicted_suspicious", "timestamp"
+]
+
+# Database files already initialized by this process
+_initialized = set()
+
+# Database schema
+SCHEMA = {
+    FRAUD_TABLE: f"""
+    CREATE TABLE IF NOT EXISTS {FRAUD_TABLE} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        transaction_id TEXT UNIQUE,
+        individual_id TEXT,
+        account_id TEXT,
+        bank_name TEXT,
+        amount REAL,
+        daily_total REAL,
+        weekly_total REAL,
+        monthly_total REAL,
+        n_accounts INTEGER,
+        fraud_probability REAL,
+        predicted_suspicious INTEGER,
+        timestamp TEXT,
+        processed_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        analyst_notes TEXT,
+        status TEXT CHECK(status IN ('pending', 'reviewed', 'confirmed', 'false_positive')) DEFAULT 'pending'
+    )
+    """,
+    USER_TABLE: f"""
+    CREATE TABLE IF NOT EXISTS {USER_TABLE} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE,
+        password_hash TEXT,
+        full_name TEXT,
+        role TEXT CHECK(role IN ('analyst', 'supervisor', 'admin')),
+        last_login TEXT,
+        is_active INTEGER DEFAULT 1
+    )
+    """
+}
+
+# Type aliases
+DataFrame = pd.DataFrame
+
+
+class DatabaseManager:
+    """Handles all database operations with connection pooling and error handling."""
+    
+    def __init__(self, db_file: str = DB_FILE):
+        self.db_file = db_file
+        self.last_saved_count = 0
+        self._initialize_database()
+        
+    def _initialize_database(self) -> None:
+        """Initialize database with required tables, once per database file per process."""
+        path = os.path.abspath(self.db_file)
+        if path in _initialized:
+            return
+        try:
+            with self._connection() as conn:
+                for table, schema in SCHEMA.items():
+                    conn.execute(schema)
+                feature_store.ensure_schema(conn)
+                rollups.ensure_fraud_rollups(conn, FRAUD_TABLE)
+                schema_migrations.ensure_indexes(conn, "fraud")
+                conn.commit()
+                
+                # Seed the feature store from results saved and transactions ingested
+                # before it existed, or before it was rebuilt with the current period keys
+                if not feature_store.backfilled(FRAUD_TABLE, conn=conn):
+                    feature_store.backfill(FRAUD_TABLE, conn=conn)
+                if not feature_store.backfilled("transactions", conn=conn):
+                    feature_store.backfill("transactions", conn=conn, source_db=feature_store.ACCOUNTS_DB_FILE)
+            _initialized.add(path)
+            logger.info("Database initialized successfully")
+        except Exception as e:
+            logger.error(f"Database initialization failed: {str(e)}")
+            raise
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        """Check out a pooled connection; WAL and cache pragmas are set by the pool."""
+        conn = db_pool.connect(self.db_file)
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Pooled connection for one block: commits or rolls back, then goes back to the pool."""
+        conn = self._get_connection()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def execute_query(self, query: str, params: tuple = (), fetch: bool = False) -> Any:
+        """Execute a SQL query with error handling."""
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                conn.commit()
+                return cursor.fetchall() if fetch else None
+        except sqlite3.Error as e:
+            logger.error(f"Database error: {str(e)}")
+            raise
+    
+    def _stored_mask(self, conn: sqlite3.Connection, df: DataFrame) -> np.ndarray:
+        """Mark rows of df whose transaction_id is already in the results table."""
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS staging_result_ids (transaction_id TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM staging_result_ids")
+        ids = df["transaction_id"].astype(str)
+        conn.executemany("INSERT OR IGNORE INTO staging_result_ids VALUES (?)", ((tid,) for tid in ids))
+        stored = {row[0] for row in conn.execute(f"""
+            SELECT s.transaction_id
+            FROM staging_result_ids s
+            JOIN {FRAUD_TABLE} r ON r.transaction_id = s.transaction_id
+        """)}
+        conn.execute("DELETE FROM staging_result_ids")
+        return ids.isin(stored).to_numpy()
+    
+    def save_results(self, df: DataFrame, skip_existing: bool = False) -> bool:
+        """Save fraud detection results to database.
+        
+        The results and their feature store update commit in one transaction.
+        With skip_existing, transactions already in the results table are left
+        out instead of failing the whole batch on the unique transaction_id, so
+        scoring the same rows again is a no-op. last_saved_count is the number
+        of rows written.
+        """
+        self.last_saved_count = 0
+        try:
+            with self._connection() as conn:
+                if skip_existing:
+                    df = df[~self._stored_mask(conn, df)]
+                if not df.empty:
+                    columns = ", ".join(df.columns)
+                    placeholders = ", ".join("?" * len(df.columns))
+                    values = df.astype(object).where(df.notna(), None)
+                    conn.executemany(
+                        f"INSERT INTO {FRAUD_TABLE} ({columns}) VALUES ({placeholders})",
+                        values.itertuples(index=False, name=None)
+                    )
+                    feature_store.apply_transactions(df, conn=conn)
+            self.last_saved_count = len(df)
+            pagination.invalidate(self.db_file)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving results: {str(e)}")
+            return False
+    
+    def update_statuses(self, original: DataFrame, edited: DataFrame) -> int:
+        """Save the review statuses changed between original and edited, in one transaction.
+        
+        Both frames are keyed by transaction_id. Returns the number of results updated.
+        """
+        updates = status_updates.changed_rows(original, edited, key="transaction_id")
+        if updates.empty:
+            return 0
+        conn = self._get_connection()
+        try:
+            updated = status_updates.apply_updates(conn, FRAUD_TABLE, updates, key="transaction_id")
+        except sqlite3.Error as e:
+            logger.error(f"Database error: {str(e)}")
+            raise
+        finally:
+            conn.close()
+        pagination.invalidate(self.db_file)
+        return updated
+    
+    def get_paginated_results(self, filters: dict = None,
+                              cursor: Optional[Tuple[str, int]] = None) -> Tuple[DataFrame, Optional[int], Optional[Tuple[str, int]]]:
+        """Get one page of results with optional filters, starting after cursor.
+        
+        Returns the page, the total number of pages (None while a filtered
+        count is still being computed) and the cursor of the next page, or
+        None on the last page.
+        """
+        where_clauses = []
+        params = []
+        
+        if filters:
+            if filters.get("date_range"):
+                start_date, end_date = filters["date_range"]
+                # Half-open range on the raw column so the timestamp indexes apply
+                where_clauses.append("timestamp >= date(?) AND timestamp < date(?, '+1 day')")
+                params.extend([start_date, end_date])
+            if filters.get("status"):
+                where_clauses.append("status = ?")
+                params.append(filters["status"])
+            if filters.get("suspicious") is not None:
+                where_clauses.append("predicted_suspicious = ?")
+                params.append(int(filters["suspicious"]))
+            if filters.get("bank_filter"):
+                where_clauses.append("bank_name = ?")
+                params.append(filters["bank_filter"])
+        
+        try:
+            with self._connection() as conn:
+                df, next_cursor = pagination.fetch_page(
+                    conn, FRAUD_TABLE, where_clauses, params, cursor=cursor, page_size=PAGE_SIZE
+                )
+                
+                # Totals by suspicious flag and by status are exact in the
+                # rollups; other filters use a count refreshed in the background
+                if not where_clauses or where_clauses == ["predicted_suspicious = ?"]:
+                    total_records = conn.execute(
+                        "SELECT COALESCE(SUM(tx_count), 0) FROM fraud_day_rollup"
+                        + (" WHERE predicted_suspicious = ?" if where_clauses else ""),
+                        params
+                    ).fetchone()[0]
+                elif where_clauses == ["status = ?"]:
+                    total_records = conn.execute(
+                        "SELECT COALESCE(SUM(tx_count), 0) FROM fraud_status_rollup WHERE status = ?",
+                        params
+                    ).fetchone()[0]
+                else:
+                    count_query = f"SELECT COUNT(*) FROM {FRAUD_TABLE} WHERE " + " AND ".join(where_clauses)
+                    total_records = pagination.cached_count(self.db_file, count_query, params)
+                
+                return df, pagination.total_pages(total_records, PAGE_SIZE), next_cursor
+        except Exception as e:
+            logger.error(f"Error fetching paginated results: {str(e)}")
+            return pd.DataFrame(), 0, None
+    
+    @query_cache.cached(lambda self: self.db_file)
+    def get_database_stats(self) -> Dict[str, Any]:
+        """Get database statistics and metrics."""
+        try:
+            with self._connection() as conn:
+                # Read from the trigger-maintained rollups instead of scanning results
+                return rollups.fraud_stats(conn, FRAUD_TABLE)
+        except Exception as e:
+            logger.error(f"Error getting database stats: {str(e)}")
+            return {}
+
+class FraudDetector:
+    """Handles fraud detection model loading and predictions."""
+    
+    def __init__(self, model_path: str = MODEL_PATH):
+        self.model_path = model_path
+        self.model_info = None
+        self.pipeline = self._load_model()
+        self.bank_codes = self._build_bank_codes()
+        self.last_oov_count = 0
+        self.batch_oov_count = 0
+        self.last_error = None
+        if self.pipeline is not None:
+            self.pipeline["model"].get_booster().set_param({"nthread": SCORING_THREADS})
+        
+    def _load_model(self) -> Optional[Dict[str, Any]]:
+        """Load the fraud detection pipeline through the process-wide model registry.
+        
+        A native export (see model_artifacts.py) next to the pickle is preferred
+        unless the pickle is newer. Artifacts are only read from disk the first
+        time, or after they change.
+        """
+        native_path = os.path.splitext(self.model_path)[0] + ".json"
+        try:
+            if os.path.exists(native_path) and (
+                not os.path.exists(self.model_path)
+                or os.path.getmtime(native_path) >= os.path.getmtime(self.model_path)
+            ):
+                try:
+                    self.model_info = model_registry.get_model(native_path, loader=model_artifacts.load_native)
+                    return self.model_info["model"]
+                except Exception as e:
+                    logger.warning(f"Could not load native model from {native_path}, using pickle: {str(e)}")
+            
+            if not os.path.exists(self.model_path):
+                logger.warning(f"Model file not found at {self.model_path}")
+                return None
+            
+            self.model_info = model_registry.get_model(self.model_path, loader=joblib.load)
+            pipeline = self.model_info["model"]
+            if not all(key in pipeline for key in ["model", "scaler", "label_encoder"]):
+                logger.error("Invalid pipeline structure")
+                return None
+            
+            return pipeline
+        except Exception as e:
+            logger.error(f"Error loading model: {str(e)}")
+            return None
+    
+    def _build_bank_codes(self) -> Dict[str, int]:
+        """Map bank names to the label encoder's codes once, for vectorized lookup."""
+        if self.pipeline is None:
+            return {}
+        return {bank: code for code, bank in enumerate(self.pipeline["label_encoder"].classes_)}
+    
+    def add_time_features(self, df: DataFrame) -> DataFrame:
+        """Parse timestamps and add the calendar features used by the model."""
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        df["date"] = df["timestamp"].dt.date
+        df["hour"] = df["timestamp"].dt.hour
+        df["weekday"] = df["timestamp"].dt.weekday
+        # Year-qualified period keys, shared with the feature store
+        keys = feature_store.period_keys(df["timestamp"])
+        df["week"] = keys["weekly"].to_numpy()
+        df["month"] = keys["monthly"].to_numpy()
+        return df
+    
+    def aggregate_batch(self, chunks: Iterable[DataFrame], history_db: Optional[str] = None) -> Dict[str, Any]:
+        """Accumulate per-individual period totals and account counts across chunks.
+        
+        The result can be passed to preprocess_data so that each chunk gets the
+        same aggregate features it would get if the whole batch were in memory.
+        With history_db, totals and accounts from the feature store are merged
+        in, and rows already counted there contribute only their keys.
+        """
+        # Per-chunk partials, reduced every AGGREGATE_REDUCE_EVERY chunks and once at the end
+        partials = {period: [] for period in PERIOD_KEYS}
+        pair_partials = [pd.DataFrame(columns=["individual_id", "account_id"])]
+        
+        def reduce_partials() -> None:
+            for period, frames in partials.items():
+                if len(frames) > 1:
+                    partials[period] = [pd.concat(frames).groupby(level=[0, 1]).sum()]
+            if len(pair_partials) > 1:
+                pair_partials[:] = [pd.concat(pair_partials, ignore_index=True).drop_duplicates()]
+        
+        aggregates = {}
+        conn = feature_store.connect(history_db) if history_db else None
+        
+        try:
+            for i, chunk in enumerate(chunks, 1):
+                chunk = self.add_time_features(chunk)
+                if conn is not None:
+                    is_new = feature_store.uncounted_mask(chunk, conn=conn)
+                else:
+                    is_new = pd.Series(True, index=chunk.index)
+                chunk["_new_amount"] = chunk["amount"].where(is_new, 0)
+                chunk["_new_count"] = is_new.astype(int)
+                
+                for period, key in PERIOD_KEYS.items():
+                    partials[period].append(chunk.groupby(["individual_id", key]).agg(
+                        total=("_new_amount", "sum"),
+                        txn_count=("_new_count", "sum")
+                    ))
+                pair_partials.append(chunk[["individual_id", "account_id"]].astype(str).drop_duplicates())
+                
+                if i % AGGREGATE_REDUCE_EVERY == 0:
+                    reduce_partials()
+            
+            reduce_partials()
+            for period, frames in partials.items():
+                if frames:
+                    aggregates[period] = frames[0]
+            account_pairs = pair_partials[0]
+            aggregates["account_pairs"] = account_pairs
+            aggregates["n_accounts"] = account_pairs.groupby("individual_id")["account_id"].count()
+            aggregates["unique_accounts"] = account_pairs["account_id"].nunique()
+            
+            if conn is not None and aggregates["n_accounts"].size > 0:
+                aggregates = feature_store.merge_history(aggregates, conn=conn)
+        finally:
+            if conn is not None:
+                conn.close()
+        
+        return aggregates
+    
+    def preprocess_data(self, df: DataFrame, aggregates: Optional[Dict[str, Any]] = None,
+                        history_db: Optional[str] = None) -> DataFrame:
+        """Preprocess transaction data for fraud detection.
+        
+        When aggregates from aggregate_batch are given, the period totals and
+        account counts are looked up from them instead of grouping df itself.
+        With history_db, they are built from df plus the stored feature history.
+        """
+        required_columns = set(REQUIRED_COLUMNS)
+        if not required_columns.issubset(df.columns):
+            missing = required_columns - set(df.columns)
+            logger.error(f"Missing required columns: {missing}")
+            raise ValueError(f"Missing required columns: {missing}")
+        
+        try:
+            # Convert timestamp and extract temporal features
+            df = self.add_time_features(df)
+            
+            if aggregates is None and history_db:
+                aggregates = self.aggregate_batch([df.copy()], history_db=history_db)
+            
+            if aggregates is None:
+                # Transaction aggregations
+                df["daily_total"] = df.groupby(["individual_id", "date"])["amount"].transform("sum")
+                df["weekly_total"] = df.groupby(["individual_id", "week"])["amount"].transform("sum")
+                df["monthly_total"] = df.groupby(["individual_id", "month"])["amount"].transform("sum")
+                df["daily_txn_count"] = df.groupby(["individual_id", "date"])["transaction_id"].transform("count")
+                df["weekly_txn_count"] = df.groupby(["individual_id", "week"])["transaction_id"].transform("count")
+                df["monthly_txn_count"] = df.groupby(["individual_id", "month"])["transaction_id"].transform("count")
+                
+                # Account features
+                df["n_accounts"] = df.groupby("individual_id")["account_id"].transform("nunique")
+            else:
+                # Look up batch-wide aggregations for this chunk
+                for period, key in PERIOD_KEYS.items():
+                    index = pd.MultiIndex.from_arrays([df["individual_id"], df[key]])
+                    period_totals = aggregates[period].reindex(index)
+                    df[f"{period}_total"] = period_totals["total"].to_numpy()
+                    df[f"{period}_txn_count"] = period_totals["txn_count"].to_numpy()
+                
+                df["n_accounts"] = aggregates["n_accounts"].reindex(df["individual_id"].astype(str)).to_numpy()
+            
+            # Threshold flags
+            df["exceeds_daily"] = (df["daily_total"] > 1000).astype(int)
+            df["exceeds_weekly"] = (df["weekly_total"] > 5000).astype(int)
+            df["exceeds_monthly"] = (df["monthly_total"] > 10000).astype(int)
+            
+            # Normalized amounts
+            df["avg_amount_per_account_daily"] = df["daily_total"] / df["n_accounts"].replace(0, 1)
+            df["avg_amount_per_account_weekly"] = df["weekly_total"] / df["n_accounts"].replace(0, 1)
+            df["avg_amount_per_account_monthly"] = df["monthly_total"] / df["n_accounts"].replace(0, 1)
+            
+            logger.info(f"Preprocessed {len(df)} transactions")
+            return df
+        except Exception as e:
+            logger.error(f"Error preprocessing data: {str(e)}")
+            raise
+    
+    def encode_banks(self, banks: pd.Series) -> np.ndarray:
+        """Encode bank names with the cached code table.
+        
+        Unknown banks get UNKNOWN_BANK_CODE row by row; their count is kept in
+        last_oov_count.
+        """
+        codes = banks.astype(str).map(self.bank_codes).to_numpy(dtype=np.float32, na_value=UNKNOWN_BANK_CODE)
+        oov = np.isnan(codes)
+        self.last_oov_count = int(oov.sum())
+        if self.last_oov_count:
+            logger.warning(
+                f"{self.last_oov_count} transactions with unknown bank names: "
+                f"{banks[oov].astype(str).unique()[:10].tolist()}"
+            )
+        return codes
+    
+    def prepare_features(self, df: DataFrame) -> np.ndarray:
+        """Build the model input as a single contiguous float32 matrix.
+        
+        Columns are written straight into the matrix in MODEL_FEATURES order,
+        bank names are encoded with encode_banks and the scaler's mean and
+        scale are applied column by column, without intermediate DataFrames.
+        """
+        scaler = self.pipeline["scaler"]
+        scale_params = {
+            feature: (scaler.mean_[i], scaler.scale_[i]) for i, feature in enumerate(SCALED_FEATURES)
+        }
+        
+        X = np.empty((len(df), len(MODEL_FEATURES)), dtype=np.float32)
+        for j, feature in enumerate(MODEL_FEATURES):
+            if feature == "bank_name":
+                X[:, j] = self.encode_banks(df["bank_name"])
+            elif feature in scale_params:
+                mean, scale = scale_params[feature]
+                X[:, j] = (df[feature].to_numpy(dtype=np.float64) - mean) / scale
+            else:
+                X[:, j] = df[feature].to_numpy(dtype=np.float32)
+        return X
+    
+    def predict(self, df: DataFrame) -> DataFrame:
+        """Make fraud predictions on processed transaction data.
+        
+        The fraud_probability and predicted_suspicious columns are added to df
+        in place, and df is returned. If scoring fails, the reason is kept in
+        last_error for the caller to report.
+        """
+        self.last_oov_count = 0
+        self.last_error = None
+        if self.pipeline is None:
+            self.last_error = "Fraud detection model not loaded. Please ensure model file exists."
+            logger.error(self.last_error)
+            return df
+            
+        for feature in MODEL_FEATURES:
+            if feature not in df.columns:
+                self.last_error = f"Missing required feature: {feature}"
+                logger.error(self.last_error)
+                return df
+        
+        try:
+            X = self.prepare_features(df)
+            
+            # Make predictions
+            self._attach_scores(df, self._predict_proba(X))
+            
+            logger.info(f"Made predictions for {len(df)} transactions. Found {df['predicted_suspicious'].sum()} suspicious transactions.")
+            return df
+        except Exception as e:
+            self.last_error = f"Error making predictions: {str(e)}"
+            logger.error(self.last_error)
+            # Return dataframe with empty prediction columns
+            df["fraud_probability"] = None
+            df["predicted_suspicious"] = None
+            return df
+
+    def _predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Return the fraud probability for each row of a prepared feature matrix."""
+        return self.pipeline["model"].predict_proba(X)[:, 1]
+    
+    def _attach_scores(self, df: DataFrame, y_prob: np.ndarray) -> DataFrame:
+        """Add probability and thresholded prediction columns to df."""
+        df["fraud_probability"] = y_prob
+        df["predicted_suspicious"] = (y_prob >= 0.3).astype(int)  # Using 0.3 threshold
+        return df
+    
+    def score_chunks(self, chunks: Iterable[DataFrame], aggregates: Optional[Dict[str, Any]] = None):
+        """Preprocess and score a stream of chunks, yielding them in input order.
+        
+        Model inference for one chunk runs on a worker thread, using
+        SCORING_THREADS cores through XGBoost's nthread, while the next chunk is
+        read and preprocessed on the calling thread. Unknown-bank rows across
+        the whole stream are counted in batch_oov_count.
+        """
+        self.batch_oov_count = 0
+        pending = deque()
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            for chunk in chunks:
+                processed = self.preprocess_data(chunk, aggregates)
+                X = self.prepare_features(processed)
+                self.batch_oov_count += self.last_oov_count
+                pending.append((processed, executor.submit(self._predict_proba, X)))
+                
+                # Keep one chunk in flight while the next one is prepared
+                if len(pending) > 1:
+                    processed, future = pending.popleft()
+                    yield self._attach_scores(processed, future.result())
+            
+            while pending:
+                processed, future = pending.popleft()
+                yield self._attach_scores(processed, future.result())
@@ -0,0 +1,435 @@
+"""
+Bulk transaction ingest for the Multiple Accounts database.
+
+Used by the upload button in pages/1_multiple_accounts.py and runnable
+headless from the command line:
+
+    python ingest.py transactions.csv --db transactions.db --chunk-size 50000
+
+Also holds the chunked readers every upload goes through. Besides CSV they
+read Parquet and Arrow IPC (Feather v2) files, projecting just the needed
+columns and streaming record batches, so no text parsing is needed.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+
+import db_pool
+import feature_store
+import rollups
+import schema_migrations
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DB_FILE = "transactions.db"
+DEFAULT_CHUNK_SIZE = 50000
+REQUIRED_COLUMNS = ['transaction_id', 'individual_id', 'account_id', 'bank_name', 'amount', 'timestamp']
+# File extensions accepted by the uploaders, by format
+FILE_FORMATS = {
+    'csv': ('csv',),
+    'parquet': ('parquet', 'pq'),
+    'arrow': ('arrow', 'feather', 'ipc')
+}
+UPLOAD_TYPES = [ext for extensions in FILE_FORMATS.values() for ext in extensions]
+# Database files already prepared by this process
+_prepared = set()
+
+# Explicit dtypes for streamed uploads. Amounts stay float64: they are persisted
+# and summed against limits, and float32 cannot hold cents above ~$100k.
+CSV_DTYPES = {
+    'transaction_id': str,
+    'individual_id': str,
+    'account_id': str,
+    'bank_name': 'category',
+    'amount': 'float64'
+}
+
+TRANSACTIONS_SCHEMA = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA cache_size=-2000;
+    PRAGMA temp_store=MEMORY;
+
+    -- Create accounts table if not exists
+    CREATE TABLE IF NOT EXISTS accounts (
+        account_id TEXT PRIMARY KEY,
+        individual_id TEXT NOT NULL,
+        bank_name TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status TEXT DEFAULT 'active'
+    );
+
+    -- Create transactions table if not exists
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        transaction_id TEXT UNIQUE NOT NULL,
+        individual_id TEXT NOT NULL,
+        account_id TEXT NOT NULL,
+        bank_name TEXT NOT NULL,
+        amount REAL NOT NULL,
+        timestamp TIMESTAMP NOT NULL
+    );
+
+    -- Create indices if not exists
+    CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions(timestamp);
+    CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions(account_id);
+    CREATE INDEX IF NOT EXISTS idx_accounts_individual ON accounts(individual_id);
+"""
+
+STAGING_SCHEMA = """
+    CREATE TEMP TABLE IF NOT EXISTS staging_transactions (
+        transaction_id TEXT PRIMARY KEY,
+        individual_id TEXT,
+        account_id TEXT,
+        bank_name TEXT,
+        amount REAL,
+        timestamp TEXT
+    )
+"""
+
+
+def read_csv_columns(source):
+    """Return the column names of a CSV file or buffer without loading its rows"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    columns = pd.read_csv(source, nrows=0).columns.tolist()
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return columns
+
+
+def iter_csv_chunks(source, required_columns=REQUIRED_COLUMNS, optional_columns=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream a transactions CSV as bounded DataFrame chunks.
+
+    Only the required and available optional columns are parsed, using
+    CSV_DTYPES and a parsed timestamp, so peak memory depends on chunk_size
+    rather than file size. Raises ValueError if a required column is missing.
+    """
+    columns = _projection(read_csv_columns(source), required_columns, optional_columns)
+    dtypes = {col: dtype for col, dtype in CSV_DTYPES.items() if col in columns}
+
+    reader = pd.read_csv(
+        source,
+        usecols=columns,
+        dtype=dtypes,
+        parse_dates=['timestamp'] if 'timestamp' in columns else False,
+        chunksize=max(int(chunk_size), 1)
+    )
+    for chunk in reader:
+        yield chunk
+
+
+def file_format(source):
+    """Format of a path or uploaded file ('csv', 'parquet' or 'arrow'), from its extension"""
+    name = source if isinstance(source, str) else getattr(source, 'name', '')
+    extension = os.path.splitext(str(name))[1].lstrip('.').lower()
+    for fmt, extensions in FILE_FORMATS.items():
+        if extension in extensions:
+            return fmt
+    return 'csv'
+
+
+def _rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+def _projection(available, required_columns, optional_columns):
+    """Columns to read, or ValueError naming the missing required ones"""
+    missing_cols = [col for col in required_columns if col not in available]
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {', '.join(missing_cols)}")
+    return list(required_columns) + [
+        col for col in optional_columns if col in available and col not in required_columns
+    ]
+
+
+def _arrow_chunk(batch):
+    chunk = batch.to_pandas()
+    if 'timestamp' in chunk.columns:
+        chunk['timestamp'] = pd.to_datetime(chunk['timestamp'])
+    return chunk
+
+
+def read_parquet_columns(source):
+    """Return the column names of a Parquet file or buffer from its footer"""
+    import pyarrow.parquet as pq
+    _rewind(source)
+    return pq.ParquetFile(source).schema_arrow.names
+
+
+def iter_parquet_chunks(source, required_columns=REQUIRED_COLUMNS, optional_columns=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream a transactions Parquet file as bounded DataFrame chunks.
+
+    Same contract as iter_csv_chunks. Only the projected columns are
+    decoded, one record batch at a time across the row groups.
+    """
+    import pyarrow.parquet as pq
+    _rewind(source)
+    parquet_file = pq.ParquetFile(source)
+    columns = _projection(parquet_file.schema_arrow.names, required_columns, optional_columns)
+    for batch in parquet_file.iter_batches(batch_size=max(int(chunk_size), 1), columns=columns):
+        yield _arrow_chunk(batch)
+
+
+def read_arrow_columns(source):
+    """Return the column names of an Arrow IPC file or buffer from its schema"""
+    import pyarrow as pa
+    _rewind(source)
+    return pa.ipc.open_file(source).schema.names
+
+
+def iter_arrow_chunks(source, required_columns=REQUIRED_COLUMNS, optional_columns=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream a transactions Arrow IPC (Feather v2) file as bounded DataFrame chunks.
+
+    Same contract as iter_csv_chunks. Record batches are read one at a time
+    and split further when larger than chunk_size.
+    """
+    import pyarrow as pa
+    _rewind(source)
+    reader = pa.ipc.open_file(source)
+    columns = _projection(reader.schema.names, required_columns, optional_columns)
+    chunk_size = max(int(chunk_size), 1)
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i).select(columns)
+        for offset in range(0, batch.num_rows, chunk_size):
+            yield _arrow_chunk(batch.slice(offset, chunk_size))
+
+
+def read_columns(source):
+    """Return the column names of a CSV, Parquet or Arrow file without loading its rows"""
+    readers = {'csv': read_csv_columns, 'parquet': read_parquet_columns, 'arrow': read_arrow_columns}
+    return readers[file_format(source)](source)
+
+
+def iter_chunks(source, required_columns=REQUIRED_COLUMNS, optional_columns=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a CSV, Parquet or Arrow file as bounded DataFrame chunks, by its extension"""
+    readers = {'csv': iter_csv_chunks, 'parquet': iter_parquet_chunks, 'arrow': iter_arrow_chunks}
+    return readers[file_format(source)](
+        source, required_columns=required_columns, optional_columns=optional_columns, chunk_size=chunk_size
+    )
+
+
+def ensure_schema(conn):
+    """Create the accounts, transactions and rollup tables if they don't exist"""
+    conn.executescript(TRANSACTIONS_SCHEMA)
+    rollups.ensure_transaction_rollups(conn)
+
+
+def prepare(db_file=DB_FILE):
+    """Create the tables, rollups and indexes, once per database file"""
+    path = os.path.abspath(db_file)
+    if path in _prepared:
+        return
+    conn = db_pool.connect(db_file)
+    try:
+        ensure_schema(conn)
+        schema_migrations.ensure_indexes(conn, "accounts")
+        conn.commit()
+    finally:
+        conn.close()
+    _prepared.add(path)
+
+
+def _chunk_rows(chunk):
+    """Convert a DataFrame chunk to a list of row tuples in staging column order"""
+    chunk = chunk[REQUIRED_COLUMNS]
+    timestamps = pd.to_datetime(chunk['timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S')
+    return list(zip(
+        chunk['transaction_id'].astype(str),
+        chunk['individual_id'].astype(str),
+        chunk['account_id'].astype(str),
+        chunk['bank_name'].astype(str),
+        pd.to_numeric(chunk['amount']).astype(float),
+        timestamps
+    ))
+
+
+def bulk_save_transactions(df, conn=None, db_file=DB_FILE, chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None,
+                           feature_db=feature_store.DB_FILE):
+    """
+    Insert a DataFrame of transactions using set-based statements.
+
+    Each chunk is staged in a temp table with executemany and rows whose
+    transaction_id is already stored are dropped from it. Accounts are then
+    deduplicated and transactions inserted with one INSERT ... SELECT each,
+    and the staged rows are added to the rollups (see rollups.py). Every
+    chunk is committed separately, then its new rows are added to the fraud
+    feature store in feature_db (None to skip).
+
+    progress_callback, if given, is called after each chunk as
+    progress_callback(rows_done, total_rows, rows_per_sec).
+
+    Returns a dict with rows_read, rows_inserted, accounts_inserted,
+    elapsed_seconds and rows_per_sec.
+    """
+    close_conn = False
+    if conn is None:
+        conn = db_pool.connect(db_file)
+        close_conn = True
+
+    chunk_size = max(int(chunk_size), 1)
+    total_rows = len(df)
+    stats = {
+        "rows_read": 0,
+        "rows_inserted": 0,
+        "accounts_inserted": 0,
+        "elapsed_seconds": 0.0,
+        "rows_per_sec": 0.0
+    }
+    start = time.perf_counter()
+
+    try:
+        ensure_schema(conn)
+        conn.execute(STAGING_SCHEMA)
+        cursor = conn.cursor()
+
+        for offset in range(0, total_rows, chunk_size):
+            rows = _chunk_rows(df.iloc[offset:offset + chunk_size])
+
+            try:
+                cursor.execute("DELETE FROM staging_transactions")
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO staging_transactions VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                cursor.execute("""
+                    DELETE FROM staging_transactions
+                    WHERE transaction_id IN (SELECT transaction_id FROM transactions)
+                """)
+
+                cursor.execute("""
+                    INSERT OR IGNORE INTO accounts (account_id, individual_id, bank_name)
+                    SELECT account_id, MIN(individual_id), MIN(bank_name)
+                    FROM staging_transactions
+                    GROUP BY account_id
+                """)
+                stats["accounts_inserted"] += cursor.rowcount
+
+                cursor.execute("""
+                    INSERT OR IGNORE INTO transactions (
+                        transaction_id, individual_id, account_id, bank_name, amount, timestamp
+                    )
+                    SELECT transaction_id, individual_id, account_id, bank_name, amount, timestamp
+                    FROM staging_transactions
+                """)
+                stats["rows_inserted"] += cursor.rowcount
+
+                rollups.apply_staged_transactions(cursor)
+                new_rows = None
+                if feature_db:
+                    new_rows = pd.read_sql_query(
+                        "SELECT transaction_id, individual_id, account_id, amount, timestamp FROM staging_transactions",
+                        conn
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            if new_rows is not None and not new_rows.empty:
+                # The store skips transactions it has seen, so a failed update is retried by the next save
+                try:
+                    feature_store.apply_transactions(new_rows, db_file=feature_db)
+                except Exception as e:
+                    logger.error(f"Error updating feature store {feature_db}: {e}")
+
+            stats["rows_read"] += len(rows)
+            elapsed = time.perf_counter() - start
+            rows_per_sec = stats["rows_read"] / elapsed if elapsed > 0 else 0.0
+
+            if progress_callback is not None:
+                progress_callback(stats["rows_read"], total_rows, rows_per_sec)
+
+        cursor.execute("DELETE FROM staging_transactions")
+        conn.commit()
+    finally:
+        if close_conn:
+            conn.close()
+
+    stats["elapsed_seconds"] = time.perf_counter() - start
+    if stats["elapsed_seconds"] > 0:
+        stats["rows_per_sec"] = stats["rows_read"] / stats["elapsed_seconds"]
+
+    logger.info(
+        f"Bulk ingest: {stats['rows_inserted']} of {stats['rows_read']} rows inserted "
+        f"in {stats['elapsed_seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/sec)"
+    )
+    return stats
+
+
+def ingest_csv(source, conn=None, db_file=DB_FILE, chunk_size=DEFAULT_CHUNK_SIZE, total_rows=None,
+               progress_callback=None, feature_db=feature_store.DB_FILE):
+    """
+    Stream a CSV, Parquet or Arrow file or buffer into the database one chunk at a time.
+
+    Takes the same progress_callback and feature_db as bulk_save_transactions; total_rows is
+    passed through to it as-is (None if unknown). Returns the combined stats.
+    """
+    close_conn = False
+    if conn is None:
+        conn = db_pool.connect(db_file)
+        close_conn = True
+
+    totals = {"rows_read": 0, "rows_inserted": 0, "accounts_inserted": 0}
+    start = time.perf_counter()
+
+    try:
+        for chunk in iter_chunks(source, chunk_size=chunk_size):
+            stats = bulk_save_transactions(chunk, conn=conn, chunk_size=chunk_size, feature_db=feature_db)
+            for key in totals:
+                totals[key] += stats[key]
+
+            if progress_callback is not None:
+                elapsed = time.perf_counter() - start
+                rows_per_sec = totals["rows_read"] / elapsed if elapsed > 0 else 0.0
+                progress_callback(totals["rows_read"], total_rows, rows_per_sec)
+    finally:
+        if close_conn:
+            conn.close()
+
+    totals["elapsed_seconds"] = time.perf_counter() - start
+    totals["rows_per_sec"] = totals["rows_read"] / totals["elapsed_seconds"] if totals["elapsed_seconds"] > 0 else 0.0
+    return totals
+
+
+def main(argv=None):
+    """Command line entry point for headless ingest"""
+    parser = argparse.ArgumentParser(description="Bulk load a transactions file into the Multiple Accounts database")
+    parser.add_argument("csv_file", help="CSV, Parquet or Arrow file with " + ", ".join(REQUIRED_COLUMNS))
+    parser.add_argument("--db", default=DB_FILE, help=f"SQLite database file (default: {DB_FILE})")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Rows per committed chunk (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--feature-db", default=feature_store.DB_FILE,
+                        help=f"Fraud feature store to update (default: {feature_store.DB_FILE})")
+    parser.add_argument("--no-feature-store", action="store_true", help="Don't update the fraud feature store")
+    args = parser.parse_args(argv)
+
+    def report(rows_done, total_rows, rows_per_sec):
+        print(f"{rows_done:,} rows ({rows_per_sec:,.0f} rows/sec)")
+
+    try:
+        stats = ingest_csv(args.csv_file, db_file=args.db, chunk_size=args.chunk_size, progress_callback=report,
+                           feature_db=None if args.no_feature_store else args.feature_db)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    print(
+        f"Inserted {stats['rows_inserted']:,} new transactions and {stats['accounts_inserted']:,} new accounts "
+        f"from {stats['rows_read']:,} rows in {stats['elapsed_seconds']:.2f}s "
+        f"({stats['rows_per_sec']:,.0f} rows/sec)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
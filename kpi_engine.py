@@ -0,0 +1,175 @@
+"""
+Dashboard KPIs computed with one aggregate query per database.
+
+Every metric on the main dashboard cards, the activity timeline and the KPI
+trend row comes from a single query per database. Transaction and fraud
+result metrics read the materialized rollups in rollups.py, so their cost
+does not grow with the number of rows; violations are aggregated in one
+pass with conditional SUM/COUNT expressions. The three databases are
+queried concurrently.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import db_pool
+import rollups
+
+logger = logging.getLogger(__name__)
+
+FRAUD_TABLE = "fraud_detection_results"
+
+# Read from the rollups (see rollups.py); only the multi-bank activity check
+# touches transactions, seeking by (individual_id, timestamp)
+ACCOUNTS_KPI_QUERY = """
+    WITH months AS (
+        SELECT
+            date('now', 'start of month') AS kpi_current_start,
+            date('now', 'start of month', '+1 month') AS kpi_current_end,
+            date('now', 'start of month', '-1 month') AS kpi_previous_start
+    )
+    SELECT
+        (SELECT COALESCE(SUM(tx_count), 0) FROM bank_rollup) AS total_tx,
+        (SELECT COUNT(*) FROM individual_rollup) AS unique_individuals,
+        (SELECT COALESCE(SUM(total_amount), 0) FROM bank_rollup) AS total_amount,
+        (SELECT COALESCE(SUM(tx_count), 0) FROM daily_rollup
+         WHERE substr(day, 1, 7) = :current_month) AS current_month_tx,
+        (SELECT COALESCE(SUM(tx_count), 0) FROM daily_rollup
+         WHERE substr(day, 1, 7) = :previous_month) AS previous_month_tx,
+        (SELECT COALESCE(SUM(tx_count), 0) FROM daily_rollup
+         WHERE day >= kpi_current_start AND day < kpi_current_end) AS kpi_current_tx,
+        (SELECT COALESCE(SUM(tx_count), 0) FROM daily_rollup
+         WHERE day >= kpi_previous_start AND day < kpi_current_start) AS kpi_previous_tx,
+        (SELECT COUNT(*) FROM individual_rollup i
+         WHERE i.bank_count > 1
+           AND EXISTS (SELECT 1 FROM transactions t
+                       WHERE t.individual_id = i.individual_id
+                         AND t.timestamp >= kpi_current_start AND t.timestamp < kpi_current_end)) AS multi_bank_current,
+        (SELECT COUNT(*) FROM individual_rollup i
+         WHERE i.bank_count > 1
+           AND EXISTS (SELECT 1 FROM transactions t
+                       WHERE t.individual_id = i.individual_id
+                         AND t.timestamp >= kpi_previous_start AND t.timestamp < kpi_current_start)) AS multi_bank_previous,
+        (SELECT MIN(timestamp) FROM transactions) AS first_timestamp,
+        (SELECT MAX(timestamp) FROM transactions) AS last_timestamp
+    FROM months
+"""
+
+LIMITS_KPI_QUERY = """
+    SELECT
+        COUNT(*) AS violations,
+        COALESCE(SUM(CASE WHEN DATE(created_at) = DATE('now') THEN 1 ELSE 0 END), 0) AS violations_today,
+        COALESCE(SUM(CASE WHEN DATE(created_at) = DATE('now', '-1 day') THEN 1 ELSE 0 END), 0) AS violations_yesterday,
+        COALESCE(SUM(CASE WHEN strftime('%Y-%W', created_at) = strftime('%Y-%W', 'now') THEN 1 ELSE 0 END), 0) AS kpi_current_violations,
+        COALESCE(SUM(CASE WHEN strftime('%Y-%W', created_at) = strftime('%Y-%W', datetime('now', '-7 days')) THEN 1 ELSE 0 END), 0) AS kpi_previous_violations,
+        MIN(created_at) AS first_timestamp,
+        MAX(created_at) AS last_timestamp,
+        (SELECT COUNT(*) FROM uploaded_files) AS files,
+        (SELECT COUNT(*) FROM settings) AS settings
+    FROM violations
+"""
+
+FRAUD_KPI_QUERY = """
+    SELECT
+        COALESCE(SUM(tx_count), 0) AS analyses,
+        COALESCE(SUM(CASE WHEN predicted_suspicious = 1 THEN tx_count ELSE 0 END), 0) AS suspicious,
+        COALESCE(SUM(CASE WHEN predicted_suspicious = 1
+                          AND day >= date('now', '-7 day') THEN tx_count ELSE 0 END), 0) AS recent_suspicious,
+        COALESCE(SUM(CASE WHEN predicted_suspicious = 1
+                          AND day BETWEEN date('now', '-14 day') AND date('now', '-8 day') THEN tx_count ELSE 0 END), 0) AS previous_suspicious,
+        COALESCE(SUM(CASE WHEN predicted_suspicious = 1
+                          AND strftime('%Y-%W', day) = strftime('%Y-%W', 'now') THEN tx_count ELSE 0 END), 0) AS kpi_current_suspicious,
+        COALESCE(SUM(CASE WHEN predicted_suspicious = 1
+                          AND strftime('%Y-%W', day) = strftime('%Y-%W', datetime('now', '-7 days')) THEN tx_count ELSE 0 END), 0) AS kpi_previous_suspicious,
+        (SELECT MIN(timestamp) FROM fraud_detection_results) AS first_timestamp,
+        (SELECT MAX(timestamp) FROM fraud_detection_results) AS last_timestamp,
+        (SELECT COUNT(*) FROM users) AS users
+    FROM fraud_day_rollup
+"""
+
+# Values shown when a database or table is missing
+ACCOUNTS_DEFAULTS = {
+    "total_tx": 0, "unique_individuals": 0, "total_amount": 0.0,
+    "current_month_tx": 0, "previous_month_tx": 0, "kpi_current_tx": 0, "kpi_previous_tx": 0,
+    "multi_bank_current": 0, "multi_bank_previous": 0,
+    "first_timestamp": None, "last_timestamp": None
+}
+LIMITS_DEFAULTS = {
+    "violations": 0, "violations_today": 0, "violations_yesterday": 0,
+    "kpi_current_violations": 0, "kpi_previous_violations": 0,
+    "first_timestamp": None, "last_timestamp": None, "files": 0, "settings": 0
+}
+FRAUD_DEFAULTS = {
+    "analyses": 0, "suspicious": 0, "recent_suspicious": 0, "previous_suspicious": 0,
+    "kpi_current_suspicious": 0, "kpi_previous_suspicious": 0,
+    "first_timestamp": None, "last_timestamp": None, "users": 0
+}
+
+
+def _run_kpi_query(db_file, query, defaults, params=(), prepare=None):
+    """
+    Run one KPI query and return its row as a dict, or the defaults on error.
+
+    prepare, if given, is called with the connection first, to create rollups
+    for databases written before they existed.
+    """
+    try:
+        conn = db_pool.connect(db_file)
+        try:
+            if prepare is not None:
+                prepare(conn)
+            cursor = conn.execute(query, params)
+            row = cursor.fetchone()
+            columns = [col[0] for col in cursor.description]
+        finally:
+            conn.close()
+        result = dict(defaults)
+        result.update({col: value for col, value in zip(columns, row) if value is not None})
+        return result
+    except Exception as e:
+        logger.error(f"Error computing KPIs for {db_file}: {e}")
+        result = dict(defaults)
+        result["error"] = str(e)
+        return result
+
+
+def accounts_kpis(db_file, now=None):
+    """Transaction totals, month-over-month counts and multi-bank individuals"""
+    now = now or datetime.now()
+    params = {
+        "current_month": now.strftime("%Y-%m"),
+        "previous_month": (now - timedelta(days=30)).strftime("%Y-%m")
+    }
+    return _run_kpi_query(db_file, ACCOUNTS_KPI_QUERY, ACCOUNTS_DEFAULTS, params,
+                          prepare=rollups.ensure_transaction_rollups)
+
+
+def limits_kpis(db_file):
+    """Violation totals, daily and weekly trends, files and rule settings"""
+    return _run_kpi_query(db_file, LIMITS_KPI_QUERY, LIMITS_DEFAULTS)
+
+
+def fraud_kpis(db_file):
+    """Analysis and suspicious counts, weekly trends and user count"""
+    return _run_kpi_query(db_file, FRAUD_KPI_QUERY, FRAUD_DEFAULTS,
+                          prepare=lambda conn: rollups.ensure_fraud_rollups(conn, FRAUD_TABLE))
+
+
+def fetch_dashboard_kpis(accounts_db, limits_db, fraud_db):
+    """Compute the KPIs of all three databases concurrently"""
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        accounts = executor.submit(accounts_kpis, accounts_db)
+        limits = executor.submit(limits_kpis, limits_db)
+        fraud = executor.submit(fraud_kpis, fraud_db)
+        return {
+            "accounts": accounts.result(),
+            "limits": limits.result(),
+            "fraud": fraud.result()
+        }
+
+
+def trend_change(current, previous):
+    """Percent change from previous to current; 100 when growing from zero"""
+    if previous == 0:
+        return 100 if current > 0 else 0
+    return ((current - previous) / previous) * 100
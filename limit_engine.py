@@ -0,0 +1,291 @@
+"""
+Vectorized transaction limit analysis.
+
+Transactions are reduced to integer codes once: individuals, banks and
+accounts are factorized and timestamps decomposed into day, ISO week and
+month numbers shared by all three periods. Totals and distinct bank/account
+counts per (individual, period) are then computed with numpy on those codes.
+Comma-joined bank and account names are only built for groups that violate
+a limit, so the cost of string handling depends on the number of violations,
+not transactions.
+
+rolling_violations checks sliding windows (24 hours, 7 and 30 days) instead
+of calendar periods, so spending split across midnight or a month boundary
+is caught as well.
+"""
+import numpy as np
+import pandas as pd
+
+PERIODS = ("daily", "weekly", "monthly")
+# Spending at this share of a limit across several accounts is flagged as
+# potential circumvention
+CIRCUMVENTION_RATIO = 0.8
+# Sliding window checked against each period's limit: (label, length)
+ROLLING_WINDOWS = {
+    "daily": ("24h", pd.Timedelta(hours=24)),
+    "weekly": ("7d", pd.Timedelta(days=7)),
+    "monthly": ("30d", pd.Timedelta(days=30))
+}
+
+
+def decompose_timestamps(timestamps):
+    """
+    Split timestamps into integer period numbers shared by every pass.
+
+    Returns a dict of numpy arrays: "day" (days since epoch), "iso_year" and
+    "iso_week" (ISO 8601 week numbering, so the days around New Year belong
+    to the right week), and "year" and "month" of the calendar month.
+    """
+    days = pd.to_datetime(timestamps).to_numpy().astype("datetime64[D]")
+    day = days.astype(np.int64)
+
+    # The ISO year of a date is the calendar year of the Thursday in its week
+    weekday = (day + 3) % 7  # Monday is 0; 1970-01-01 was a Thursday
+    thursday = (day - weekday + 3).astype("datetime64[D]")
+    iso_year_start = thursday.astype("datetime64[Y]")
+    iso_week = (thursday - iso_year_start.astype("datetime64[D]")).astype(np.int64) // 7 + 1
+
+    months = days.astype("datetime64[M]").astype(np.int64)
+    return {
+        "day": day,
+        "iso_year": iso_year_start.astype(np.int64) + 1970,
+        "iso_week": iso_week,
+        "year": months // 12 + 1970,
+        "month": months % 12 + 1
+    }
+
+
+def period_keys(timestamps):
+    """
+    One int64 bucket key per timestamp and period.
+
+    Daily keys are days since the epoch; weekly and monthly keys are encoded
+    as year * 100 + week or month. period_columns decodes them.
+    """
+    parts = decompose_timestamps(timestamps)
+    return {
+        "daily": parts["day"],
+        "weekly": parts["iso_year"] * 100 + parts["iso_week"],
+        "monthly": parts["year"] * 100 + parts["month"]
+    }
+
+
+def _distinct_pairs(groups, codes, uniques, selected):
+    """
+    Distinct (group, name) pairs of the selected groups.
+
+    Returns the group and name arrays of the pairs, sorted by group and then
+    by name, so each group's names are contiguous and in order.
+    """
+    names = np.asarray(uniques).astype(str)
+    order = np.argsort(names, kind="stable")
+    rank = np.empty(len(names), dtype=np.int64)
+    rank[order] = np.arange(len(names))
+
+    mask = selected[groups]
+    width = max(len(names), 1)
+    pairs = np.unique(groups[mask].astype(np.int64) * width + rank[codes[mask]])
+    return pairs // width, names[order][pairs % width]
+
+
+def _join_names(pair_groups, pair_names, wanted):
+    """Series of ', '-joined names indexed by group, for the wanted groups"""
+    keep = wanted[pair_groups]
+    pair_groups = pair_groups[keep]
+    pair_names = pair_names[keep].tolist()
+    starts = np.flatnonzero(np.diff(pair_groups, prepend=-1))
+    bounds = np.append(starts, len(pair_groups)).tolist()
+    joined = [", ".join(pair_names[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+    return pd.Series(joined, index=pair_groups[starts], dtype=object)
+
+
+def period_columns(period, keys):
+    """Decode period keys back into the columns shown for that period"""
+    if period == "daily":
+        return {"date": pd.to_datetime(keys, unit="D").date}
+    if period == "weekly":
+        return {"year": keys // 100, "week": keys % 100}
+    return {"year": keys // 100, "month": keys % 100}
+
+
+def _encode(df):
+    """Integer codes, amounts and transaction counts of the rows of df"""
+    n = len(df)
+    codes = {}
+    for column in ("individual_id", "bank_name", "account_id"):
+        values = df[column] if column in df.columns else pd.Series("Unknown", index=df.index)
+        codes[column] = pd.factorize(values, use_na_sentinel=False)
+    codes["amount"] = pd.to_numeric(df["amount"]).to_numpy(dtype=np.float64)
+    if "transaction_count" in df.columns:
+        codes["transaction_count"] = df["transaction_count"].to_numpy(dtype=np.int64)
+    else:
+        codes["transaction_count"] = np.ones(n, dtype=np.int64)
+    return codes
+
+
+def analyze_limits(df, limits, periods=PERIODS):
+    """
+    Find daily, weekly and monthly limit violations per individual.
+
+    df needs individual_id, timestamp and amount; bank_name, account_id and
+    transaction_count (for pre-aggregated rows) are optional. limits maps
+    each period in PERIODS to its limit. A group violates when its total
+    exceeds the limit, or reaches CIRCUMVENTION_RATIO of it across more than
+    one account.
+
+    Returns one DataFrame per entry of periods, sorted by individual and
+    period, with the
+    period columns (date / year, week / year, month), amount, bank_name and
+    account_id (sorted, comma-joined names), transaction_count, num_banks
+    and num_accounts.
+    """
+    n = len(df)
+    encoded = _encode(df)
+    individual_codes, individual_names = encoded["individual_id"]
+    bank_codes, bank_names = encoded["bank_name"]
+    account_codes, account_names = encoded["account_id"]
+    amounts = encoded["amount"]
+    txn_counts = encoded["transaction_count"]
+
+    keys_by_period = period_keys(df["timestamp"])
+
+    results = []
+    for period in periods:
+        limit = limits[period]
+        keys = keys_by_period[period]
+        offset = keys.min() if n else 0
+        span = int(keys.max() - offset) + 1 if n else 1
+
+        groups, group_keys = pd.factorize(individual_codes.astype(np.int64) * span + (keys - offset))
+        n_groups = len(group_keys)
+
+        totals = np.bincount(groups, weights=amounts, minlength=n_groups)
+
+        # Only groups near the limit can violate, so distinct accounts and
+        # banks are only collected for those
+        candidates = totals >= limit * CIRCUMVENTION_RATIO
+        account_groups, account_list = _distinct_pairs(groups, account_codes, account_names, candidates)
+        num_accounts = np.bincount(account_groups, minlength=n_groups)
+        violating = candidates & ((totals > limit) | (num_accounts > 1))
+        bank_groups, bank_list = _distinct_pairs(groups, bank_codes, bank_names, violating)
+
+        wanted = np.flatnonzero(violating)
+        result = pd.DataFrame({"individual_id": np.asarray(individual_names, dtype=object)[group_keys[wanted] // span]})
+        for column, values in period_columns(period, group_keys[wanted] % span + offset).items():
+            result[column] = values
+        result["amount"] = totals[wanted]
+        result["bank_name"] = _join_names(bank_groups, bank_list, violating).reindex(wanted).to_numpy()
+        result["account_id"] = _join_names(account_groups, account_list, violating).reindex(wanted).to_numpy()
+        result["transaction_count"] = np.bincount(groups, weights=txn_counts, minlength=n_groups)[wanted].astype(np.int64)
+        result["num_banks"] = np.bincount(bank_groups, minlength=n_groups)[wanted]
+        result["num_accounts"] = num_accounts[wanted]
+
+        sort_columns = ["individual_id"] + list(period_columns(period, group_keys[:0]).keys())
+        results.append(result.sort_values(sort_columns, kind="stable").reset_index(drop=True))
+
+    return tuple(results)
+
+
+def rolling_violations(df, limits):
+    """
+    Find sliding-window limit violations per individual.
+
+    Every transaction closes a window reaching back ROLLING_WINDOWS[period]
+    (exclusive), whose total comes from a cumulative sum over the rows sorted
+    by individual and timestamp; the window start is found by binary search,
+    so the whole pass is O(n log n). The violation rule is the one used by
+    analyze_limits.
+
+    Overlapping violating windows describe one episode, so each run of
+    consecutive violating windows is reported once, by its largest window.
+    Returns three DataFrames (daily, weekly, monthly limits) with
+    individual_id, window_start and window_end (first and last transaction
+    in the window), amount, bank_name, account_id, transaction_count,
+    num_banks and num_accounts.
+    """
+    encoded = _encode(df)
+    individual_codes, individual_names = encoded["individual_id"]
+    bank_codes, bank_names = encoded["bank_name"]
+    account_codes, account_names = encoded["account_id"]
+    seconds = pd.to_datetime(df["timestamp"]).to_numpy().astype("datetime64[s]").astype(np.int64)
+
+    order = np.lexsort((seconds, individual_codes))
+    individuals = individual_codes[order].astype(np.int64)
+    seconds = seconds[order]
+    banks = bank_codes[order]
+    accounts = account_codes[order]
+    n = len(order)
+
+    # One sorted search key; individuals are spaced further apart than the
+    # longest window so no window reaches into the previous individual
+    longest = max(int(length.total_seconds()) for _, length in ROLLING_WINDOWS.values())
+    elapsed = seconds - seconds.min() if n else seconds
+    stride = int(elapsed.max()) + longest + 1 if n else 1
+    keys = individuals * stride + elapsed
+
+    amount_sums = np.concatenate(([0.0], np.cumsum(encoded["amount"][order])))
+    txn_sums = np.concatenate(([0], np.cumsum(encoded["transaction_count"][order])))
+    # Last row whose account differs from the row before it; a window
+    # starting before that row spans more than one account
+    positions = np.arange(n)
+    changed = np.concatenate(([False], accounts[1:] != accounts[:-1]))
+    last_change = np.maximum.accumulate(np.where(changed, positions, 0)) if n else positions
+
+    results = []
+    for period in PERIODS:
+        limit = limits[period]
+        width = int(ROLLING_WINDOWS[period][1].total_seconds())
+        starts = np.searchsorted(keys, keys - width, side="right")
+        totals = amount_sums[1:] - amount_sums[starts]
+        violating = (totals > limit) | ((totals >= limit * CIRCUMVENTION_RATIO) & (last_change > starts))
+
+        # Runs of consecutive violating windows of the same individual
+        same_run = np.concatenate(([False], violating[:-1] & (individuals[1:] == individuals[:-1])))
+        run_ids = np.cumsum(violating & ~same_run)[violating] - 1
+        rows = positions[violating]
+        by_total = np.lexsort((-totals[rows], run_ids))
+        first = np.diff(run_ids[by_total], prepend=-1) != 0
+        peaks = rows[by_total[first]]
+        peak_starts = starts[peaks]
+
+        # Rows of every reported window, labelled by window, for the
+        # distinct bank and account lists
+        lengths = peaks - peak_starts + 1
+        windows = np.repeat(np.arange(len(peaks)), lengths)
+        window_rows = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - peak_starts, lengths)
+        everything = np.ones(len(peaks), dtype=bool)
+        account_windows, account_list = _distinct_pairs(windows, accounts[window_rows], account_names, everything)
+        bank_windows, bank_list = _distinct_pairs(windows, banks[window_rows], bank_names, everything)
+        wanted = np.arange(len(peaks))
+
+        result = pd.DataFrame({
+            "individual_id": np.asarray(individual_names, dtype=object)[individuals[peaks]],
+            "window_start": pd.to_datetime(seconds[peak_starts], unit="s"),
+            "window_end": pd.to_datetime(seconds[peaks], unit="s"),
+            "amount": totals[peaks],
+            "bank_name": _join_names(bank_windows, bank_list, everything).reindex(wanted).to_numpy(),
+            "account_id": _join_names(account_windows, account_list, everything).reindex(wanted).to_numpy(),
+            "transaction_count": txn_sums[peaks + 1] - txn_sums[peak_starts],
+            "num_banks": np.bincount(bank_windows, minlength=len(peaks)),
+            "num_accounts": np.bincount(account_windows, minlength=len(peaks))
+        })
+        results.append(result.sort_values(["individual_id", "window_end"], kind="stable").reset_index(drop=True))
+
+    return tuple(results)
+
+
+def period_type(period, rolling=False):
+    """period_type stored with a violation: the period, or its rolling window"""
+    return f"rolling_{ROLLING_WINDOWS[period][0]}" if rolling else period
+
+
+def period_dates(violations, period):
+    """Human-readable period of each violation row, as stored in period_date"""
+    if "window_start" in violations.columns:
+        return (violations["window_start"].dt.strftime("%Y-%m-%d %H:%M") + " to "
+                + violations["window_end"].dt.strftime("%Y-%m-%d %H:%M"))
+    if period == "daily":
+        return violations["date"].astype(str)
+    if period == "weekly":
+        return "Week " + violations["week"].astype(str) + ", " + violations["year"].astype(str)
+    return violations["month"].astype(str) + "/" + violations["year"].astype(str)
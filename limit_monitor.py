@@ -0,0 +1,367 @@
+"""
+Limit monitoring schema, violation persistence and incremental monitoring.
+
+The incremental monitor checks transactions stored in the Multiple Accounts
+database. A watermark, the highest transactions.id already checked, is kept
+in monitor_state. Each run reads only the rows above it and finds the
+(individual, day / ISO week / month) buckets they fall in. It re-aggregates
+just those buckets from transactions.db and updates their violations in
+place: violating buckets are upserted, and buckets that no longer violate
+are cleared. The watermark moves in the same transaction as the violation
+writes, so a failed run is simply repeated. transactions.id is AUTOINCREMENT,
+so ids are never reused and new rows always land above the watermark.
+
+Deletions leave no new ids behind, so transactions.db queues the individual
+and day of every deleted transaction in deleted_days (see rollups). A run
+re-checks the buckets of the queued days along with the new rows, which
+clears violations that the deleted transactions made, and then removes the
+entries it has consumed.
+
+Run it headless, e.g. hourly from cron:
+
+    python limit_monitor.py --accounts-db transactions.db --limits-db transaction_monitoring.db
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import db_pool
+import ingest
+import limit_engine
+import schema_migrations
+
+logger = logging.getLogger(__name__)
+
+# Constants
+ACCOUNTS_DB_FILE = "transactions.db"
+LIMITS_DB_FILE = "transaction_monitoring.db"
+WATERMARK_NAME = "transactions"
+
+# Limits databases already prepared by this process
+_prepared = set()
+
+LIMITS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS settings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        setting_name TEXT UNIQUE,
+        setting_value REAL,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS violations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        individual_id TEXT,
+        period_type TEXT,
+        period_date TEXT,
+        amount REAL,
+        num_accounts INTEGER,
+        num_banks INTEGER,
+        bank_names TEXT,
+        account_ids TEXT,
+        transaction_count INTEGER,
+        limit_value REAL,
+        violation_type TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS uploaded_files (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT,
+        upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        record_count INTEGER
+    );
+
+    -- Highest source row already checked, per monitored source
+    CREATE TABLE IF NOT EXISTS monitor_state (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    INSERT OR IGNORE INTO settings (setting_name, setting_value)
+    VALUES
+        ('daily_limit', 1000.0),
+        ('weekly_limit', 5000.0),
+        ('monthly_limit', 10000.0);
+"""
+
+# Violations are keyed on (individual_id, period_type, period_date), so
+# saving a bucket again updates it; created_at keeps the first detection
+UPSERT_VIOLATION_SQL = """
+    INSERT INTO violations (
+        individual_id, period_type, period_date, amount,
+        num_accounts, num_banks, bank_names, account_ids,
+        transaction_count, limit_value, violation_type
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (individual_id, period_type, period_date) DO UPDATE SET
+        amount = excluded.amount,
+        num_accounts = excluded.num_accounts,
+        num_banks = excluded.num_banks,
+        bank_names = excluded.bank_names,
+        account_ids = excluded.account_ids,
+        transaction_count = excluded.transaction_count,
+        limit_value = excluded.limit_value,
+        violation_type = excluded.violation_type
+"""
+
+DEFAULT_LIMITS = {
+    "daily": 1000.0,
+    "weekly": 5000.0,
+    "monthly": 10000.0
+}
+
+
+def ensure_schema(conn):
+    """Create the limit monitoring tables and the violation key if they don't exist"""
+    conn.executescript(LIMITS_SCHEMA)
+    # Older databases may hold duplicate violations; the newest row is kept
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_violations_period_key'"
+    ).fetchone() is None:
+        conn.execute("""
+            DELETE FROM violations
+            WHERE id NOT IN (
+                SELECT MAX(id) FROM violations
+                GROUP BY individual_id, period_type, period_date
+            )
+        """)
+        conn.execute("""
+            CREATE UNIQUE INDEX idx_violations_period_key
+            ON violations (individual_id, period_type, period_date)
+        """)
+    conn.commit()
+
+
+def prepare(limits_db=LIMITS_DB_FILE):
+    """Create the limit monitoring tables and their indexes, once per database file"""
+    path = os.path.abspath(limits_db)
+    if path in _prepared:
+        return
+    conn = db_pool.connect(limits_db)
+    try:
+        ensure_schema(conn)
+        schema_migrations.ensure_indexes(conn, "limits")
+    finally:
+        conn.close()
+    _prepared.add(path)
+
+
+def read_limits(conn):
+    """Daily, weekly and monthly limits from the settings table"""
+    limits = dict(DEFAULT_LIMITS)
+    for name, value in conn.execute("SELECT setting_name, setting_value FROM settings"):
+        period = name[:-len("_limit")] if name.endswith("_limit") else None
+        if period in limits and value is not None:
+            limits[period] = value
+    return limits
+
+
+def violation_rows(violations, period, limits, rolling=False):
+    """Build violations table rows for one period's violations, column by column"""
+    period_type = limit_engine.period_type(period, rolling)
+    limit = limits[period]
+    violation_types = violations['amount'].gt(limit).map(
+        {True: 'Direct Violation', False: 'Potential Circumvention'}
+    )
+    # tolist() yields Python scalars, which sqlite3 binds directly
+    return list(zip(
+        violations['individual_id'].astype(str).tolist(),
+        [period_type] * len(violations),
+        limit_engine.period_dates(violations, period).tolist(),
+        violations['amount'].astype(float).tolist(),
+        violations['num_accounts'].astype(int).tolist(),
+        violations['num_banks'].astype(int).tolist(),
+        violations['bank_name'].tolist(),
+        violations['account_id'].tolist(),
+        violations['transaction_count'].astype(int).tolist(),
+        [limit] * len(violations),
+        violation_types.tolist()
+    ))
+
+
+def _bucket_ranges(new_rows):
+    """
+    Timestamp range to re-read per individual touched by new_rows.
+
+    The range covers the whole ISO week and calendar month of every new row,
+    so each touched bucket is re-aggregated from all of its transactions.
+    """
+    days = pd.to_datetime(new_rows["timestamp"]).to_numpy().astype("datetime64[D]")
+    weekday = (days.astype(np.int64) + 3) % 7
+    week_start = days - weekday
+    month_start = days.astype("datetime64[M]").astype("datetime64[D]")
+    month_end = (days.astype("datetime64[M]") + 1).astype("datetime64[D]")
+    ranges = pd.DataFrame({
+        "individual_id": new_rows["individual_id"].to_numpy(),
+        "start": np.minimum(week_start, month_start),
+        "end": np.maximum(week_start + 7, month_end)
+    })
+    ranges = ranges.groupby("individual_id", as_index=False).agg(start=("start", "min"), end=("end", "max"))
+    ranges["start"] = ranges["start"].dt.strftime("%Y-%m-%d")
+    ranges["end"] = ranges["end"].dt.strftime("%Y-%m-%d")
+    return ranges
+
+
+def _touched_buckets(new_rows, rows, period):
+    """Rows of the buckets touched by new_rows, and the touched buckets' period dates"""
+    new_keys = pd.DataFrame({
+        "individual_id": new_rows["individual_id"].to_numpy(),
+        "key": limit_engine.period_keys(new_rows["timestamp"])[period]
+    }).drop_duplicates()
+    row_keys = limit_engine.period_keys(rows["timestamp"])[period]
+    touched = pd.MultiIndex.from_frame(new_keys)
+    in_bucket = pd.MultiIndex.from_arrays([rows["individual_id"].to_numpy(), row_keys]).isin(touched)
+
+    buckets = pd.DataFrame(limit_engine.period_columns(period, new_keys["key"].to_numpy()))
+    period_dates = limit_engine.period_dates(buckets, period)
+    return rows[in_bucket], list(zip(new_keys["individual_id"].astype(str), period_dates))
+
+
+def run(accounts_db=ACCOUNTS_DB_FILE, limits_db=LIMITS_DB_FILE, limits=None):
+    """
+    Check transactions added or deleted since the last run and update their violations.
+
+    limits defaults to the limits saved in the settings table. Returns a dict
+    with the number of new transactions, re-checked deleted days, touched
+    buckets, violations saved and violations cleared, and the new watermark.
+    """
+    start = time.perf_counter()
+    stats = {"new_transactions": 0, "deleted_days": 0, "buckets": 0, "violations": 0, "cleared": 0}
+
+    prepare(limits_db)
+    ingest.prepare(accounts_db)
+    limits_conn = db_pool.connect(limits_db)
+    accounts_conn = db_pool.connect(accounts_db)
+    try:
+        if limits is None:
+            limits = read_limits(limits_conn)
+        row = limits_conn.execute(
+            "SELECT last_id FROM monitor_state WHERE name = ?", (WATERMARK_NAME,)
+        ).fetchone()
+        watermark = row[0] if row else 0
+        stats["watermark"] = watermark
+
+        queued = pd.read_sql_query(
+            "SELECT id, individual_id, day AS timestamp FROM deleted_days", accounts_conn
+        )
+        # Deleting the newest rows can leave MAX(id) below the watermark
+        high = max(accounts_conn.execute("SELECT MAX(id) FROM transactions").fetchone()[0] or 0, watermark)
+        if high == watermark and queued.empty:
+            stats["elapsed_seconds"] = time.perf_counter() - start
+            return stats
+
+        added = pd.read_sql_query(
+            "SELECT individual_id, timestamp FROM transactions WHERE id > ? AND id <= ?",
+            accounts_conn, params=(watermark, high)
+        )
+        deleted = queued[["individual_id", "timestamp"]].drop_duplicates()
+        stats["new_transactions"] = len(added)
+        stats["deleted_days"] = len(deleted)
+        # A deleted day touches the same buckets as a new row on that day would
+        new_rows = pd.concat([added, deleted], ignore_index=True)
+
+        # Re-read the touched individuals' weeks and months through the
+        # (individual_id, timestamp) index; rows above high belong to the
+        # next run
+        ranges = _bucket_ranges(new_rows)
+        accounts_conn.execute("DROP TABLE IF EXISTS temp.monitor_ranges")
+        accounts_conn.execute("CREATE TEMP TABLE monitor_ranges (individual_id TEXT PRIMARY KEY, start TEXT, end TEXT)")
+        accounts_conn.executemany(
+            "INSERT INTO monitor_ranges VALUES (?, ?, ?)",
+            list(zip(ranges["individual_id"].tolist(), ranges["start"].tolist(), ranges["end"].tolist()))
+        )
+        rows = pd.read_sql_query("""
+            SELECT t.individual_id, t.timestamp, t.bank_name, t.account_id, t.amount
+            FROM monitor_ranges r
+            JOIN transactions t
+              ON t.individual_id = r.individual_id
+             AND t.timestamp >= r.start AND t.timestamp < r.end
+            WHERE t.id <= ?
+        """, accounts_conn, params=(high,))
+        accounts_conn.execute("DROP TABLE temp.monitor_ranges")
+
+        upserts = []
+        touched = []
+        for period in limit_engine.PERIODS:
+            bucket_rows, buckets = _touched_buckets(new_rows, rows, period)
+            violations = limit_engine.analyze_limits(bucket_rows, limits, periods=(period,))[0]
+            upserts.extend(violation_rows(violations, period, limits))
+            touched.extend((individual_id, period, period_date) for individual_id, period_date in buckets)
+        stats["buckets"] = len(touched)
+        stats["violations"] = len(upserts)
+
+        # Violations, stale-bucket cleanup and the watermark commit together
+        cursor = limits_conn.cursor()
+        cursor.execute("DROP TABLE IF EXISTS temp.touched_buckets")
+        cursor.execute("""
+            CREATE TEMP TABLE touched_buckets (
+                individual_id TEXT, period_type TEXT, period_date TEXT,
+                PRIMARY KEY (individual_id, period_type, period_date)
+            )
+        """)
+        cursor.executemany("INSERT OR IGNORE INTO touched_buckets VALUES (?, ?, ?)", touched)
+        cursor.executemany(
+            "DELETE FROM touched_buckets WHERE individual_id = ? AND period_type = ? AND period_date = ?",
+            [row[:3] for row in upserts]
+        )
+        cursor.execute("""
+            DELETE FROM violations
+            WHERE (individual_id, period_type, period_date) IN (
+                SELECT individual_id, period_type, period_date FROM touched_buckets
+            )
+        """)
+        stats["cleared"] = cursor.rowcount
+        cursor.executemany(UPSERT_VIOLATION_SQL, upserts)
+        cursor.execute("""
+            INSERT INTO monitor_state (name, last_id, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (name) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at
+        """, (WATERMARK_NAME, high))
+        cursor.execute("DROP TABLE temp.touched_buckets")
+        limits_conn.commit()
+        stats["watermark"] = high
+
+        # Only after the violations are committed; a failed run re-checks them
+        if not queued.empty:
+            accounts_conn.execute("DELETE FROM deleted_days WHERE id <= ?", (int(queued["id"].max()),))
+            accounts_conn.commit()
+    finally:
+        accounts_conn.close()
+        limits_conn.close()
+
+    stats["elapsed_seconds"] = time.perf_counter() - start
+    logger.info(
+        f"Checked {stats['new_transactions']} new transactions and {stats['deleted_days']} deleted days: "
+        f"{stats['violations']} violations saved, "
+        f"{stats['cleared']} cleared, watermark {stats['watermark']}"
+    )
+    return stats
+
+
+def main(argv=None):
+    """Command line entry point for scheduled monitoring runs"""
+    parser = argparse.ArgumentParser(description="Check newly ingested transactions against the saved limits")
+    parser.add_argument("--accounts-db", default=ACCOUNTS_DB_FILE,
+                        help=f"Multiple Accounts database (default: {ACCOUNTS_DB_FILE})")
+    parser.add_argument("--limits-db", default=LIMITS_DB_FILE,
+                        help=f"Limit monitoring database (default: {LIMITS_DB_FILE})")
+    args = parser.parse_args(argv)
+
+    stats = run(args.accounts_db, args.limits_db)
+    print(
+        f"Checked {stats['new_transactions']:,} new transactions and {stats['deleted_days']:,} deleted days "
+        f"in {stats['buckets']:,} buckets: "
+        f"{stats['violations']:,} violations saved, {stats['cleared']:,} cleared "
+        f"(watermark {stats['watermark']}, {stats['elapsed_seconds']:.2f}s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Pickle-free storage format for the fraud detection pipeline.
+
+The pipeline pickle holds an XGBClassifier, a StandardScaler and a
+LabelEncoder. Exporting writes the booster in XGBoost's native UBJSON format
+and the scaler and encoder parameters as plain JSON arrays next to it:
+
+    fraud_detection_pipeline.ubj   booster
+    fraud_detection_pipeline.json  preprocessing parameters and metadata
+
+Loading these needs no unpickling, is stable across scikit-learn and XGBoost
+releases, and is much faster than joblib.load. Export from the command line:
+
+    python model_artifacts.py fraud_detection_pipeline.pkl
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Constants
+FORMAT_VERSION = 1
+PICKLE_PATH = "fraud_detection_pipeline.pkl"
+NATIVE_PATH = "fraud_detection_pipeline.json"
+
+
+def booster_path(json_path):
+    """Return the booster file that belongs to a pipeline metadata file"""
+    return os.path.splitext(json_path)[0] + ".ubj"
+
+
+def export_native(pipeline, json_path=NATIVE_PATH):
+    """
+    Write a pipeline dict (model, scaler, label_encoder) in the native format.
+
+    The booster is written first and the metadata file last, so the metadata
+    mtime marks a complete export.
+    """
+    model_file = booster_path(json_path)
+    pipeline["model"].save_model(model_file)
+
+    scaler = pipeline["scaler"]
+    metadata = {
+        "format_version": FORMAT_VERSION,
+        "booster_file": os.path.basename(model_file),
+        "model_classes": np.asarray(pipeline["model"].classes_).tolist(),
+        "scaler": {
+            "feature_names": [str(name) for name in getattr(scaler, "feature_names_in_", [])],
+            "mean": scaler.mean_.tolist(),
+            "scale": scaler.scale_.tolist(),
+            "var": scaler.var_.tolist(),
+            "n_samples_seen": int(scaler.n_samples_seen_)
+        },
+        "label_encoder": {
+            "classes": [str(name) for name in pipeline["label_encoder"].classes_]
+        }
+    }
+
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, json_path)
+    logger.info(f"Exported pipeline to {json_path} and {model_file}")
+
+
+def load_native(json_path=NATIVE_PATH):
+    """
+    Load a pipeline dict written by export_native.
+
+    Returns the same structure as the pickle: an XGBClassifier, a fitted
+    StandardScaler and a fitted LabelEncoder, rebuilt from plain parameters.
+    """
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    from xgboost import XGBClassifier
+
+    with open(json_path) as f:
+        metadata = json.load(f)
+    if metadata.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported pipeline format version: {metadata.get('format_version')}")
+
+    model = XGBClassifier()
+    model.load_model(os.path.join(os.path.dirname(os.path.abspath(json_path)), metadata["booster_file"]))
+
+    params = metadata["scaler"]
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(params["mean"], dtype=np.float64)
+    scaler.scale_ = np.asarray(params["scale"], dtype=np.float64)
+    scaler.var_ = np.asarray(params["var"], dtype=np.float64)
+    scaler.n_samples_seen_ = params["n_samples_seen"]
+    scaler.n_features_in_ = len(scaler.mean_)
+    if params["feature_names"]:
+        scaler.feature_names_in_ = np.asarray(params["feature_names"], dtype=object)
+
+    label_encoder = LabelEncoder()
+    label_encoder.classes_ = np.asarray(metadata["label_encoder"]["classes"], dtype=object)
+
+    return {"model": model, "scaler": scaler, "label_encoder": label_encoder}
+
+
+def main(argv=None):
+    """Command line entry point for exporting a pickled pipeline"""
+    parser = argparse.ArgumentParser(description="Export the fraud detection pipeline to the native format")
+    parser.add_argument("pickle", nargs="?", default=PICKLE_PATH, help=f"Pipeline pickle (default: {PICKLE_PATH})")
+    parser.add_argument("--out", default=None, help="Metadata file to write (default: pickle name with .json)")
+    args = parser.parse_args(argv)
+
+    json_path = args.out or os.path.splitext(args.pickle)[0] + ".json"
+
+    start = time.perf_counter()
+    pipeline = joblib.load(args.pickle)
+    pickle_seconds = time.perf_counter() - start
+
+    export_native(pipeline, json_path)
+
+    start = time.perf_counter()
+    load_native(json_path)
+    native_seconds = time.perf_counter() - start
+
+    print(f"Wrote {json_path} and {booster_path(json_path)}")
+    print(f"Load time: pickle {pickle_seconds * 1000:.0f} ms, native {native_seconds * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Process-wide cache of loaded model artifacts.
+
+Streamlit re-runs page scripts on every interaction, but imported modules
+stay loaded, so models kept here are loaded once per process and shared by
+every session. Entries are keyed by absolute path and reloaded only when the
+file's modification time changes.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_entries = {}
+
+
+def _rss_bytes():
+    """Return the current resident set size of this process, or None if unknown"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in kilobytes on Linux and bytes on macOS
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def get_model(path, loader=joblib.load):
+    """
+    Return the registry entry for the artifact at path, loading it if needed.
+
+    The entry is a dict with the loaded object under "model" plus "path",
+    "mtime", "load_seconds", "footprint_bytes" (process memory growth during
+    the load, None if unknown), "loaded_at" and "cache_hits". Raises
+    FileNotFoundError if path does not exist.
+    """
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+
+    with _lock:
+        entry = _entries.get(path)
+        if entry is not None and entry["mtime"] == mtime:
+            entry["cache_hits"] += 1
+            return entry
+
+        if entry is not None:
+            logger.info(f"Model file changed, reloading {path}")
+
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        model = loader(path)
+        load_seconds = time.perf_counter() - start
+        rss_after = _rss_bytes()
+
+        footprint = None
+        if rss_before is not None and rss_after is not None:
+            footprint = max(rss_after - rss_before, 0)
+
+        entry = {
+            "model": model,
+            "path": path,
+            "mtime": mtime,
+            "load_seconds": load_seconds,
+            "footprint_bytes": footprint,
+            "loaded_at": time.time(),
+            "cache_hits": 0
+        }
+        _entries[path] = entry
+        logger.info(f"Loaded {path} in {load_seconds * 1000:.0f} ms")
+        return entry
+
+
+def clear(path=None):
+    """Drop one cached artifact, or all of them when path is None"""
+    with _lock:
+        if path is None:
+            _entries.clear()
+        else:
+            _entries.pop(os.path.abspath(path), None)
@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import io
 from datetime import datetime, timedelta
 import sys
@@ -11,6 +10,13 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from auth import require_auth, get_current_user
 from sidebar import render_sidebar
 from theme_utils import apply_custom_theme
+import db_pool
+import federated
+import pagination
+import query_cache
+import rollups
+from ingest import DEFAULT_CHUNK_SIZE, UPLOAD_TYPES, iter_chunks, ingest_csv, prepare
+import exports
 
 # Constants
 DB_FILE = "transactions.db"
@@ -96,8 +102,8 @@ def main():
                 )
                 
                 # Export option
-                if st.button("Export to CSV"):
-                    export_to_csv(multi_accounts_df)
+                if st.button("Export Data"):
+                    export_data(multi_accounts_df, key="multiple_accounts")
                 
                 # Individual detail expander
                 st.subheader("Individual Detail View")
@@ -108,7 +114,7 @@ def main():
                 
                 if selected_individual:
                     try:
-                        with get_db_connection() as conn:
+                        with db_pool.connection(DB_FILE) as conn:
                             individual_txns = pd.read_sql_query(
                                 "SELECT * FROM transactions WHERE individual_id = ? ORDER BY timestamp",
                                 conn,
@@ -152,6 +158,8 @@ def main():
                                         "timestamp": st.column_config.DatetimeColumn(format="D MMM YYYY, h:mm a"),
                                     }
                                 )
+                                
+                                render_cross_module_profile(selected_individual)
                     except Exception as e:
                         st.error(f"Error loading individual details: {str(e)}")
             else:
@@ -168,13 +176,13 @@ def main():
         This module is designed to identify individuals who hold accounts across multiple financial institutions, which may indicate potential risk or fraud patterns.
         
         ### Key Features
-        - **Data Upload**: Upload transaction data in CSV format
+        - **Data Upload**: Upload transaction data as CSV, Parquet or Arrow files
         - **Multiple Account Analysis**: Identify individuals with accounts at multiple banks
         - **Individual Details**: View detailed transaction history for specific individuals
         - **Database Management**: View, filter, and export transaction data stored in the system
         
         ### Data Requirements
-        For proper analysis, your CSV files should include these fields:
+        For proper analysis, your files should include these fields:
         - `transaction_id`: Unique transaction identifier
         - `individual_id`: Identifier for the individual (customer)
         - `account_id`: Account identifier 
@@ -187,56 +195,14 @@ def main():
         which may require additional scrutiny according to AML/CFT regulations.
         """)
 
-def get_db_pool():
-    """Create and return a database connection pool."""
-    return sqlite3.connect(DB_FILE)
-
 def get_db_connection():
-    """Context manager for database connections."""
-    return sqlite3.connect(DB_FILE)
+    """Check out a pooled database connection; close() returns it."""
+    return db_pool.connect(DB_FILE)
 
-def init_database(conn=None):
-    """Initialize the database with necessary tables and indices."""
-    close_conn = False
-    if conn is None:
-        conn = sqlite3.connect(DB_FILE)
-        close_conn = True
-    
+def init_database():
+    """Create the tables and indices on the first render of this process."""
     try:
-        conn.executescript("""
-            PRAGMA journal_mode=WAL;
-            PRAGMA synchronous=NORMAL;
-            PRAGMA cache_size=-2000;
-            PRAGMA temp_store=MEMORY;
-            
-            -- Create accounts table if not exists
-            CREATE TABLE IF NOT EXISTS accounts (
-                account_id TEXT PRIMARY KEY,
-                individual_id TEXT NOT NULL,
-                bank_name TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'active'
-            );
-            
-            -- Create transactions table if not exists
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                transaction_id TEXT UNIQUE NOT NULL,
-                individual_id TEXT NOT NULL,
-                account_id TEXT NOT NULL,
-                bank_name TEXT NOT NULL,
-                amount REAL NOT NULL,
-                timestamp TIMESTAMP NOT NULL
-            );
-            
-            -- Create indices if not exists
-            CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions(timestamp);
-            CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions(account_id);
-            CREATE INDEX IF NOT EXISTS idx_accounts_individual ON accounts(individual_id);
-        """)
-        
-        if close_conn:
-            conn.commit()
+        prepare(DB_FILE)
     except Exception as e:
         st.error(f"Database initialization error: {str(e)}")
 
@@ -245,38 +211,9 @@ def get_db_stats():
     try:
         conn = get_db_connection()
         
-        # Get basic stats
+        # Totals come from the materialized rollups, not from scanning transactions
         try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM transactions")
-            total_records = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(DISTINCT individual_id) FROM transactions")
-            unique_individuals = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT SUM(amount) FROM transactions")
-            total_amount = cursor.fetchone()[0]
-            
-            # Get multiple accounts stats
-            multiple_accounts_query = """
-                SELECT COUNT(*) FROM (
-                    SELECT individual_id
-                    FROM transactions
-                    GROUP BY individual_id
-                    HAVING COUNT(DISTINCT bank_name) > 1
-                )
-            """
-            cursor.execute(multiple_accounts_query)
-            multiple_accounts_count = cursor.fetchone()[0]
-            
-            stats = {
-                "total_records": total_records or 0,
-                "unique_individuals": unique_individuals or 0,
-                "total_amount": total_amount or 0,
-                "multiple_accounts_count": multiple_accounts_count or 0
-            }
-            
-            return stats
+            return rollups.transaction_stats(conn)
         finally:
             conn.close()
     except Exception as e:
@@ -316,58 +253,31 @@ def validate_dataframe(df):
     
     return True
 
-def save_to_database(df):
-    """Save validated DataFrame to the database."""
+def save_to_database(uploaded_file, total_rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream an uploaded file into the database using the bulk ingest path."""
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    
+    def report_progress(rows_done, total_rows, rows_per_sec):
+        progress_bar.progress(min(rows_done / total_rows, 1.0) if total_rows else 1.0)
+        status_text.text(f"Saved {rows_done:,} of {total_rows:,} rows ({rows_per_sec:,.0f} rows/sec)")
+    
     try:
         conn = get_db_connection()
         
         try:
-            # Process accounts first
-            accounts_df = df[['individual_id', 'account_id', 'bank_name']].drop_duplicates()
-            
-            # Check if accounts already exist
-            for _, row in accounts_df.iterrows():
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT account_id FROM accounts WHERE account_id = ?", 
-                    (row['account_id'],)
-                )
-                
-                if cursor.fetchone() is None:
-                    cursor.execute(
-                        "INSERT INTO accounts (account_id, individual_id, bank_name) VALUES (?, ?, ?)",
-                        (row['account_id'], row['individual_id'], row['bank_name'])
-                    )
-            
-            # Process transactions
-            for _, row in df.iterrows():
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT transaction_id FROM transactions WHERE transaction_id = ?", 
-                    (row['transaction_id'],)
-                )
-                
-                if cursor.fetchone() is None:
-                    cursor.execute(
-                        """
-                        INSERT INTO transactions (
-                            transaction_id, individual_id, account_id, bank_name, amount, timestamp
-                        ) VALUES (?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            row['transaction_id'], 
-                            row['individual_id'],
-                            row['account_id'],
-                            row['bank_name'],
-                            float(row['amount']),
-                            row['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-                        )
-                    )
-            
-            conn.commit()
+            stats = ingest_csv(
+                uploaded_file, conn=conn, chunk_size=chunk_size,
+                total_rows=total_rows, progress_callback=report_progress
+            )
+            status_text.text(
+                f"Inserted {stats['rows_inserted']:,} new transactions "
+                f"({stats['rows_read'] - stats['rows_inserted']:,} already stored) "
+                f"in {stats['elapsed_seconds']:.1f}s"
+            )
+            pagination.invalidate(DB_FILE)
             return True
         except Exception as e:
-            conn.rollback()
             st.error(f"Error saving data: {str(e)}")
             return False
         finally:
@@ -376,70 +286,66 @@ def save_to_database(df):
         st.error(f"Database connection error: {str(e)}")
         return False
 
-def get_paginated_data(page, page_size=PAGE_SIZE, date_range=None, bank_filter=None, min_accounts=1):
-    """Get paginated transaction data with filters."""
+def get_paginated_data(cursor=None, page_size=PAGE_SIZE, date_range=None, bank_filter=None, min_accounts=1):
+    """Get one page of transaction data with filters, starting after cursor.
+    
+    Returns the page, the total number of pages and matching records (None
+    while a filtered count is still being computed) and the cursor of the
+    next page.
+    """
     try:
         conn = get_db_connection()
         
-        # Build query with filters
-        query = "SELECT * FROM transactions"
         params = []
         where_clauses = []
         
         if date_range and len(date_range) == 2:
-            where_clauses.append("timestamp BETWEEN ? AND ?")
-            params.extend([date_range[0], date_range[1]])
+            # Half-open range on the raw column: uses the timestamp index and
+            # includes the whole end date
+            where_clauses.append("timestamp >= date(?) AND timestamp < date(?, '+1 day')")
+            params.extend([date_range[0].isoformat(), date_range[1].isoformat()])
         
         if bank_filter:
             where_clauses.append("bank_name = ?")
             params.append(bank_filter)
         
         if min_accounts > 1:
-            # Only include individuals with multiple accounts
-            subquery = """
-                individual_id IN (
-                    SELECT individual_id 
-                    FROM transactions 
-                    GROUP BY individual_id 
-                    HAVING COUNT(DISTINCT bank_name) >= ?
-                )
-            """
-            where_clauses.append(subquery)
+            # Only include individuals with multiple accounts; the unary + keeps
+            # the planner on the timestamp index the keyset order needs
+            where_clauses.append("+individual_id IN (SELECT individual_id FROM individual_rollup WHERE bank_count >= ?)")
             params.append(min_accounts)
         
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
-        
-        # Add ordering and pagination
-        query += " ORDER BY timestamp DESC"
-        
-        # Get total count for pagination
-        count_query = f"SELECT COUNT(*) FROM ({query})"
-        cursor = conn.cursor()
-        cursor.execute(count_query, params)
-        total_count = cursor.fetchone()[0]
-        
-        # Add limit and offset for pagination
-        query += f" LIMIT {page_size} OFFSET {page * page_size}"
-        
-        # Execute query
-        df = pd.read_sql_query(query, conn, params=params, parse_dates=['timestamp'])
-        
-        conn.close()
+        try:
+            # Keyset pagination: constant cost however deep the page is
+            df, next_cursor = pagination.fetch_page(
+                conn, "transactions", where_clauses, params, cursor=cursor, page_size=page_size
+            )
+            
+            # Unfiltered and per-bank totals are exact in the rollups; other
+            # filters use a count cached and refreshed in the background
+            if not where_clauses:
+                total_count = rollups.transaction_stats(conn)["total_records"]
+            elif where_clauses == ["bank_name = ?"]:
+                row = conn.execute("SELECT tx_count FROM bank_rollup WHERE bank_name = ?", params).fetchone()
+                total_count = row[0] if row else 0
+            else:
+                count_query = "SELECT COUNT(*) FROM transactions WHERE " + " AND ".join(where_clauses)
+                total_count = pagination.cached_count(DB_FILE, count_query, params)
+        finally:
+            conn.close()
         
-        # Calculate total pages
-        total_pages = (total_count + page_size - 1) // page_size
+        if not df.empty:
+            df["timestamp"] = pd.to_datetime(df["timestamp"])
         
-        return df, total_pages, total_count
+        return df, pagination.total_pages(total_count, page_size), total_count, next_cursor
     except Exception as e:
         st.error(f"Error retrieving data: {str(e)}")
-        return pd.DataFrame(), 0, 0
+        return pd.DataFrame(), 0, 0, None
 
+@query_cache.cached(DB_FILE)
 def get_multiple_accounts_data():
     """Get data about individuals with multiple accounts."""
     try:
-        conn = get_db_connection()
-        
         # Query to find individuals with multiple bank accounts
         query = """
             WITH individual_banks AS (
@@ -464,29 +370,51 @@ def get_multiple_accounts_data():
             ORDER BY bank_count DESC, total_amount DESC
         """
         
-        df = pd.read_sql_query(query, conn, parse_dates=['first_transaction', 'last_transaction'])
-        conn.close()
+        with db_pool.connection(DB_FILE) as conn:
+            df = pd.read_sql_query(query, conn, parse_dates=['first_transaction', 'last_transaction'])
         
         return df
     except Exception as e:
         st.error(f"Error retrieving multiple accounts data: {str(e)}")
         return None
 
-def export_to_csv(df):
-    """Export DataFrame to CSV."""
+def export_data(df, key=None):
+    """Offer DataFrame as CSV, Parquet or Arrow download."""
     try:
-        csv = df.to_csv(index=False).encode('utf-8')
-        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        st.download_button(
-            label="Download CSV File",
-            data=csv,
-            file_name=f"multiple_accounts_{timestamp}.csv",
-            mime="text/csv",
-        )
+        exports.render_download_buttons(df, f"multiple_accounts_{timestamp}", key=key)
     except Exception as e:
         st.error(f"Error exporting data: {str(e)}")
 
+def render_cross_module_profile(individual_id):
+    """Show an individual's violations, fraud scores and alerts from the other modules"""
+    try:
+        profile = federated.individual_profile(individual_id)
+    except Exception as e:
+        st.error(f"Error loading cross-module profile: {str(e)}")
+        return
+
+    summary = profile["summary"] or {}
+    st.write("**Cross-Module Activity:**")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Limit Violations", summary.get("violations", len(profile["violations"])))
+    col2.metric("Suspicious Transactions", summary.get("suspicious_transactions", 0))
+    col3.metric("Alerts", summary.get("alerts", len(profile["alerts"])))
+
+    sections = [
+        ("Limit Violations", "violations"),
+        ("Fraud Scores", "fraud_scores"),
+        ("Financial Alerts", "alerts")
+    ]
+    for title, key in sections:
+        df = profile[key]
+        with st.expander(f"{title} ({len(df)})"):
+            if df.empty:
+                st.info(f"No {title.lower()} recorded for {individual_id}.")
+            else:
+                st.dataframe(df, use_container_width=True, hide_index=True)
+
+
 def render_database_management():
     st.header("📁 Database Management")
     
@@ -516,9 +444,8 @@ def render_database_management():
         with col2:
             # Get unique banks for filter
             try:
-                conn = get_db_connection()
-                banks_df = pd.read_sql_query("SELECT DISTINCT bank_name FROM transactions", conn)
-                conn.close()
+                with db_pool.connection(DB_FILE) as conn:
+                    banks_df = pd.read_sql_query("SELECT bank_name FROM bank_rollup ORDER BY bank_name", conn)
                 
                 bank_options = ["All Banks"] + banks_df['bank_name'].tolist()
                 bank_filter = st.selectbox("Bank", bank_options)
@@ -530,30 +457,39 @@ def render_database_management():
         with col3:
             min_accounts = st.number_input("Min. Number of Banks", min_value=1, max_value=10, value=1)
         
-        # Initialize session state for pagination
-        if "current_page" not in st.session_state:
+        # Initialize session state for pagination; page_cursors[n] is the
+        # cursor that fetches page n, and is reset whenever the filters change
+        filter_key = (str(date_range), bank_filter, min_accounts)
+        if st.session_state.get("page_filter_key") != filter_key:
+            st.session_state.page_filter_key = filter_key
             st.session_state.current_page = 0
+            st.session_state.page_cursors = [None]
         
         # Get paginated data
         page = st.session_state.current_page
-        df, total_pages, total_records = get_paginated_data(
-            page, PAGE_SIZE, date_range, bank_filter, min_accounts
+        df, total_pages, total_records, next_cursor = get_paginated_data(
+            st.session_state.page_cursors[page], PAGE_SIZE, date_range, bank_filter, min_accounts
         )
         
         if not df.empty:
-            st.write(f"Showing {len(df)} of {total_records:,} records")
+            if total_records is None:
+                st.write(f"Showing {len(df)} records (counting matches...)")
+            else:
+                st.write(f"Showing {len(df)} of {total_records:,} records")
             
             # Pagination controls
             col1, col2, col3 = st.columns([2, 3, 2])
             with col1:
                 if page > 0 and st.button("⬅️ Previous Page"):
                     st.session_state.current_page = page - 1
+                    st.session_state.page_cursors = st.session_state.page_cursors[:page]
                     st.rerun()
             with col2:
-                st.write(f"Page {page + 1} of {total_pages}")
+                st.write(f"Page {page + 1} of {total_pages}" if total_pages is not None else f"Page {page + 1}")
             with col3:
-                if page < total_pages - 1 and st.button("Next Page ➡️"):
+                if next_cursor is not None and st.button("Next Page ➡️"):
                     st.session_state.current_page = page + 1
+                    st.session_state.page_cursors = st.session_state.page_cursors[:page + 1] + [next_cursor]
                     st.rerun()
             
             # Display data
@@ -570,31 +506,23 @@ def render_database_management():
             # Export option
             if st.button("Export All Transactions"):
                 try:
-                    conn = get_db_connection()
-                    
                     # Build query with the same filters
                     query = "SELECT * FROM transactions"
                     params = []
                     where_clauses = []
                     
                     if date_range and len(date_range) == 2:
-                        where_clauses.append("timestamp BETWEEN ? AND ?")
-                        params.extend([date_range[0], date_range[1]])
+                        where_clauses.append("timestamp >= date(?) AND timestamp < date(?, '+1 day')")
+                        params.extend([date_range[0].isoformat(), date_range[1].isoformat()])
                     
                     if bank_filter:
                         where_clauses.append("bank_name = ?")
                         params.append(bank_filter)
                     
                     if min_accounts > 1:
-                        subquery = """
-                            individual_id IN (
-                                SELECT individual_id 
-                                FROM transactions 
-                                GROUP BY individual_id 
-                                HAVING COUNT(DISTINCT bank_name) >= ?
-                            )
-                        """
-                        where_clauses.append(subquery)
+                        where_clauses.append(
+                            "individual_id IN (SELECT individual_id FROM individual_rollup WHERE bank_count >= ?)"
+                        )
                         params.append(min_accounts)
                     
                     if where_clauses:
@@ -603,11 +531,11 @@ def render_database_management():
                     query += " ORDER BY timestamp DESC"
                     
                     # Execute query without pagination
-                    all_data = pd.read_sql_query(query, conn, params=params, parse_dates=['timestamp'])
-                    conn.close()
+                    with db_pool.connection(DB_FILE) as conn:
+                        all_data = pd.read_sql_query(query, conn, params=params, parse_dates=['timestamp'])
                     
                     # Export all data
-                    export_to_csv(all_data)
+                    export_data(all_data, key="all_transactions")
                 except Exception as e:
                     st.error(f"Error exporting all transactions: {str(e)}")
         else:
@@ -625,12 +553,9 @@ def render_database_management():
         if delete_option == "Delete All Data":
             if st.button("Delete All Transaction Data", type="primary"):
                 try:
-                    conn = get_db_connection()
-                    cursor = conn.cursor()
-                    cursor.execute("DELETE FROM transactions")
-                    count = cursor.rowcount
-                    conn.commit()
-                    conn.close()
+                    with db_pool.connection(DB_FILE) as conn:
+                        count = rollups.delete_transactions(conn)
+                    pagination.invalidate(DB_FILE)
                     st.success(f"Successfully deleted {count} transaction records.")
                     st.rerun()
                 except Exception as e:
@@ -645,15 +570,13 @@ def render_database_management():
             
             if len(date_range) == 2 and st.button("Delete Transactions in Selected Date Range", type="primary"):
                 try:
-                    conn = get_db_connection()
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "DELETE FROM transactions WHERE timestamp BETWEEN ? AND ?",
-                        [date_range[0].strftime('%Y-%m-%d'), date_range[1].strftime('%Y-%m-%d 23:59:59')]
-                    )
-                    count = cursor.rowcount
-                    conn.commit()
-                    conn.close()
+                    with db_pool.connection(DB_FILE) as conn:
+                        count = rollups.delete_transactions(
+                            conn,
+                            "timestamp >= date(?) AND timestamp < date(?, '+1 day')",
+                            [date_range[0].isoformat(), date_range[1].isoformat()]
+                        )
+                    pagination.invalidate(DB_FILE)
                     st.success(f"Successfully deleted {count} transaction records.")
                     st.rerun()
                 except Exception as e:
@@ -661,9 +584,8 @@ def render_database_management():
         
         elif delete_option == "Delete by Bank":
             try:
-                conn = get_db_connection()
-                banks_df = pd.read_sql_query("SELECT DISTINCT bank_name FROM transactions", conn)
-                conn.close()
+                with db_pool.connection(DB_FILE) as conn:
+                    banks_df = pd.read_sql_query("SELECT bank_name FROM bank_rollup ORDER BY bank_name", conn)
                 
                 if not banks_df.empty:
                     bank_to_delete = st.selectbox(
@@ -673,15 +595,13 @@ def render_database_management():
                     
                     if st.button("Delete Transactions from Selected Bank", type="primary"):
                         try:
-                            conn = get_db_connection()
-                            cursor = conn.cursor()
-                            cursor.execute(
-                                "DELETE FROM transactions WHERE bank_name = ?",
-                                [bank_to_delete]
-                            )
-                            count = cursor.rowcount
-                            conn.commit()
-                            conn.close()
+                            with db_pool.connection(DB_FILE) as conn:
+                                count = rollups.delete_transactions(
+                                    conn,
+                                    "bank_name = ?",
+                                    [bank_to_delete]
+                                )
+                            pagination.invalidate(DB_FILE)
                             st.success(f"Successfully deleted {count} transaction records from {bank_to_delete}.")
                             st.rerun()
                         except Exception as e:
@@ -701,25 +621,53 @@ def get_or_upload_dataframe():
     )
     
     if option == "Upload New Data":
-        uploaded_file = st.file_uploader("Upload transaction data (CSV)", type=["csv"])
+        uploaded_file = st.file_uploader("Upload transaction data (CSV, Parquet or Arrow)", type=UPLOAD_TYPES)
         
         if uploaded_file is not None:
             try:
-                df = pd.read_csv(uploaded_file, parse_dates=['timestamp'])
-                
-                if validate_dataframe(df):
-                    st.success(f"Successfully loaded {len(df)} transactions")
-                    
-                    if st.button("Save to Database"):
-                        if save_to_database(df):
-                            st.success("Data saved to database successfully!")
-                            return df
-                        else:
-                            st.error("Failed to save data to database.")
+                # file_id is new for every upload, so reruns reuse the validation of this one
+                upload_key = uploaded_file.file_id
+                if st.session_state.get("upload_key") != upload_key:
+                    # Validate chunk by chunk so large exports never sit in memory whole
+                    df = None
+                    total_rows = 0
+                    for chunk in iter_chunks(uploaded_file):
+                        if not validate_dataframe(chunk):
+                            return None
+                        if df is None:
+                            df = chunk.head(PAGE_SIZE)
+                        total_rows += len(chunk)
                     
-                    return df
-                else:
+                    st.session_state.upload_key = upload_key
+                    st.session_state.upload_preview = df
+                    st.session_state.upload_rows = total_rows
+                
+                df = st.session_state.upload_preview
+                total_rows = st.session_state.upload_rows
+                
+                if df is None:
+                    st.error("The uploaded data is empty")
                     return None
+                
+                st.success(f"Successfully loaded {total_rows} transactions")
+                
+                chunk_size = st.number_input(
+                    "Rows per commit",
+                    min_value=1000,
+                    max_value=1000000,
+                    value=DEFAULT_CHUNK_SIZE,
+                    step=1000,
+                    help="Number of rows inserted per database transaction"
+                )
+                
+                if st.button("Save to Database"):
+                    if save_to_database(uploaded_file, total_rows, chunk_size):
+                        st.success("Data saved to database successfully!")
+                        return df
+                    else:
+                        st.error("Failed to save data to database.")
+                
+                return df
             except Exception as e:
                 st.error(f"Error loading file: {str(e)}")
                 return None
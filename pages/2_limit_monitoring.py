@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import sqlite3
 from sqlite3 import Error
 import io
 import plotly.express as px
@@ -14,6 +13,12 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from sidebar import render_sidebar
 from theme_utils import apply_custom_theme
+import db_pool
+import limit_engine
+import limit_monitor
+import query_cache
+import exports
+from ingest import UPLOAD_TYPES, iter_chunks, read_columns
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +30,14 @@ logger = logging.getLogger(__name__)
 
 # Constants
 DB_FILE = "transaction_monitoring.db"
+ACCOUNTS_DB_FILE = "transactions.db"
+REQUIRED_COLUMNS = ['individual_id', 'amount', 'timestamp']
+COMPACT_EVERY_CHUNKS = 10
+# Uploads are compacted to daily buckets for calendar periods, and to
+# minutes for rolling windows so window edges stay accurate
+CALENDAR_FREQ = "D"
+ROLLING_FREQ = "min"
+DETECTION_MODES = ["Calendar periods", "Rolling windows"]
 
 # Page configuration
 st.set_page_config(
@@ -77,7 +90,7 @@ def create_connection():
     """Create a database connection to a SQLite database"""
     conn = None
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = db_pool.connect(DB_FILE)
         return conn
     except Error as e:
         logger.error(f"Error connecting to database: {e}")
@@ -85,67 +98,12 @@ def create_connection():
     return conn
 
 def initialize_database():
-    """Initialize the database with required tables"""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            
-            # Create settings table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS settings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    setting_name TEXT UNIQUE,
-                    setting_value REAL,
-                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create violations table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS violations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    individual_id TEXT,
-                    period_type TEXT,
-                    period_date TEXT,
-                    amount REAL,
-                    num_accounts INTEGER,
-                    num_banks INTEGER,
-                    bank_names TEXT,
-                    account_ids TEXT,
-                    transaction_count INTEGER,
-                    limit_value REAL,
-                    violation_type TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create uploaded_files table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS uploaded_files (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    filename TEXT,
-                    upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    record_count INTEGER
-                )
-            ''')
-            
-            # Insert default limits if they don't exist
-            cursor.execute('''
-                INSERT OR IGNORE INTO settings (setting_name, setting_value)
-                VALUES 
-                    ('daily_limit', 1000.0),
-                    ('weekly_limit', 5000.0),
-                    ('monthly_limit', 10000.0)
-            ''')
-            
-            conn.commit()
-            logger.info("Database initialized successfully")
-        except Error as e:
-            logger.error(f"Error initializing database: {e}")
-            st.error(f"Error initializing database: {e}")
-        finally:
-            conn.close()
+    """Create the tables on the first render of this process"""
+    try:
+        limit_monitor.prepare(DB_FILE)
+    except Error as e:
+        logger.error(f"Error initializing database: {e}")
+        st.error(f"Error initializing database: {e}")
 
 def save_settings_to_db(limits):
     """Save current limits to database"""
@@ -213,78 +171,28 @@ def get_settings_from_db():
     return limits
 
 def save_violations_to_db(violations_data, limits):
-    """Save violations data to database"""
+    """
+    Save violations data to database.
+    
+    Rows are upserted on (individual_id, period_type, period_date), so saving
+    the same file again updates its violations instead of duplicating them.
+    """
     conn = create_connection()
     if conn is not None:
         try:
-            cursor = conn.cursor()
-            
-            # Count total violations to be inserted
-            total_violations = (
-                len(violations_data['daily_violations']) + 
-                len(violations_data['weekly_violations']) + 
-                len(violations_data['monthly_violations'])
-            )
-            
-            inserted_count = 0
-            
-            # Save daily violations
-            for _, row in violations_data['daily_violations'].iterrows():
-                violation_type = 'Direct Violation' if row['amount'] > limits['daily'] else 'Potential Circumvention'
-                cursor.execute('''
-                    INSERT INTO violations (
-                        individual_id, period_type, period_date, amount, 
-                        num_accounts, num_banks, bank_names, account_ids, 
-                        transaction_count, limit_value, violation_type
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    row['individual_id'], 'daily', str(row['date']), row['amount'],
-                    row['num_accounts'], row['num_banks'], row['bank_name'], row['account_id'],
-                    row['transaction_id'], limits['daily'], violation_type
-                ))
-                inserted_count += 1
-            
-            # Save weekly violations
-            for _, row in violations_data['weekly_violations'].iterrows():
-                violation_type = 'Direct Violation' if row['amount'] > limits['weekly'] else 'Potential Circumvention'
-                period_date = f"Week {row['week']}, {row['year']}"
-                cursor.execute('''
-                    INSERT INTO violations (
-                        individual_id, period_type, period_date, amount, 
-                        num_accounts, num_banks, bank_names, account_ids, 
-                        transaction_count, limit_value, violation_type
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    row['individual_id'], 'weekly', period_date, row['amount'],
-                    row['num_accounts'], row['num_banks'], row['bank_name'], row['account_id'],
-                    row['transaction_id'], limits['weekly'], violation_type
-                ))
-                inserted_count += 1
-            
-            # Save monthly violations
-            for _, row in violations_data['monthly_violations'].iterrows():
-                violation_type = 'Direct Violation' if row['amount'] > limits['monthly'] else 'Potential Circumvention'
-                period_date = f"{row['month']}/{row['year']}"
-                cursor.execute('''
-                    INSERT INTO violations (
-                        individual_id, period_type, period_date, amount, 
-                        num_accounts, num_banks, bank_names, account_ids, 
-                        transaction_count, limit_value, violation_type
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    row['individual_id'], 'monthly', period_date, row['amount'],
-                    row['num_accounts'], row['num_banks'], row['bank_name'], row['account_id'],
-                    row['transaction_id'], limits['monthly'], violation_type
-                ))
-                inserted_count += 1
+            rolling = violations_data.get('rolling', False)
+            rows = []
+            for period in limit_engine.PERIODS:
+                violations = violations_data[f'{period}_violations']
+                if not violations.empty:
+                    rows.extend(limit_monitor.violation_rows(violations, period, limits, rolling))
             
+            conn.executemany(limit_monitor.UPSERT_VIOLATION_SQL, rows)
             conn.commit()
-            logger.info(f"Saved {inserted_count} violations to database")
-            return inserted_count
+            logger.info(f"Saved {len(rows)} violations to database")
+            return len(rows)
         except Error as e:
+            conn.rollback()
             logger.error(f"Error saving violations to database: {e}")
             st.error(f"Error saving violations to database: {e}")
             return 0
@@ -309,60 +217,12 @@ def save_uploaded_file_info(filename, record_count):
         finally:
             conn.close()
 
-def analyze_limits(df, limits):
+def analyze_limits(df, limits, rolling=False):
     """Analyze transactions against limits and identify violations"""
     try:
-        # Process timestamps
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['date'] = df['timestamp'].dt.date
-        df['week'] = df['timestamp'].dt.isocalendar().week
-        df['month'] = df['timestamp'].dt.month
-        df['year'] = df['timestamp'].dt.year
-
-        # Calculate totals by individual and time period
-        daily_totals = df.groupby(['individual_id', 'date']).agg({
-            'amount': 'sum',
-            'bank_name': lambda x: ', '.join(sorted(set(x))),
-            'account_id': lambda x: ', '.join(sorted(set(x))),
-            'transaction_id': 'count'
-        }).reset_index()
-        
-        weekly_totals = df.groupby(['individual_id', 'year', 'week']).agg({
-            'amount': 'sum',
-            'bank_name': lambda x: ', '.join(sorted(set(x))),
-            'account_id': lambda x: ', '.join(sorted(set(x))),
-            'transaction_id': 'count'
-        }).reset_index()
-        
-        monthly_totals = df.groupby(['individual_id', 'year', 'month']).agg({
-            'amount': 'sum',
-            'bank_name': lambda x: ', '.join(sorted(set(x))),
-            'account_id': lambda x: ', '.join(sorted(set(x))),
-            'transaction_id': 'count'
-        }).reset_index()
-
-        # Add bank and account counts
-        for df_totals in [daily_totals, weekly_totals, monthly_totals]:
-            df_totals['num_banks'] = df_totals['bank_name'].str.count(',') + 1
-            df_totals['num_accounts'] = df_totals['account_id'].str.count(',') + 1
-
-        # Identify violations and potential circumvention
-        daily_violations = daily_totals[
-            (daily_totals['amount'] > limits['daily']) |
-            ((daily_totals['amount'] >= limits['daily'] * 0.8) & (daily_totals['num_accounts'] > 1))
-        ]
-        
-        weekly_violations = weekly_totals[
-            (weekly_totals['amount'] > limits['weekly']) |
-            ((weekly_totals['amount'] >= limits['weekly'] * 0.8) & (weekly_totals['num_accounts'] > 1))
-        ]
-        
-        monthly_violations = monthly_totals[
-            (monthly_totals['amount'] > limits['monthly']) |
-            ((monthly_totals['amount'] >= limits['monthly'] * 0.8) & (monthly_totals['num_accounts'] > 1))
-        ]
-
-        return daily_violations, weekly_violations, monthly_violations
+        if rolling:
+            return limit_engine.rolling_violations(df, limits)
+        return limit_engine.analyze_limits(df, limits)
     except Exception as e:
         logger.error(f"Error in limit analysis: {e}")
         st.error(f"Error analyzing limits: {e}")
@@ -382,6 +242,52 @@ def preprocess_dataframe(df):
         st.error(f"Error preprocessing data: {str(e)}")
         return None
 
+def compact_transactions(df, freq=CALENDAR_FREQ):
+    """Reduce transactions to totals per individual, bank, account and time bucket"""
+    df = df.copy()
+    if 'transaction_count' not in df.columns:
+        df['transaction_count'] = 1
+    for col in ['bank_name', 'account_id']:
+        if col not in df.columns:
+            df[col] = 'Unknown'
+        df[col] = df[col].astype(str)
+    df['timestamp'] = df['timestamp'].dt.floor(freq)
+    
+    return df.groupby(['individual_id', 'timestamp', 'bank_name', 'account_id'], as_index=False).agg({
+        'amount': 'sum',
+        'transaction_count': 'sum'
+    })
+
+def load_upload_in_chunks(uploaded_file, freq=CALENDAR_FREQ):
+    """Stream an uploaded file, validating and compacting it one chunk at a time"""
+    preview_df = None
+    partials = []
+    record_count = 0
+    
+    for chunk in iter_chunks(
+        uploaded_file,
+        required_columns=REQUIRED_COLUMNS,
+        optional_columns=['transaction_id', 'account_id', 'bank_name']
+    ):
+        chunk = preprocess_dataframe(chunk)
+        if chunk is None:
+            return None, None, 0
+        
+        if preview_df is None:
+            preview_df = chunk.head(10)
+        record_count += len(chunk)
+        partials.append(compact_transactions(chunk, freq))
+        
+        # Keep the accumulated partial totals bounded
+        if len(partials) >= COMPACT_EVERY_CHUNKS:
+            partials = [compact_transactions(pd.concat(partials, ignore_index=True), freq)]
+    
+    if not partials:
+        return None, None, 0
+    
+    df = compact_transactions(pd.concat(partials, ignore_index=True), freq)
+    return df, preview_df, record_count
+
 def get_violations_from_db(period_type=None, limit=100):
     """Get violations from database"""
     conn = create_connection()
@@ -407,20 +313,19 @@ def get_violations_from_db(period_type=None, limit=100):
             conn.close()
     return pd.DataFrame()
 
-def export_to_csv(df, filename):
-    """Export DataFrame to CSV"""
+def export_data(df, base_name):
+    """Offer DataFrame as CSV, Parquet or Arrow download"""
     if df.empty:
         st.error("No data to export.")
         return
     
-    csv = df.to_csv(index=False)
-    st.download_button(
-        label="Download CSV",
-        data=csv,
-        file_name=filename,
-        mime="text/csv"
-    )
+    try:
+        exports.render_download_buttons(df, base_name, key=base_name)
+    except Exception as e:
+        logger.error(f"Export error: {e}")
+        st.error(f"Error exporting data: {e}")
 
+@query_cache.cached(DB_FILE)
 def get_violation_stats():
     """Get statistics about violations"""
     conn = create_connection()
@@ -507,124 +412,139 @@ with col1:
         save_settings_to_db(st.session_state.transaction_limits)
         st.success("Limits saved to database!")
 
+with col2:
+    st.subheader("Stored Transactions")
+    st.caption("Check transactions ingested on the Multiple Accounts page since the last check")
+    if st.button("Check New Transactions"):
+        try:
+            with st.spinner("Checking new transactions..."):
+                stats = limit_monitor.run(ACCOUNTS_DB_FILE, DB_FILE, st.session_state.transaction_limits)
+            if stats['new_transactions'] == 0 and stats['deleted_days'] == 0:
+                st.info("No new or deleted transactions since the last check.")
+            else:
+                st.success(
+                    f"Checked {stats['new_transactions']:,} new transactions and "
+                    f"{stats['deleted_days']:,} deleted days: "
+                    f"{stats['violations']:,} violations saved, {stats['cleared']:,} cleared."
+                )
+        except Exception as e:
+            logger.error(f"Error checking new transactions: {e}")
+            st.error(f"Error checking new transactions: {e}")
+
 # Main tabs
 tab1, tab2, tab3, tab4 = st.tabs(["Upload & Process", "Violation History", "Statistics", "Export"])
 
 with tab1:
     st.header("Upload Transactions")
     
+    # Calendar periods check the date, ISO week and month; rolling windows
+    # check every 24 hour, 7 day and 30 day span
+    detection_mode = st.radio(
+        "Detection Mode",
+        DETECTION_MODES,
+        horizontal=True,
+        help="Rolling windows also catch spending split across midnight, week or month boundaries"
+    )
+    rolling = detection_mode == "Rolling windows"
+    
     # File uploader
-    uploaded_file = st.file_uploader("Upload CSV", type="csv")
+    uploaded_file = st.file_uploader("Upload transactions (CSV, Parquet or Arrow)", type=UPLOAD_TYPES)
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file)
-            df = preprocess_dataframe(df)
+            # file_id is new for every upload, so reruns reuse the compacted buckets of
+            # this one; the buckets depend on the mode, so it is part of the key
+            upload_key = (uploaded_file.file_id, rolling)
+            if st.session_state.get("limit_upload_key") == upload_key:
+                df, preview_df, record_count = st.session_state.limit_upload
+            elif not all(col in read_columns(uploaded_file) for col in REQUIRED_COLUMNS):
+                st.error("File must contain individual_id, amount, and timestamp columns!")
+                df = None
+            else:
+                df, preview_df, record_count = load_upload_in_chunks(
+                    uploaded_file, ROLLING_FREQ if rolling else CALENDAR_FREQ
+                )
+                if df is not None:
+                    st.session_state.limit_upload_key = upload_key
+                    st.session_state.limit_upload = (df, preview_df, record_count)
             
             if df is not None:
-                if not all(col in df.columns for col in ['individual_id', 'amount', 'timestamp']):
-                    st.error("CSV must contain individual_id, amount, and timestamp columns!")
-                else:
-                    # Store in session state
-                    st.session_state.transactions_df = df
+                # Store in session state
+                st.session_state.transactions_df = df
+                
+                # Display preview
+                st.subheader("Data Preview")
+                st.dataframe(preview_df)
+                
+                # Results are kept in session state, so they survive the
+                # rerun triggered by the save button below
+                if st.button("Process Transactions"):
+                    limits = dict(st.session_state.transaction_limits)
+                    daily_violations, weekly_violations, monthly_violations = analyze_limits(df, limits, rolling)
                     
-                    # Display preview
-                    st.subheader("Data Preview")
-                    st.dataframe(df.head(10))
+                    st.session_state.violations_data = {
+                        'daily_violations': daily_violations,
+                        'weekly_violations': weekly_violations,
+                        'monthly_violations': monthly_violations,
+                        'rolling': rolling,
+                        'limits': limits,
+                        'upload_key': upload_key
+                    }
+                
+                violations_data = st.session_state.get('violations_data')
+                if violations_data is not None and violations_data.get('upload_key') == upload_key:
+                    limits = violations_data['limits']
+                    daily_violations = violations_data['daily_violations']
+                    weekly_violations = violations_data['weekly_violations']
+                    monthly_violations = violations_data['monthly_violations']
                     
-                    # Process data button
-                    if st.button("Process Transactions"):
-                        daily_violations, weekly_violations, monthly_violations = analyze_limits(
-                            df, st.session_state.transaction_limits
-                        )
-                        
-                        violations_data = {
-                            'daily_violations': daily_violations,
-                            'weekly_violations': weekly_violations,
-                            'monthly_violations': monthly_violations
-                        }
-                        
-                        # Store in session state
-                        st.session_state.violations_data = violations_data
-                        
-                        # Display violations summary
-                        st.subheader("Violations Summary")
-                        
-                        total_violations = len(daily_violations) + len(weekly_violations) + len(monthly_violations)
-                        
-                        # Violations metrics
-                        col1, col2, col3, col4 = st.columns(4)
-                        with col1:
-                            st.metric("Daily Violations", len(daily_violations))
-                        with col2:
-                            st.metric("Weekly Violations", len(weekly_violations))
-                        with col3:
-                            st.metric("Monthly Violations", len(monthly_violations))
-                        with col4:
-                            st.metric("Total Violations", total_violations)
-                        
-                        # Display detailed violations
-                        if total_violations > 0:
-                            # Format daily violations
-                            if not daily_violations.empty:
-                                st.subheader("Daily Violations")
-                                display_daily = daily_violations.copy()
-                                display_daily['violation_type'] = display_daily.apply(
-                                    lambda x: 'Direct Violation' if x['amount'] > st.session_state.transaction_limits['daily'] 
-                                    else 'Potential Circumvention', axis=1
-                                )
-                                display_daily['limit'] = st.session_state.transaction_limits['daily']
-                                display_daily['over_limit'] = display_daily['amount'] - display_daily['limit']
-                                display_daily['over_limit_percent'] = (display_daily['over_limit'] / display_daily['limit']) * 100
-                                
-                                cols_to_display = ['individual_id', 'date', 'amount', 'num_accounts', 'num_banks', 
-                                                'limit', 'over_limit', 'over_limit_percent', 'violation_type']
-                                st.dataframe(display_daily[cols_to_display])
-                            
-                            # Format weekly violations
-                            if not weekly_violations.empty:
-                                st.subheader("Weekly Violations")
-                                display_weekly = weekly_violations.copy()
-                                display_weekly['period'] = display_weekly.apply(
-                                    lambda x: f"Week {x['week']}, {x['year']}", axis=1
-                                )
-                                display_weekly['violation_type'] = display_weekly.apply(
-                                    lambda x: 'Direct Violation' if x['amount'] > st.session_state.transaction_limits['weekly'] 
-                                    else 'Potential Circumvention', axis=1
-                                )
-                                display_weekly['limit'] = st.session_state.transaction_limits['weekly']
-                                display_weekly['over_limit'] = display_weekly['amount'] - display_weekly['limit']
-                                display_weekly['over_limit_percent'] = (display_weekly['over_limit'] / display_weekly['limit']) * 100
-                                
-                                cols_to_display = ['individual_id', 'period', 'amount', 'num_accounts', 'num_banks', 
-                                                'limit', 'over_limit', 'over_limit_percent', 'violation_type']
-                                st.dataframe(display_weekly[cols_to_display])
+                    # Display violations summary
+                    st.subheader("Violations Summary")
+                    
+                    total_violations = len(daily_violations) + len(weekly_violations) + len(monthly_violations)
+                    
+                    # Violations metrics
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("24h Window Violations" if rolling else "Daily Violations", len(daily_violations))
+                    with col2:
+                        st.metric("7 Day Window Violations" if rolling else "Weekly Violations", len(weekly_violations))
+                    with col3:
+                        st.metric("30 Day Window Violations" if rolling else "Monthly Violations", len(monthly_violations))
+                    with col4:
+                        st.metric("Total Violations", total_violations)
+                    
+                    # Display detailed violations
+                    if total_violations > 0:
+                        for period in limit_engine.PERIODS:
+                            violations = violations_data[f'{period}_violations']
+                            if violations.empty:
+                                continue
                             
-                            # Format monthly violations
-                            if not monthly_violations.empty:
-                                st.subheader("Monthly Violations")
-                                display_monthly = monthly_violations.copy()
-                                display_monthly['period'] = display_monthly.apply(
-                                    lambda x: f"{x['month']}/{x['year']}", axis=1
-                                )
-                                display_monthly['violation_type'] = display_monthly.apply(
-                                    lambda x: 'Direct Violation' if x['amount'] > st.session_state.transaction_limits['monthly'] 
-                                    else 'Potential Circumvention', axis=1
-                                )
-                                display_monthly['limit'] = st.session_state.transaction_limits['monthly']
-                                display_monthly['over_limit'] = display_monthly['amount'] - display_monthly['limit']
-                                display_monthly['over_limit_percent'] = (display_monthly['over_limit'] / display_monthly['limit']) * 100
-                                
-                                cols_to_display = ['individual_id', 'period', 'amount', 'num_accounts', 'num_banks', 
-                                                'limit', 'over_limit', 'over_limit_percent', 'violation_type']
-                                st.dataframe(display_monthly[cols_to_display])
+                            limit = limits[period]
+                            if rolling:
+                                st.subheader(f"Rolling {limit_engine.ROLLING_WINDOWS[period][0]} Violations")
+                            else:
+                                st.subheader(f"{period.capitalize()} Violations")
+                            display_violations = violations.copy()
+                            display_violations['period'] = limit_engine.period_dates(violations, period)
+                            display_violations['violation_type'] = display_violations['amount'].gt(limit).map(
+                                {True: 'Direct Violation', False: 'Potential Circumvention'}
+                            )
+                            display_violations['limit'] = limit
+                            display_violations['over_limit'] = display_violations['amount'] - display_violations['limit']
+                            display_violations['over_limit_percent'] = (display_violations['over_limit'] / display_violations['limit']) * 100
                             
-                            # Save violations button
-                            if st.button("Save Violations to Database"):
-                                inserted_count = save_violations_to_db(violations_data, st.session_state.transaction_limits)
-                                save_uploaded_file_info(uploaded_file.name, len(df))
-                                st.success(f"Successfully saved {inserted_count} violations to database.")
-                        else:
-                            st.info("No violations found in the uploaded data.")
+                            cols_to_display = ['individual_id', 'period', 'amount', 'num_accounts', 'num_banks', 
+                                            'limit', 'over_limit', 'over_limit_percent', 'violation_type']
+                            st.dataframe(display_violations[cols_to_display])
+                        
+                        # Save violations button
+                        if st.button("Save Violations to Database"):
+                            saved_count = save_violations_to_db(violations_data, limits)
+                            save_uploaded_file_info(uploaded_file.name, record_count)
+                            st.success(f"Successfully saved {saved_count} violations to database.")
+                    else:
+                        st.info("No violations found in the uploaded data.")
         except Exception as e:
             logger.error(f"Error processing upload: {str(e)}")
             st.error(f"Error processing upload: {str(e)}")
@@ -637,7 +557,8 @@ with tab2:
     with col1:
         period_filter = st.selectbox(
             "Period Type",
-            ["All", "daily", "weekly", "monthly"]
+            ["All", "daily", "weekly", "monthly"] +
+            [limit_engine.period_type(period, rolling=True) for period in limit_engine.PERIODS]
         )
     
     # Get violations from database
@@ -768,7 +689,7 @@ with tab4:
             summary_df = pd.DataFrame(summary_data)
             st.dataframe(summary_df)
             
-            export_to_csv(summary_df, "violations_summary.csv")
+            export_data(summary_df, "violations_summary")
         else:
             st.info("No violation statistics available for export.")
     
@@ -776,7 +697,7 @@ with tab4:
         violations = get_violations_from_db('daily')
         if not violations.empty:
             st.dataframe(violations)
-            export_to_csv(violations, "daily_violations.csv")
+            export_data(violations, "daily_violations")
         else:
             st.info("No daily violations available for export.")
     
@@ -784,7 +705,7 @@ with tab4:
         violations = get_violations_from_db('weekly')
         if not violations.empty:
             st.dataframe(violations)
-            export_to_csv(violations, "weekly_violations.csv")
+            export_data(violations, "weekly_violations")
         else:
             st.info("No weekly violations available for export.")
     
@@ -792,7 +713,7 @@ with tab4:
         violations = get_violations_from_db('monthly')
         if not violations.empty:
             st.dataframe(violations)
-            export_to_csv(violations, "monthly_violations.csv")
+            export_data(violations, "monthly_violations")
         else:
             st.info("No monthly violations available for export.")
     
@@ -800,7 +721,7 @@ with tab4:
         violations = get_violations_from_db()
         if not violations.empty:
             st.dataframe(violations)
-            export_to_csv(violations, "all_violations.csv")
+            export_data(violations, "all_violations")
         else:
             st.info("No violations available for export.")
 
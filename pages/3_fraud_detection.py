@@ -1,13 +1,10 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
 from datetime import datetime, timedelta
-import sqlite3
 import os
 import sys
 import hashlib
-from typing import Optional, Tuple, Dict, Any
 import logging
 import tempfile
 import zipfile
@@ -22,6 +19,12 @@ import uuid
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from sidebar import render_sidebar
 from theme_utils import apply_custom_theme
+import exports
+from ingest import UPLOAD_TYPES, iter_chunks
+from fraud_engine import (
+    DB_FILE, FRAUD_TABLE, MODEL_PATH, REQUIRED_COLUMNS, RESULT_COLUMNS,
+    DataFrame, DatabaseManager, FraudDetector
+)
 
 # Configure logging
 logging.basicConfig(
@@ -31,13 +34,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Constants
-DB_FILE = "fraud_detection.db"
-FRAUD_TABLE = "fraud_detection_results"
-USER_TABLE = "users"
-PAGE_SIZE = 50  # Records per page
-MODEL_PATH = "fraud_detection_pipeline.pkl"
-
 # Configure page
 st.set_page_config(
     page_title="Fraud Detection System",
@@ -84,43 +80,6 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
-# Database schema
-SCHEMA = {
-    FRAUD_TABLE: f"""
-    CREATE TABLE IF NOT EXISTS {FRAUD_TABLE} (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        transaction_id TEXT UNIQUE,
-        individual_id TEXT,
-        account_id TEXT,
-        bank_name TEXT,
-        amount REAL,
-        daily_total REAL,
-        weekly_total REAL,
-        monthly_total REAL,
-        n_accounts INTEGER,
-        fraud_probability REAL,
-        predicted_suspicious INTEGER,
-        timestamp TEXT,
-        processed_at TEXT DEFAULT CURRENT_TIMESTAMP,
-        analyst_notes TEXT,
-        status TEXT CHECK(status IN ('pending', 'reviewed', 'confirmed', 'false_positive')) DEFAULT 'pending'
-    )
-    """,
-    USER_TABLE: f"""
-    CREATE TABLE IF NOT EXISTS {USER_TABLE} (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE,
-        password_hash TEXT,
-        full_name TEXT,
-        role TEXT CHECK(role IN ('analyst', 'supervisor', 'admin')),
-        last_login TEXT,
-        is_active INTEGER DEFAULT 1
-    )
-    """
-}
-
-# Type aliases
-DataFrame = pd.DataFrame
 # Define a simple class for styling, as pd.io.formats.style.Styler is not available
 class SimpleStyler:
     def __init__(self, df):
@@ -132,264 +91,6 @@ class SimpleStyler:
     def format(self, format_dict):
         return self
 
-class DatabaseManager:
-    """Handles all database operations with connection pooling and error handling."""
-    
-    def __init__(self, db_file: str = DB_FILE):
-        self.db_file = db_file
-        self._initialize_database()
-        
-    def _initialize_database(self) -> None:
-        """Initialize database with required tables."""
-        try:
-            with self._get_connection() as conn:
-                for table, schema in SCHEMA.items():
-                    conn.execute(schema)
-                conn.commit()
-            logger.info("Database initialized successfully")
-        except Exception as e:
-            logger.error(f"Database initialization failed: {str(e)}")
-            raise
-    
-    def _get_connection(self) -> sqlite3.Connection:
-        """Get a database connection with proper configuration."""
-        conn = sqlite3.connect(self.db_file)
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA foreign_keys=ON")
-        conn.row_factory = sqlite3.Row
-        return conn
-    
-    def execute_query(self, query: str, params: tuple = (), fetch: bool = False) -> Any:
-        """Execute a SQL query with error handling."""
-        try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(query, params)
-                conn.commit()
-                return cursor.fetchall() if fetch else None
-        except sqlite3.Error as e:
-            logger.error(f"Database error: {str(e)}")
-            raise
-    
-    def save_results(self, df: DataFrame) -> bool:
-        """Save fraud detection results to database."""
-        try:
-            with self._get_connection() as conn:
-                df.to_sql(FRAUD_TABLE, conn, if_exists="append", index=False)
-                return True
-        except Exception as e:
-            logger.error(f"Error saving results: {str(e)}")
-            return False
-    
-    def get_paginated_results(self, page: int, filters: dict = None) -> Tuple[DataFrame, int]:
-        """Get paginated results with optional filters."""
-        base_query = f"SELECT * FROM {FRAUD_TABLE}"
-        count_query = f"SELECT COUNT(*) FROM {FRAUD_TABLE}"
-        
-        where_clauses = []
-        params = []
-        
-        if filters:
-            if filters.get("date_range"):
-                start_date, end_date = filters["date_range"]
-                where_clauses.append("date(timestamp) BETWEEN ? AND ?")
-                params.extend([start_date, end_date])
-            if filters.get("status"):
-                where_clauses.append("status = ?")
-                params.append(filters["status"])
-            if filters.get("suspicious") is not None:
-                where_clauses.append("predicted_suspicious = ?")
-                params.append(int(filters["suspicious"]))
-        
-        if where_clauses:
-            where_statement = " WHERE " + " AND ".join(where_clauses)
-            base_query += where_statement
-            count_query += where_statement
-        
-        # Add sorting and pagination
-        base_query += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
-        params.extend([PAGE_SIZE, page * PAGE_SIZE])
-        
-        try:
-            with self._get_connection() as conn:
-                total_records = conn.execute(count_query, params[:-2] if params else []).fetchone()[0]
-                df = pd.read_sql_query(base_query, conn, params=params)
-                total_pages = (total_records + PAGE_SIZE - 1) // PAGE_SIZE
-                return df, total_pages
-        except Exception as e:
-            logger.error(f"Error fetching paginated results: {str(e)}")
-            return pd.DataFrame(), 0
-    
-    def get_database_stats(self) -> Dict[str, Any]:
-        """Get database statistics and metrics."""
-        stats = {}
-        try:
-            with self._get_connection() as conn:
-                # Basic counts
-                stats["total_records"] = conn.execute(f"SELECT COUNT(*) FROM {FRAUD_TABLE}").fetchone()[0]
-                stats["suspicious_count"] = conn.execute(
-                    f"SELECT COUNT(*) FROM {FRAUD_TABLE} WHERE predicted_suspicious = 1"
-                ).fetchone()[0]
-                
-                # Date range
-                min_max = conn.execute(
-                    f"SELECT MIN(timestamp), MAX(timestamp) FROM {FRAUD_TABLE}"
-                ).fetchone()
-                stats["date_range"] = (min_max[0], min_max[1]) if min_max else (None, None)
-                
-                # Status distribution
-                status_counts = conn.execute(
-                    f"SELECT status, COUNT(*) as count FROM {FRAUD_TABLE} GROUP BY status"
-                ).fetchall()
-                stats["status_distribution"] = {row[0]: row[1] for row in status_counts}
-                
-                # Recent activity
-                recent_activity = conn.execute(
-                    f"SELECT strftime('%Y-%m-%d', processed_at) as day, COUNT(*) as count "
-                    f"FROM {FRAUD_TABLE} "
-                    f"GROUP BY day ORDER BY day DESC LIMIT 7"
-                ).fetchall()
-                stats["recent_activity"] = {row[0]: row[1] for row in recent_activity}
-                
-                return stats
-        except Exception as e:
-            logger.error(f"Error getting database stats: {str(e)}")
-            return {}
-
-class FraudDetector:
-    """Handles fraud detection model loading and predictions."""
-    
-    def __init__(self, model_path: str = MODEL_PATH):
-        self.model_path = model_path
-        self.pipeline = self._load_model()
-        
-    def _load_model(self) -> Optional[Dict[str, Any]]:
-        """Load the fraud detection pipeline from disk."""
-        try:
-            if not os.path.exists(self.model_path):
-                logger.warning(f"Model file not found at {self.model_path}")
-                return None
-            
-            pipeline = joblib.load(self.model_path)
-            if not all(key in pipeline for key in ["model", "scaler", "label_encoder"]):
-                logger.error("Invalid pipeline structure")
-                return None
-                
-            logger.info("Model loaded successfully")
-            return pipeline
-        except Exception as e:
-            logger.error(f"Error loading model: {str(e)}")
-            return None
-    
-    def preprocess_data(self, df: DataFrame) -> DataFrame:
-        """Preprocess transaction data for fraud detection."""
-        required_columns = {"transaction_id", "individual_id", "account_id", "bank_name", "amount", "timestamp"}
-        if not required_columns.issubset(df.columns):
-            missing = required_columns - set(df.columns)
-            logger.error(f"Missing required columns: {missing}")
-            raise ValueError(f"Missing required columns: {missing}")
-        
-        try:
-            # Convert timestamp and extract temporal features
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
-            df["date"] = df["timestamp"].dt.date
-            df["hour"] = df["timestamp"].dt.hour
-            df["weekday"] = df["timestamp"].dt.weekday
-            df["week"] = df["timestamp"].dt.isocalendar().week
-            df["month"] = df["timestamp"].dt.month
-            
-            # Transaction aggregations
-            df["daily_total"] = df.groupby(["individual_id", "date"])["amount"].transform("sum")
-            df["weekly_total"] = df.groupby(["individual_id", "week"])["amount"].transform("sum")
-            df["monthly_total"] = df.groupby(["individual_id", "month"])["amount"].transform("sum")
-            df["daily_txn_count"] = df.groupby(["individual_id", "date"])["transaction_id"].transform("count")
-            df["weekly_txn_count"] = df.groupby(["individual_id", "week"])["transaction_id"].transform("count")
-            df["monthly_txn_count"] = df.groupby(["individual_id", "month"])["transaction_id"].transform("count")
-            
-            # Account features
-            df["n_accounts"] = df.groupby("individual_id")["account_id"].transform("nunique")
-            
-            # Threshold flags
-            df["exceeds_daily"] = (df["daily_total"] > 1000).astype(int)
-            df["exceeds_weekly"] = (df["weekly_total"] > 5000).astype(int)
-            df["exceeds_monthly"] = (df["monthly_total"] > 10000).astype(int)
-            
-            # Normalized amounts
-            df["avg_amount_per_account_daily"] = df["daily_total"] / df["n_accounts"].replace(0, 1)
-            df["avg_amount_per_account_weekly"] = df["weekly_total"] / df["n_accounts"].replace(0, 1)
-            df["avg_amount_per_account_monthly"] = df["monthly_total"] / df["n_accounts"].replace(0, 1)
-            
-            logger.info(f"Preprocessed {len(df)} transactions")
-            return df
-        except Exception as e:
-            logger.error(f"Error preprocessing data: {str(e)}")
-            raise
-    
-    def predict(self, df: DataFrame) -> DataFrame:
-        """Make fraud predictions on processed transaction data."""
-        if self.pipeline is None:
-            st.error("Fraud detection model not loaded. Please ensure model file exists.")
-            return df
-            
-        try:
-            # Prepare feature matrix with exact column names
-            features = [
-                "amount", "bank_name", "hour", "weekday", 
-                "daily_total", "weekly_total", "monthly_total",
-                "daily_txn_count", "weekly_txn_count", "monthly_txn_count",
-                "n_accounts", "exceeds_daily", "exceeds_weekly", "exceeds_monthly",
-                "avg_amount_per_account_daily", "avg_amount_per_account_weekly", 
-                "avg_amount_per_account_monthly"
-            ]
-
-            # Create feature matrix with correct column order
-            X = pd.DataFrame()
-            for feature in features:
-                if feature in df.columns:
-                    X[feature] = df[feature]
-                else:
-                    logger.error(f"Missing required feature: {feature}")
-                    st.error(f"Missing required feature: {feature}")
-                    return df
-            
-            # Encode bank names after creating the feature matrix
-            try:
-                X["bank_name"] = self.pipeline["label_encoder"].transform(X["bank_name"])
-            except ValueError as e:
-                logger.warning(f"Error encoding bank names: {str(e)}")
-                # Handle unknown bank names by mapping to the most common category
-                # Or you could add a special "unknown" category in the encoder
-                X["bank_name"] = 0  # Default to first category for unknown banks
-            
-            # Scale numeric features
-            numeric_cols = [
-                "amount", "daily_total", "weekly_total", "monthly_total",
-                "daily_txn_count", "weekly_txn_count", "monthly_txn_count",
-                "n_accounts", "avg_amount_per_account_daily",
-                "avg_amount_per_account_weekly", "avg_amount_per_account_monthly"
-            ]
-            X[numeric_cols] = self.pipeline["scaler"].transform(X[numeric_cols])
-            
-            # Make predictions
-            y_prob = self.pipeline["model"].predict_proba(X)[:, 1]
-            y_pred = (y_prob >= 0.3).astype(int)  # Using 0.3 threshold
-            
-            # Add predictions to original dataframe
-            results = df.copy()
-            results["fraud_probability"] = y_prob
-            results["predicted_suspicious"] = y_pred
-            
-            logger.info(f"Made predictions for {len(df)} transactions. Found {y_pred.sum()} suspicious transactions.")
-            return results
-        except Exception as e:
-            logger.error(f"Error making predictions: {str(e)}")
-            st.error(f"Error making predictions: {str(e)}")
-            # Return original dataframe with empty prediction columns
-            results = df.copy()
-            results["fraud_probability"] = None
-            results["predicted_suspicious"] = None
-            return results
-
 def style_dataframe(df):
     """Add styling to the results dataframe."""
     if df is None or df.empty or "predicted_suspicious" not in df.columns:
@@ -410,6 +111,17 @@ def export_to_excel(df: DataFrame) -> bytes:
         df.to_excel(writer, sheet_name='Fraud Detection Results', index=False)
     return output.getvalue()
 
+def render_export_buttons(df: DataFrame, base_name: str, key: str) -> None:
+    """Show the CSV, Parquet and Arrow download buttons, plus Excel."""
+    exports.render_download_buttons(df, base_name, key=key)
+    st.download_button(
+        label="Download Excel",
+        data=export_to_excel(df),
+        file_name=f"{base_name}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        key=f"{key}_xlsx"
+    )
+
 def create_summary_report(df: DataFrame) -> DataFrame:
     """Create a summary report of fraud detection results."""
     if df.empty:
@@ -457,6 +169,15 @@ def main():
     # Check if model is loaded
     if fraud_detector.pipeline is None:
         st.warning(f"⚠️ Model not found at {MODEL_PATH}. Some functionality may be limited.")
+    else:
+        model_info = fraud_detector.model_info
+        footprint = model_info["footprint_bytes"]
+        st.caption(
+            f"Model loaded {datetime.fromtimestamp(model_info['loaded_at']).strftime('%Y-%m-%d %H:%M:%S')} "
+            f"in {model_info['load_seconds'] * 1000:,.0f} ms"
+            + (f" · ~{footprint / (1024 * 1024):,.1f} MB in memory" if footprint is not None else "")
+            + f" · reused {model_info['cache_hits']:,} times"
+        )
     
     # Main navigation
     tabs = st.tabs(["Dashboard", "Upload Data", "Manual Analysis", "Results History", "Export"])
@@ -697,7 +418,7 @@ def main():
             
             # Recent suspicious transactions
             st.subheader("Recent Suspicious Transactions")
-            recent_suspicious, _ = db_manager.get_paginated_results(0, {"suspicious": 1})
+            recent_suspicious, _, _ = db_manager.get_paginated_results({"suspicious": 1})
             
             if not recent_suspicious.empty:
                 # Format for display
@@ -805,15 +526,15 @@ def main():
         
         # Enhanced file uploader with better instructions
         uploaded_file = st.file_uploader(
-            "Drop your CSV transaction data file here",
-            type=["csv"],
-            help="Upload a CSV file with transaction records to analyze for potential fraud patterns"
+            "Drop your transaction data file here",
+            type=UPLOAD_TYPES,
+            help="Upload a CSV, Parquet or Arrow file with transaction records to analyze for potential fraud patterns"
         )
         
         st.markdown("""
         <div class="format-guide">
-            <h4>📋 Required CSV Format</h4>
-            <p>Your CSV file should include the following columns:</p>
+            <h4>📋 Required File Format</h4>
+            <p>Your CSV, Parquet or Arrow file should include the following columns:</p>
             <table>
                 <thead>
                     <tr>
@@ -844,16 +565,38 @@ def main():
         
         if uploaded_file is not None:
             try:
-                # Read the CSV with improved error handling
+                # Read the file with improved error handling
                 try:
-                    df = pd.read_csv(uploaded_file)
+                    # Stream the file once to validate it and build batch-wide aggregates,
+                    # so memory is bounded by the chunk size rather than the file size
+                    # file_id is new for every upload, even of a file with the same name and size
+                    batch_key = uploaded_file.file_id
+                    if st.session_state.get("batch_key") != batch_key:
+                        batch_info = {"rows": 0, "total_amount": 0.0, "preview": None}
+                        
+                        def track_chunks():
+                            for chunk in iter_chunks(uploaded_file, required_columns=REQUIRED_COLUMNS):
+                                if batch_info["preview"] is None:
+                                    batch_info["preview"] = chunk.head(5).copy()
+                                batch_info["rows"] += len(chunk)
+                                batch_info["total_amount"] += float(chunk["amount"].sum())
+                                yield chunk
+                        
+                        try:
+                            aggregates = fraud_detector.aggregate_batch(track_chunks(), history_db=DB_FILE)
+                        except ValueError as e:
+                            st.error(f"❌ Error: {str(e)}")
+                            st.stop()
+                        
+                        st.session_state.batch_key = batch_key
+                        st.session_state.batch_aggregates = aggregates
+                        st.session_state.batch_info = batch_info
                     
-                    # Validate required columns
-                    required_columns = ["transaction_id", "individual_id", "account_id", "bank_name", "amount", "timestamp"]
-                    missing_columns = [col for col in required_columns if col not in df.columns]
+                    aggregates = st.session_state.batch_aggregates
+                    batch_info = st.session_state.batch_info
                     
-                    if missing_columns:
-                        st.error(f"❌ Error: Missing required columns: {', '.join(missing_columns)}")
+                    if batch_info["rows"] == 0:
+                        st.error("❌ The uploaded file is empty. Please upload a file with transaction data.")
                         st.stop()
                     
                     # Show batch statistics
@@ -877,15 +620,15 @@ def main():
                         </div>
                     </div>
                     """.format(
-                        len(df),
-                        df["individual_id"].nunique(),
-                        df["account_id"].nunique(),
-                        df["amount"].sum()
+                        batch_info["rows"],
+                        len(aggregates["n_accounts"]),
+                        aggregates["unique_accounts"],
+                        batch_info["total_amount"]
                     ), unsafe_allow_html=True)
                     
                     # Enhanced data preview with better formatting
                     with st.expander("Data Preview", expanded=True):
-                        preview_df = df.head(5).copy()
+                        preview_df = batch_info["preview"].copy()
                         if "amount" in preview_df.columns:
                             preview_df["amount"] = preview_df["amount"].apply(lambda x: f"${x:,.2f}")
                         if "timestamp" in preview_df.columns:
@@ -905,6 +648,12 @@ def main():
                         </div>
                         """, unsafe_allow_html=True)
                     
+                    save_results = st.checkbox(
+                        "Save results to database while analyzing",
+                        value=False,
+                        help="Each chunk of scored transactions is written to the database as soon as it is processed"
+                    )
+                    
                     # Process button with clearer call to action
                     process_btn = st.button("🔍 Analyze Transactions for Fraud Patterns", type="primary")
                     
@@ -913,32 +662,76 @@ def main():
                         progress_bar = st.progress(0)
                         status_text = st.empty()
                         
-                        # Processing steps with visual feedback
-                        status_text.text("Step 1/4: Preprocessing transaction data...")
-                        progress_bar.progress(25)
-                        # Preprocess data
-                        processed_df = fraud_detector.preprocess_data(df)
+                        db_cols = RESULT_COLUMNS
+                        total_rows = batch_info["rows"]
+                        rows_done = 0
+                        saved_rows = 0
+                        save_failed = False
+                        first_ts, last_ts = None, None
+                        risk_counts = None
+                        amount_counts = None
+                        suspicious_parts = []
                         
-                        status_text.text("Step 2/4: Applying fraud detection model...")
-                        progress_bar.progress(50)
-                        # Make predictions
-                        results_df = fraud_detector.predict(processed_df)
+                        if fraud_detector.pipeline is None:
+                            st.error("Fraud detection model not loaded. Please ensure model file exists.")
+                            st.stop()
                         
-                        status_text.text("Step 3/4: Generating risk insights...")
-                        progress_bar.progress(75)
-                        # Store results in session state
-                        st.session_state.results_df = results_df
+                        # Score chunk by chunk, keeping only suspicious rows and
+                        # running counts for the summary charts
+                        status_text.text(f"Scoring {total_rows:,} transactions...")
+                        chunks = iter_chunks(uploaded_file, required_columns=REQUIRED_COLUMNS)
+                        for scored in fraud_detector.score_chunks(chunks, aggregates):
+                            scored["risk_category"] = pd.cut(
+                                scored["fraud_probability"],
+                                bins=[0, 0.3, 0.7, 1.0],
+                                labels=["Low Risk", "Medium Risk", "High Risk"]
+                            )
+                            scored["amount_bin"] = pd.cut(
+                                scored["amount"],
+                                bins=[0, 100, 500, 1000, 5000, 10000, float('inf')],
+                                labels=["$0-$100", "$100-$500", "$500-$1000", "$1K-$5K", "$5K-$10K", "$10K+"]
+                            )
+                            
+                            chunk_risk = scored["risk_category"].value_counts()
+                            chunk_amounts = scored.groupby(["amount_bin", "risk_category"], observed=True).size()
+                            risk_counts = chunk_risk if risk_counts is None else risk_counts.add(chunk_risk, fill_value=0)
+                            amount_counts = chunk_amounts if amount_counts is None else amount_counts.add(chunk_amounts, fill_value=0)
+                            suspicious_parts.append(scored[scored["predicted_suspicious"] == 1])
+                            
+                            if save_results:
+                                db_df = scored[db_cols].copy()
+                                db_df["timestamp"] = db_df["timestamp"].astype(str)
+                                # Rows already in the results table are skipped, so re-scoring an
+                                # overlapping upload only saves the new transactions
+                                if not db_manager.save_results(db_df, skip_existing=True):
+                                    save_failed = True
+                                elif db_manager.last_saved_count > 0:
+                                    saved_rows += db_manager.last_saved_count
+                                    chunk_first, chunk_last = scored["timestamp"].min(), scored["timestamp"].max()
+                                    first_ts = chunk_first if first_ts is None else min(first_ts, chunk_first)
+                                    last_ts = chunk_last if last_ts is None else max(last_ts, chunk_last)
+                            
+                            rows_done += len(scored)
+                            progress_bar.progress(min(rows_done / total_rows, 1.0))
+                            status_text.text(f"Scored {rows_done:,} of {total_rows:,} transactions...")
+                        
+                        oov_rows = fraud_detector.batch_oov_count
                         
-                        status_text.text("Step 4/4: Preparing visualization...")
-                        progress_bar.progress(100)
+                        results_df = pd.concat(suspicious_parts) if suspicious_parts else pd.DataFrame(columns=db_cols)
                         
-                        # Wait a moment for visual effect
-                        time.sleep(0.5)
+                        # Store results in session state
+                        st.session_state.results_df = results_df
                         status_text.empty()
                         
+                        if oov_rows > 0:
+                            st.warning(
+                                f"⚠️ {oov_rows:,} transactions have a bank the model was not trained on. "
+                                "They were scored with the bank treated as unknown."
+                            )
+                        
                         # Display enhanced results summary
-                        suspicious_count = results_df["predicted_suspicious"].sum()
-                        suspicious_pct = suspicious_count/len(results_df)*100 if len(results_df) > 0 else 0
+                        suspicious_count = len(results_df)
+                        suspicious_pct = suspicious_count/total_rows*100 if total_rows > 0 else 0
                         
                         st.markdown("""
                         <div class="results-summary">
@@ -953,7 +746,7 @@ def main():
                         with col1:
                             st.metric(
                                 "Total Transactions", 
-                                f"{len(results_df):,}",
+                                f"{total_rows:,}",
                                 delta=None
                             )
                             
@@ -971,7 +764,7 @@ def main():
                             st.metric(
                                 "High Risk Transactions",
                                 f"{high_risk:,}",
-                                delta=f"{(high_risk/len(results_df)*100):.1f}% of total" if len(results_df) > 0 else "0%",
+                                delta=f"{(high_risk/total_rows*100):.1f}% of total" if total_rows > 0 else "0%",
                                 delta_color="inverse"
                             )
                         
@@ -979,14 +772,7 @@ def main():
                         st.markdown('<div class="risk-distribution">', unsafe_allow_html=True)
                         st.subheader("Risk Distribution Analysis")
                         
-                        # Create risk categories
-                        results_df["risk_category"] = pd.cut(
-                            results_df["fraud_probability"],
-                            bins=[0, 0.3, 0.7, 1.0],
-                            labels=["Low Risk", "Medium Risk", "High Risk"]
-                        )
-                        
-                        risk_dist = results_df["risk_category"].value_counts().reset_index()
+                        risk_dist = risk_counts.astype(int).sort_values(ascending=False).reset_index()
                         risk_dist.columns = ["Risk Level", "Count"]
                         
                         # Create horizontal bar chart
@@ -1143,15 +929,8 @@ def main():
                                 # Amount distribution analysis
                                 st.markdown("### 💰 Amount Distribution by Risk Level")
                                 
-                                # Create amount bins
-                                results_df["amount_bin"] = pd.cut(
-                                    results_df["amount"],
-                                    bins=[0, 100, 500, 1000, 5000, 10000, float('inf')],
-                                    labels=["$0-$100", "$100-$500", "$500-$1000", "$1K-$5K", "$5K-$10K", "$10K+"]
-                                )
-                                
-                                # Count transactions by amount bin and risk level
-                                amount_dist = results_df.groupby(["amount_bin", "risk_category"]).size().reset_index()
+                                # Transactions by amount bin and risk level, counted while scoring
+                                amount_dist = amount_counts.astype(int).reset_index()
                                 amount_dist.columns = ["Amount Range", "Risk Level", "Count"]
                                 
                                 if not amount_dist.empty:
@@ -1172,51 +951,29 @@ def main():
                                 else:
                                     st.info("No amount distribution data available.")
                         
-                        # Save to database - enhanced UI
-                        st.markdown("### 💾 Save Analysis Results")
-                        
-                        save_col1, save_col2 = st.columns([1, 2])
-                        
-                        with save_col1:
-                            save_btn = st.button("Save Results to Database", type="primary")
-                        
-                        with save_col2:
-                            st.markdown(
-                                "*Save these results to the database for future reference and trend analysis*"
-                            )
-                        
-                        if save_btn:
-                            with st.spinner("Saving results to database..."):
-                                # Prepare data for database
-                                db_cols = [
-                                    "transaction_id", "individual_id", "account_id", "bank_name", 
-                                    "amount", "daily_total", "weekly_total", "monthly_total", 
-                                    "n_accounts", "fraud_probability", "predicted_suspicious", "timestamp"
-                                ]
-                                
-                                db_df = results_df[db_cols].copy()
-                                
-                                # Convert timestamp to string for SQLite
-                                db_df["timestamp"] = db_df["timestamp"].astype(str)
+                        # Results saved while scoring
+                        if save_results:
+                            st.markdown("### 💾 Save Analysis Results")
+                            
+                            if saved_rows > 0:
+                                st.success(f"✅ Successfully saved {saved_rows:,} transaction results to database!")
                                 
-                                # Save to database
-                                if db_manager.save_results(db_df):
-                                    st.success(f"✅ Successfully saved {len(db_df):,} transaction results to database!")
-                                    
-                                    # Show a summary of what was saved
-                                    st.markdown(f"""
-                                    <div style="background-color: #e8f5e9; padding: 15px; border-radius: 5px; margin-top: 10px;">
-                                        <h4>Database Update Summary</h4>
-                                        <ul>
-                                            <li>Total transactions: {len(db_df):,}</li>
-                                            <li>Suspicious transactions: {suspicious_count:,}</li>
-                                            <li>High-risk transactions: {high_risk:,}</li>
-                                            <li>Date range: {pd.to_datetime(db_df['timestamp']).min().strftime('%Y-%m-%d')} to {pd.to_datetime(db_df['timestamp']).max().strftime('%Y-%m-%d')}</li>
-                                        </ul>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                else:
-                                    st.error("❌ Error saving results to database.")
+                                # Show a summary of what was saved
+                                st.markdown(f"""
+                                <div style="background-color: #e8f5e9; padding: 15px; border-radius: 5px; margin-top: 10px;">
+                                    <h4>Database Update Summary</h4>
+                                    <ul>
+                                        <li>Total transactions: {saved_rows:,}</li>
+                                        <li>Suspicious transactions: {suspicious_count:,}</li>
+                                        <li>High-risk transactions: {high_risk:,}</li>
+                                        <li>Date range: {first_ts.strftime('%Y-%m-%d')} to {last_ts.strftime('%Y-%m-%d')}</li>
+                                    </ul>
+                                </div>
+                                """, unsafe_allow_html=True)
+                            elif not save_failed:
+                                st.info("ℹ️ All transactions in this file were already saved to the database.")
+                            if save_failed:
+                                st.error("❌ Error saving results to database.")
                         
                 except pd.errors.EmptyDataError:
                     st.error("❌ The uploaded file is empty. Please upload a file with transaction data.")
@@ -1388,13 +1145,18 @@ def main():
                 manual_df = pd.DataFrame(data)
                 
                 # Process and predict
-                processed_df = fraud_detector.preprocess_data(manual_df)
+                processed_df = fraud_detector.preprocess_data(manual_df, history_db=DB_FILE)
                 results_df = fraud_detector.predict(processed_df)
+                if fraud_detector.last_error:
+                    st.error(fraud_detector.last_error)
                 
                 # Show result
                 st.subheader("Analysis Result")
                 
                 # Result card with enhanced visualization
+                if fraud_detector.last_oov_count:
+                    st.warning(f"⚠️ {bank_name} is not a bank the model was trained on. It was scored as an unknown bank.")
+                
                 is_suspicious = results_df["predicted_suspicious"].iloc[0] == 1
                 probability = results_df["fraud_probability"].iloc[0]
                 
@@ -1581,11 +1343,7 @@ def main():
                 with col1:
                     if st.button("Save Analysis to Database", key="save_analysis"):
                         # Prepare data for database
-                        db_cols = [
-                            "transaction_id", "individual_id", "account_id", "bank_name", 
-                            "amount", "daily_total", "weekly_total", "monthly_total", 
-                            "n_accounts", "fraud_probability", "predicted_suspicious", "timestamp"
-                        ]
+                        db_cols = RESULT_COLUMNS
                         
                         db_df = results_df[db_cols].copy()
                         
@@ -1894,16 +1652,18 @@ def main():
             if "bank_filter" not in filters:
                 filters["bank_filter"] = bank_filter
         
-        # Reset page when applying new filters
-        if apply_filters:
-            st.session_state.page = 0
-        
-        # Get paginated results
-        if "page" not in st.session_state:
+        # Reset page when applying new filters; page_cursors[n] is the
+        # keyset cursor that fetches page n
+        filter_key = repr(sorted(filters.items()))
+        if apply_filters or "page" not in st.session_state or st.session_state.get("page_filter_key") != filter_key:
             st.session_state.page = 0
+            st.session_state.page_cursors = [None]
+            st.session_state.page_filter_key = filter_key
         
         # If filters applied, fetch results
-        results_df, total_pages = db_manager.get_paginated_results(st.session_state.page, filters)
+        results_df, total_pages, next_cursor = db_manager.get_paginated_results(
+            filters, cursor=st.session_state.page_cursors[st.session_state.page]
+        )
         
         # Display results
         if not results_df.empty:
@@ -1913,7 +1673,8 @@ def main():
             with history_tabs[0]:
                 # Enhanced table display
                 st.subheader("Transaction History")
-                st.write(f"Showing {len(results_df)} results (page {st.session_state.page + 1} of {total_pages})")
+                page_label = f"page {st.session_state.page + 1}" + (f" of {total_pages}" if total_pages is not None else "")
+                st.write(f"Showing {len(results_df)} results ({page_label})")
                 
                 # Format for display
                 display_df = results_df.copy()
@@ -1960,20 +1721,10 @@ def main():
                 if save_edits:
                     try:
                         with st.spinner("Saving updates..."):
-                            # Process each row for updates
-                            for idx, row in edited_df.iterrows():
-                                # Get original row
-                                original_row = display_df.iloc[idx]
-                                
-                                # Check if status was modified
-                                if row["status"] != original_row["status"]:
-                                    # Update status in database
-                                    db_manager.execute_query(
-                                        f"UPDATE {FRAUD_TABLE} SET status = ? WHERE transaction_id = ?",
-                                        (row["status"], row["transaction_id"])
-                                    )
+                            # Save every changed status in one transaction
+                            updated = db_manager.update_statuses(display_df[display_cols], edited_df)
                             
-                            st.success("✅ Changes saved successfully!")
+                            st.success(f"✅ Changes saved successfully! ({updated} updated)")
                             time.sleep(1)  # Brief pause for visual feedback
                             st.rerun()  # Refresh to show updated data
                             
@@ -1990,18 +1741,20 @@ def main():
                     if st.session_state.page > 0:
                         if st.button("◀ Previous Page"):
                             st.session_state.page -= 1
+                            st.session_state.page_cursors = st.session_state.page_cursors[:st.session_state.page + 1]
                             st.rerun()
                 
                 with info_col:
                     st.markdown(f"""
                     <div class="page-info">
-                        Page {st.session_state.page + 1} of {total_pages}
+                        {page_label.capitalize()}
                     </div>
                     """, unsafe_allow_html=True)
                 
                 with next_col:
-                    if st.session_state.page < total_pages - 1:
+                    if next_cursor is not None:
                         if st.button("Next Page ▶"):
+                            st.session_state.page_cursors = st.session_state.page_cursors[:st.session_state.page + 1] + [next_cursor]
                             st.session_state.page += 1
                             st.rerun()
                             
@@ -2366,12 +2119,15 @@ def main():
             try:
                 all_results = []
                 page = 0
+                cursor = None
                 while True:
-                    results_df, _ = db_manager.get_paginated_results(page)
+                    results_df, _, cursor = db_manager.get_paginated_results(cursor=cursor)
                     if results_df.empty:
                         break
                     all_results.append(results_df)
                     page += 1
+                    if cursor is None:
+                        break
                     # Limit to 1000 pages (50,000 records) for performance
                     if page >= 1000:
                         break
@@ -2380,23 +2136,9 @@ def main():
                     all_data = pd.concat(all_results)
                     st.write(f"Exporting {len(all_data)} transactions")
                     
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.download_button(
-                            label="Download as CSV",
-                            data=convert_df_to_csv(all_data),
-                            file_name=f"fraud_detection_all_{datetime.now().strftime('%Y%m%d')}.csv",
-                            mime="text/csv"
-                        )
-                    
-                    with col2:
-                        st.download_button(
-                            label="Download as Excel",
-                            data=export_to_excel(all_data),
-                            file_name=f"fraud_detection_all_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
+                    render_export_buttons(
+                        all_data, f"fraud_detection_all_{datetime.now().strftime('%Y%m%d')}", key="export_all"
+                    )
                 else:
                     st.info("No transactions found to export.")
             except Exception as e:
@@ -2407,12 +2149,15 @@ def main():
             try:
                 suspicious_results = []
                 page = 0
+                cursor = None
                 while True:
-                    results_df, _ = db_manager.get_paginated_results(page, {"suspicious": 1})
+                    results_df, _, cursor = db_manager.get_paginated_results({"suspicious": 1}, cursor=cursor)
                     if results_df.empty:
                         break
                     suspicious_results.append(results_df)
                     page += 1
+                    if cursor is None:
+                        break
                     # Limit to 1000 pages for performance
                     if page >= 1000:
                         break
@@ -2421,23 +2166,9 @@ def main():
                     suspicious_data = pd.concat(suspicious_results)
                     st.write(f"Exporting {len(suspicious_data)} suspicious transactions")
                     
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.download_button(
-                            label="Download as CSV",
-                            data=convert_df_to_csv(suspicious_data),
-                            file_name=f"fraud_detection_suspicious_{datetime.now().strftime('%Y%m%d')}.csv",
-                            mime="text/csv"
-                        )
-                    
-                    with col2:
-                        st.download_button(
-                            label="Download as Excel",
-                            data=export_to_excel(suspicious_data),
-                            file_name=f"fraud_detection_suspicious_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
+                    render_export_buttons(
+                        suspicious_data, f"fraud_detection_suspicious_{datetime.now().strftime('%Y%m%d')}", key="export_suspicious"
+                    )
                 else:
                     st.info("No suspicious transactions found to export.")
             except Exception as e:
@@ -2492,7 +2223,7 @@ def main():
                 params = []
                 
                 if "date_range" in filters:
-                    conditions.append("date(timestamp) BETWEEN ? AND ?")
+                    conditions.append("timestamp >= date(?) AND timestamp < date(?, '+1 day')")
                     params.extend(filters["date_range"])
                 
                 if status_filter:
@@ -2507,29 +2238,15 @@ def main():
                 
                 custom_query += " AND ".join(conditions)
                 
-                with db_manager._get_connection() as conn:
+                with db_manager._connection() as conn:
                     custom_data = pd.read_sql_query(custom_query, conn, params=params)
                 
                 if not custom_data.empty:
                     st.write(f"Found {len(custom_data)} transactions matching your criteria")
                     
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.download_button(
-                            label="Download as CSV",
-                            data=convert_df_to_csv(custom_data),
-                            file_name=f"fraud_detection_custom_{datetime.now().strftime('%Y%m%d')}.csv",
-                            mime="text/csv"
-                        )
-                    
-                    with col2:
-                        st.download_button(
-                            label="Download as Excel",
-                            data=export_to_excel(custom_data),
-                            file_name=f"fraud_detection_custom_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
+                    render_export_buttons(
+                        custom_data, f"fraud_detection_custom_{datetime.now().strftime('%Y%m%d')}", key="export_custom"
+                    )
                 else:
                     st.info("No transactions found matching your criteria.")
             except Exception as e:
@@ -2540,12 +2257,15 @@ def main():
             try:
                 all_results = []
                 page = 0
+                cursor = None
                 while True:
-                    results_df, _ = db_manager.get_paginated_results(page)
+                    results_df, _, cursor = db_manager.get_paginated_results(cursor=cursor)
                     if results_df.empty:
                         break
                     all_results.append(results_df)
                     page += 1
+                    if cursor is None:
+                        break
                     # Limit to 1000 pages for performance
                     if page >= 1000:
                         break
@@ -2557,23 +2277,9 @@ def main():
                     st.subheader("Summary Report")
                     st.dataframe(summary_report)
                     
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.download_button(
-                            label="Download as CSV",
-                            data=convert_df_to_csv(summary_report),
-                            file_name=f"fraud_detection_summary_{datetime.now().strftime('%Y%m%d')}.csv",
-                            mime="text/csv"
-                        )
-                    
-                    with col2:
-                        st.download_button(
-                            label="Download as Excel",
-                            data=export_to_excel(summary_report),
-                            file_name=f"fraud_detection_summary_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
+                    render_export_buttons(
+                        summary_report, f"fraud_detection_summary_{datetime.now().strftime('%Y%m%d')}", key="export_summary"
+                    )
                     
                     # Create visualization for summary
                     st.subheader("Top 10 High-Risk Individuals")
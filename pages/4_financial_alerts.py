@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import sys
 import os
 import datetime
@@ -14,16 +13,15 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from auth import require_auth
 from top_navigation import render_top_navigation
 from theme_utils import apply_custom_theme
-import enhanced_financial_alerts as efa
+import alert_analytics
+import alert_engine
+import db_pool
+import status_updates
+import exports
 
 # Constants
 ALERTS_DB = "financial_alerts.db"
-TABLES = [
-    "daily_balance_alerts",
-    "large_transaction_alerts",
-    "pattern_deviation_alerts",
-    "account_status_alerts"
-]
+TABLES = alert_analytics.ALERT_TABLES
 
 # Page configuration
 st.set_page_config(
@@ -68,8 +66,8 @@ with st.sidebar:
 def main():
     """Main function to render the Financial Alerts page"""
     
-    # Initialize database and generate alerts from real data
-    efa.init_alerts_database()
+    # Create the alert tables and indexes on the first render of this process
+    alert_engine.prepare(ALERTS_DB)
     
     st.title("🔔 Financial Alerts")
     
@@ -219,9 +217,8 @@ def main():
         if st.button("🔄 Generate New Alerts", key="generate_alerts"):
             with st.spinner("Generating alerts from real transaction data..."):
                 try:
-                    import initialize_real_alerts as ira
-                    ira.main()
-                    st.success(f"Generated new alerts from real transaction data")
+                    results = alert_engine.run(ALERTS_DB)
+                    st.success(f"Generated {results['total']} new alerts from real transaction data")
                     st.rerun()
                 except Exception as e:
                     st.error(f"Error generating alerts: {str(e)}")
@@ -430,19 +427,18 @@ def main():
     with col3:
         limit = st.number_input("Limit Results", min_value=10, max_value=1000, value=100, step=10)
         
-        st.write("")  # Spacer
-        if st.button("Export to CSV", key="export_button"):
+        export_format = st.selectbox("Export Format", list(exports.EXPORT_FORMATS), key="export_format")
+        if st.button(f"Export to {export_format}", key="export_button"):
             df = get_alerts_by_type(db_table, 
                                   status_filter if status_filter != "All" else None, 
                                   date_range, 
                                   limit)
             if not df.empty:
-                csv_data = export_to_csv(df, f"{db_table}_export.csv")
                 st.download_button(
-                    label="Download CSV",
-                    data=csv_data,
-                    file_name=f"{db_table}_export_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv"
+                    label=f"Download {export_format}",
+                    data=exports.export_bytes(df, export_format),
+                    file_name=exports.file_name(f"{db_table}_export_{datetime.now().strftime('%Y%m%d')}", export_format),
+                    mime=exports.EXPORT_FORMATS[export_format][1]
                 )
             else:
                 st.warning("No data available to export.")
@@ -479,12 +475,13 @@ def main():
         col1, col2 = st.columns(2)
         
         with col1:
-            # Select an alert to update
-            selected_alert_id = st.selectbox(
-                "Select Alert by ID",
+            # Select the alerts to update
+            selected_alert_ids = st.multiselect(
+                "Select Alerts by ID",
                 options=df['id'].tolist(),
                 format_func=lambda x: f"Alert #{x}"
             )
+            select_all = st.checkbox(f"Select all {len(df)} listed alerts")
         
         with col2:
             # Choose new status
@@ -496,9 +493,11 @@ def main():
         
         # Update button
         if st.button("Update Status", key="update_status_button"):
-            success = update_alert_status(db_table, selected_alert_id, new_status)
-            if success:
-                st.success(f"Alert #{selected_alert_id} status updated to {new_status}")
+            alert_ids = df['id'].tolist() if select_all else selected_alert_ids
+            if not alert_ids:
+                st.warning("Select at least one alert to update.")
+            elif update_alert_status(db_table, alert_ids, new_status):
+                st.success(f"{len(alert_ids)} alert(s) updated to {new_status}")
                 # Refresh display
                 st.rerun()
             else:
@@ -570,114 +569,23 @@ def main():
 
 def get_alert_counts():
     """Get counts of alerts by type and status"""
-    conn = sqlite3.connect(ALERTS_DB)
-    
-    result = {}
-    for table in TABLES:
-        # Get total count
-        query = f"SELECT COUNT(*) FROM {table}"
-        total = pd.read_sql_query(query, conn).iloc[0, 0]
-        
-        # Get count by status
-        query = f"SELECT status, COUNT(*) as count FROM {table} GROUP BY status"
-        status_counts = pd.read_sql_query(query, conn)
-        
-        status_dict = {}
-        for _, row in status_counts.iterrows():
-            status_dict[row['status']] = row['count']
-        
-        result[table] = {
-            'total': total,
-            'status': status_dict
-        }
-    
-    conn.close()
-    return result
+    return alert_analytics.alert_summary(ALERTS_DB, TABLES)["counts"]
 
 def get_alert_trends():
     """Get trend data for alerts over time"""
-    conn = sqlite3.connect(ALERTS_DB)
-    
-    # Create empty dataframe to store results
-    result_df = pd.DataFrame()
-    
-    for table in TABLES:
-        # Get counts by date
-        query = f"""
-        SELECT 
-            date(timestamp) as date, 
-            COUNT(*) as count,
-            '{table}' as alert_type
-        FROM {table}
-        WHERE timestamp >= date('now', '-30 day')
-        GROUP BY date(timestamp)
-        ORDER BY date(timestamp)
-        """
-        
-        df = pd.read_sql_query(query, conn)
-        result_df = pd.concat([result_df, df], ignore_index=True)
-    
-    conn.close()
-    
-    # Convert date to datetime
-    if not result_df.empty:
-        result_df['date'] = pd.to_datetime(result_df['date'])
-    
-    return result_df
+    return alert_analytics.alert_summary(ALERTS_DB, TABLES)["trends"]
 
 def get_alert_distribution():
     """Get distribution of alerts by type"""
-    conn = sqlite3.connect(ALERTS_DB)
-    
-    result_data = []
-    for table in TABLES:
-        # Get count
-        query = f"SELECT COUNT(*) as count FROM {table}"
-        count = pd.read_sql_query(query, conn).iloc[0, 0]
-        
-        # Map table name to friendly name
-        alert_type_map = {
-            "daily_balance_alerts": "Daily Balance",
-            "large_transaction_alerts": "Large Transaction",
-            "pattern_deviation_alerts": "Pattern Deviation",
-            "account_status_alerts": "Account Status"
-        }
-        
-        result_data.append({
-            "alert_type": alert_type_map.get(table, table),
-            "count": count
-        })
-    
-    conn.close()
-    return pd.DataFrame(result_data)
+    return alert_analytics.alert_summary(ALERTS_DB, TABLES)["distribution"]
 
 def get_severity_distribution():
     """Get distribution of pattern deviation alerts by severity"""
-    conn = sqlite3.connect(ALERTS_DB)
-    
-    query = """
-    SELECT 
-        severity, 
-        COUNT(*) as count
-    FROM pattern_deviation_alerts
-    GROUP BY severity
-    ORDER BY CASE 
-        WHEN severity = 'CRITICAL' THEN 1
-        WHEN severity = 'HIGH' THEN 2
-        WHEN severity = 'MEDIUM' THEN 3
-        WHEN severity = 'LOW' THEN 4
-        ELSE 5
-    END
-    """
-    
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    
-    return df
+    return alert_analytics.alert_summary(ALERTS_DB, TABLES)["severity"]
 
 def get_alerts_by_type(table_name, status=None, date_range=None, limit=100):
     """Get alerts by type with optional filters"""
-    conn = sqlite3.connect(ALERTS_DB)
+    conn = db_pool.connect(ALERTS_DB)
     
     # Start building the query
     query = f"SELECT * FROM {table_name} WHERE 1=1"
@@ -693,7 +601,7 @@ def get_alerts_by_type(table_name, status=None, date_range=None, limit=100):
         start_date = date_range[0].strftime('%Y-%m-%d')
         end_date = (date_range[1] + timedelta(days=1)).strftime('%Y-%m-%d')  # Add 1 day to include end date
         
-        query += " AND date(timestamp) BETWEEN ? AND ?"
+        query += " AND timestamp >= ? AND timestamp < ?"
         params.append(start_date)
         params.append(end_date)
     
@@ -707,20 +615,12 @@ def get_alerts_by_type(table_name, status=None, date_range=None, limit=100):
     
     return df
 
-def update_alert_status(table_name, alert_id, new_status):
-    """Update the status of an alert"""
+def update_alert_status(table_name, alert_ids, new_status):
+    """Update the status of one alert or a list of alerts in one transaction"""
+    if not isinstance(alert_ids, (list, tuple, pd.Series)):
+        alert_ids = [alert_ids]
     try:
-        conn = sqlite3.connect(ALERTS_DB)
-        cursor = conn.cursor()
-        
-        # Update the status
-        cursor.execute(
-            f"UPDATE {table_name} SET status = ? WHERE id = ?",
-            (new_status, alert_id)
-        )
-        
-        conn.commit()
-        conn.close()
+        status_updates.set_status(ALERTS_DB, table_name, alert_ids, new_status)
         return True
     except Exception as e:
         st.error(f"Error updating alert status: {e}")
@@ -728,7 +628,7 @@ def update_alert_status(table_name, alert_id, new_status):
 
 def get_alert_settings():
     """Get alert threshold settings"""
-    conn = sqlite3.connect(ALERTS_DB)
+    conn = db_pool.connect(ALERTS_DB)
     
     query = "SELECT alert_type, threshold_value FROM alert_settings"
     df = pd.read_sql_query(query, conn)
@@ -744,7 +644,7 @@ def get_alert_settings():
 def update_alert_settings(settings):
     """Update alert threshold settings"""
     try:
-        conn = sqlite3.connect(ALERTS_DB)
+        conn = db_pool.connect(ALERTS_DB)
         cursor = conn.cursor()
         
         # Update each setting
@@ -761,10 +661,5 @@ def update_alert_settings(settings):
         st.error(f"Error updating settings: {e}")
         return False
 
-def export_to_csv(df, filename):
-    """Export DataFrame to CSV"""
-    csv = df.to_csv(index=False)
-    return csv
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
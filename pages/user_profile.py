@@ -1,7 +1,6 @@
 import streamlit as st
 import sys
 import os
-import sqlite3
 import hashlib
 from datetime import datetime
 
@@ -10,6 +9,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from auth import require_auth, get_current_user
 from sidebar import render_sidebar
 from theme_utils import apply_custom_theme
+import db_pool
 
 # Constants
 DB_FILE = "fraud_detection.db"
@@ -68,7 +68,7 @@ def main():
         # User activity
         st.subheader("Recent Activity")
         try:
-            conn = sqlite3.connect(DB_FILE)
+            conn = db_pool.connect(DB_FILE)
             cursor = conn.cursor()
             
             # Get last login time
@@ -117,7 +117,7 @@ def main():
             
             # Get current info
             try:
-                conn = sqlite3.connect(DB_FILE)
+                conn = db_pool.connect(DB_FILE)
                 cursor = conn.cursor()
                 cursor.execute(
                     "SELECT full_name FROM users WHERE username = ?", 
@@ -156,7 +156,7 @@ def change_password(username, current_password, new_password):
         new_password_hash = hashlib.sha256(new_password.encode()).hexdigest()
         
         # Verify current password
-        conn = sqlite3.connect(DB_FILE)
+        conn = db_pool.connect(DB_FILE)
         cursor = conn.cursor()
         cursor.execute(
             "SELECT id FROM users WHERE username = ? AND password_hash = ?",
@@ -185,7 +185,7 @@ def change_password(username, current_password, new_password):
 def update_profile(username, new_full_name):
     """Update user profile information"""
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = db_pool.connect(DB_FILE)
         cursor = conn.cursor()
         
         cursor.execute(
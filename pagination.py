@@ -0,0 +1,122 @@
+"""
+Keyset pagination and cached row counts for the browsing tables.
+
+Pages are fetched with ORDER BY timestamp DESC, id DESC and a
+(timestamp, id) < (?, ?) cursor taken from the last row of the previous page,
+so every page costs one index seek regardless of how deep it is. id is the
+INTEGER PRIMARY KEY (the rowid), which SQLite stores at the end of every
+index entry, so an index on timestamp already serves the (timestamp, id)
+order.
+
+Filtered row counts are cached per process and refreshed in the background
+once older than COUNT_TTL_SECONDS; callers get the cached value right away,
+or None while the first count is still running.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import pandas as pd
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+COUNT_TTL_SECONDS = 60
+# How long a caller waits for a count that has never been computed
+FIRST_COUNT_WAIT_SECONDS = 0.25
+
+_lock = threading.Lock()
+_counts = {}
+_pending = {}
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="count-refresh")
+
+
+def fetch_page(conn, table, where_clauses=(), params=(), cursor=None, page_size=50):
+    """
+    Fetch one page of table, newest first, starting after cursor.
+
+    cursor is the (timestamp, id) of the last row of the previous page, or
+    None for the first page. Returns the page as a DataFrame and the cursor
+    for the next page (None when this page is the last).
+    """
+    clauses = list(where_clauses)
+    params = list(params)
+    if cursor is not None:
+        clauses.append("(timestamp, id) < (?, ?)")
+        params.extend(cursor)
+
+    query = f"SELECT * FROM {table}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    # One extra row tells whether a next page exists
+    query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+    params.append(page_size + 1)
+
+    df = pd.read_sql_query(query, conn, params=params)
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        next_cursor = (df["timestamp"].iloc[-1], int(df["id"].iloc[-1]))
+    return df, next_cursor
+
+
+def _refresh_count(key):
+    db_file, query, params = key
+    try:
+        conn = db_pool.connect(db_file)
+        try:
+            count = conn.execute(query, params).fetchone()[0]
+        finally:
+            conn.close()
+        with _lock:
+            _counts[key] = (count, time.time())
+        return count
+    except Exception as e:
+        logger.error(f"Error counting rows in {db_file}: {e}")
+        return None
+    finally:
+        with _lock:
+            _pending.pop(key, None)
+
+
+def cached_count(db_file, query, params=(), ttl=COUNT_TTL_SECONDS, wait=FIRST_COUNT_WAIT_SECONDS):
+    """
+    Return the cached result of a COUNT query, refreshing it in the background.
+
+    A stale value is returned as is while a refresh runs. A count that was
+    never computed is waited for up to wait seconds; None is returned if it
+    is not ready by then.
+    """
+    key = (os.path.abspath(db_file), query, tuple(params))
+    with _lock:
+        entry = _counts.get(key)
+        future = _pending.get(key)
+        if future is None and (entry is None or time.time() - entry[1] > ttl):
+            future = _executor.submit(_refresh_count, key)
+            _pending[key] = future
+
+    if entry is not None:
+        return entry[0]
+    try:
+        return future.result(timeout=wait)
+    except TimeoutError:
+        return None
+
+
+def invalidate(db_file=None):
+    """Drop cached counts for one database file, or all of them"""
+    path = os.path.abspath(db_file) if db_file is not None else None
+    with _lock:
+        for key in list(_counts):
+            if path is None or key[0] == path:
+                del _counts[key]
+
+
+def total_pages(total_count, page_size):
+    """Number of pages for a row count, or None if the count is unknown"""
+    if total_count is None:
+        return None
+    return (total_count + page_size - 1) // page_size
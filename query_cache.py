@@ -0,0 +1,184 @@
+"""
+Result cache for read helpers, invalidated by database writes.
+
+@cached keeps a helper's result keyed by its arguments (query and params
+included) and by the PRAGMA data_version of the database it reads, so a
+Streamlit rerun over unchanged data costs one PRAGMA instead of the queries.
+
+data_version only moves when a connection other than the one asking commits.
+Each database file therefore gets a watcher connection that never writes:
+every commit, from the pool, another page, a CLI or another process, is a
+write by another connection and moves the watcher's data_version. Results
+are shared between callers, so DataFrames and containers are copied on the
+way out.
+
+    @query_cache.cached(DB_FILE)
+    def get_violation_stats():
+        ...
+
+    @query_cache.cached(lambda self: self.db_file)
+    def get_database_stats(self):
+        ...
+"""
+import functools
+import inspect
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Cached results kept across all helpers; least recently used go first
+MAX_ENTRIES = 256
+
+_entries = OrderedDict()
+_entries_lock = threading.Lock()
+_watchers = {}
+_watchers_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "uncached": 0}
+
+
+def _watcher(path):
+    """Open (once) the read-only connection that watches one database file"""
+    with _watchers_lock:
+        watcher = _watchers.get(path)
+        if watcher is None:
+            # mode=rw so a missing file is an error instead of a new empty database
+            conn = sqlite3.connect(f"file:{path}?mode=rw", uri=True, check_same_thread=False)
+            watcher = _watchers[path] = (conn, threading.Lock())
+        return watcher
+
+
+def data_version(db_file):
+    """
+    Write generation of db_file: it changes after every commit to the file.
+
+    Returns None when the database cannot be opened.
+    """
+    path = os.path.abspath(db_file)
+    try:
+        conn, lock = _watcher(path)
+        with lock:
+            return conn.execute("PRAGMA data_version").fetchone()[0]
+    except sqlite3.Error as e:
+        logger.warning(f"Cannot watch {db_file} for changes: {e}")
+        with _watchers_lock:
+            _watchers.pop(path, None)
+        return None
+
+
+def _freeze(value):
+    """Hashable stand-in for an argument value"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    hash(value)
+    return value
+
+
+def _copy(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_copy(item) for item in value)
+    return value
+
+
+def _cacheable(result):
+    # The helpers return None or an empty result when a query fails
+    if result is None:
+        return False
+    try:
+        return len(result) > 0
+    except TypeError:
+        return True
+
+
+def cached(db_file=None):
+    """
+    Cache a read helper until the database it reads changes.
+
+    db_file is the database path, a callable that takes the helper's
+    arguments and returns it, or None to use the helper's db_file argument.
+    self is left out of the key, since the database stands in for it.
+    None and empty results are not cached.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        # Pages are re-executed on every rerun, so key by code location, not function identity
+        name = (func.__code__.co_filename, func.__qualname__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            if db_file is None:
+                path = bound.arguments["db_file"]
+            elif callable(db_file):
+                path = db_file(*args, **kwargs)
+            else:
+                path = db_file
+
+            try:
+                key = (name, os.path.abspath(path), _freeze(
+                    {arg: value for arg, value in bound.arguments.items() if arg != "self"}
+                ))
+            except TypeError:
+                key = None
+            version = data_version(path) if key is not None else None
+            if version is None:
+                with _entries_lock:
+                    _stats["uncached"] += 1
+                return func(*args, **kwargs)
+
+            with _entries_lock:
+                entry = _entries.get(key)
+                if entry is not None and entry[0] == version:
+                    _entries.move_to_end(key)
+                    _stats["hits"] += 1
+                    return _copy(entry[1])
+                _stats["misses"] += 1
+
+            result = func(*args, **kwargs)
+            # A commit that raced the helper would leave the result unreliable
+            if _cacheable(result) and data_version(path) == version:
+                with _entries_lock:
+                    _entries[key] = (version, result)
+                    _entries.move_to_end(key)
+                    while len(_entries) > MAX_ENTRIES:
+                        _entries.popitem(last=False)
+                return _copy(result)
+            return result
+
+        return wrapper
+    return decorator
+
+
+def invalidate(db_file=None):
+    """Drop cached results for one database file, or all of them"""
+    with _entries_lock:
+        if db_file is None:
+            _entries.clear()
+            return
+        path = os.path.abspath(db_file)
+        for key in [key for key in _entries if key[1] == path]:
+            del _entries[key]
+
+
+def cache_stats():
+    """Hit, miss and uncached call counts, plus the number of cached results"""
+    with _entries_lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+    return stats
@@ -0,0 +1,419 @@
+"""
+Materialized rollups for database statistics.
+
+transactions.db keeps per-day, per-bank, per-individual and per
+individual/bank counts and sums. Inserts are rolled up set-based by the bulk
+ingest path (see ingest.bulk_save_transactions). Bulk deletes go through
+delete_transactions, which adjusts the rollups set-based; a row-level trigger
+covers any other delete, so the rollups stay current either way. Both paths
+also queue the (individual, day) of deleted rows in deleted_days, so the
+limit monitor can re-check buckets that lost transactions.
+
+fraud_detection.db keeps counts per transaction day and suspicious flag, and
+per processing day and status, maintained entirely by triggers because
+results are inserted, re-labelled and deleted from several places.
+
+Stats read from these tables, so their cost depends on the number of days,
+banks and individuals rather than on the number of transactions.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_ROLLUP_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS daily_rollup (
+        day TEXT PRIMARY KEY,
+        tx_count INTEGER NOT NULL DEFAULT 0,
+        total_amount REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS bank_rollup (
+        bank_name TEXT PRIMARY KEY,
+        tx_count INTEGER NOT NULL DEFAULT 0,
+        total_amount REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS individual_bank_rollup (
+        individual_id TEXT NOT NULL,
+        bank_name TEXT NOT NULL,
+        tx_count INTEGER NOT NULL DEFAULT 0,
+        total_amount REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (individual_id, bank_name)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS individual_rollup (
+        individual_id TEXT PRIMARY KEY,
+        tx_count INTEGER NOT NULL DEFAULT 0,
+        total_amount REAL NOT NULL DEFAULT 0,
+        bank_count INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_individual_rollup_bank_count ON individual_rollup(bank_count);
+
+    -- Lets per-individual activity checks seek instead of scanning
+    CREATE INDEX IF NOT EXISTS idx_transactions_individual_timestamp ON transactions(individual_id, timestamp);
+
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        name TEXT PRIMARY KEY,
+        built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        suspended INTEGER NOT NULL DEFAULT 0
+    );
+
+    -- Row-level upkeep for ad-hoc deletes; delete_transactions suspends it and
+    -- adjusts the rollups set-based instead
+    CREATE TRIGGER IF NOT EXISTS transactions_rollup_delete
+    AFTER DELETE ON transactions
+    WHEN NOT EXISTS (SELECT 1 FROM rollup_state WHERE name = 'transactions' AND suspended = 1)
+    BEGIN
+        UPDATE daily_rollup
+        SET tx_count = tx_count - 1, total_amount = total_amount - OLD.amount
+        WHERE day = substr(OLD.timestamp, 1, 10);
+        DELETE FROM daily_rollup WHERE day = substr(OLD.timestamp, 1, 10) AND tx_count <= 0;
+
+        UPDATE bank_rollup
+        SET tx_count = tx_count - 1, total_amount = total_amount - OLD.amount
+        WHERE bank_name = OLD.bank_name;
+        DELETE FROM bank_rollup WHERE bank_name = OLD.bank_name AND tx_count <= 0;
+
+        UPDATE individual_bank_rollup
+        SET tx_count = tx_count - 1, total_amount = total_amount - OLD.amount
+        WHERE individual_id = OLD.individual_id AND bank_name = OLD.bank_name;
+        DELETE FROM individual_bank_rollup
+        WHERE individual_id = OLD.individual_id AND bank_name = OLD.bank_name AND tx_count <= 0;
+
+        UPDATE individual_rollup
+        SET tx_count = tx_count - 1,
+            total_amount = total_amount - OLD.amount,
+            bank_count = (SELECT COUNT(*) FROM individual_bank_rollup WHERE individual_id = OLD.individual_id)
+        WHERE individual_id = OLD.individual_id;
+        DELETE FROM individual_rollup WHERE individual_id = OLD.individual_id AND tx_count <= 0;
+    END;
+
+    -- Individual and day of deleted transactions, until limit_monitor re-checks them
+    CREATE TABLE IF NOT EXISTS deleted_days (
+        id INTEGER PRIMARY KEY,
+        individual_id TEXT NOT NULL,
+        day TEXT NOT NULL
+    );
+
+    CREATE TRIGGER IF NOT EXISTS transactions_deleted_days
+    AFTER DELETE ON transactions
+    WHEN NOT EXISTS (SELECT 1 FROM rollup_state WHERE name = 'transactions' AND suspended = 1)
+    BEGIN
+        INSERT INTO deleted_days (individual_id, day) VALUES (OLD.individual_id, substr(OLD.timestamp, 1, 10));
+    END;
+"""
+
+FRAUD_ROLLUP_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS fraud_day_rollup (
+        day TEXT NOT NULL,
+        predicted_suspicious INTEGER NOT NULL,
+        tx_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, predicted_suspicious)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS fraud_status_rollup (
+        processed_day TEXT NOT NULL,
+        status TEXT NOT NULL,
+        tx_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (processed_day, status)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        name TEXT PRIMARY KEY,
+        built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        suspended INTEGER NOT NULL DEFAULT 0
+    );
+
+    -- Lets MIN/MAX(timestamp) seek instead of scanning
+    CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table}(timestamp);
+
+    CREATE TRIGGER IF NOT EXISTS {table}_rollup_insert
+    AFTER INSERT ON {table}
+    BEGIN
+        INSERT INTO fraud_day_rollup (day, predicted_suspicious, tx_count)
+        VALUES (IFNULL(date(NEW.timestamp), ''), IFNULL(NEW.predicted_suspicious, 0), 1)
+        ON CONFLICT (day, predicted_suspicious) DO UPDATE SET tx_count = tx_count + 1;
+
+        INSERT INTO fraud_status_rollup (processed_day, status, tx_count)
+        VALUES (IFNULL(strftime('%Y-%m-%d', NEW.processed_at), ''), IFNULL(NEW.status, ''), 1)
+        ON CONFLICT (processed_day, status) DO UPDATE SET tx_count = tx_count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS {table}_rollup_delete
+    AFTER DELETE ON {table}
+    BEGIN
+        UPDATE fraud_day_rollup SET tx_count = tx_count - 1
+        WHERE day = IFNULL(date(OLD.timestamp), '') AND predicted_suspicious = IFNULL(OLD.predicted_suspicious, 0);
+
+        UPDATE fraud_status_rollup SET tx_count = tx_count - 1
+        WHERE processed_day = IFNULL(strftime('%Y-%m-%d', OLD.processed_at), '') AND status = IFNULL(OLD.status, '');
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS {table}_rollup_update
+    AFTER UPDATE OF timestamp, predicted_suspicious, processed_at, status ON {table}
+    BEGIN
+        UPDATE fraud_day_rollup SET tx_count = tx_count - 1
+        WHERE day = IFNULL(date(OLD.timestamp), '') AND predicted_suspicious = IFNULL(OLD.predicted_suspicious, 0);
+
+        UPDATE fraud_status_rollup SET tx_count = tx_count - 1
+        WHERE processed_day = IFNULL(strftime('%Y-%m-%d', OLD.processed_at), '') AND status = IFNULL(OLD.status, '');
+
+        INSERT INTO fraud_day_rollup (day, predicted_suspicious, tx_count)
+        VALUES (IFNULL(date(NEW.timestamp), ''), IFNULL(NEW.predicted_suspicious, 0), 1)
+        ON CONFLICT (day, predicted_suspicious) DO UPDATE SET tx_count = tx_count + 1;
+
+        INSERT INTO fraud_status_rollup (processed_day, status, tx_count)
+        VALUES (IFNULL(strftime('%Y-%m-%d', NEW.processed_at), ''), IFNULL(NEW.status, ''), 1)
+        ON CONFLICT (processed_day, status) DO UPDATE SET tx_count = tx_count + 1;
+    END;
+"""
+
+
+def ensure_transaction_rollups(conn):
+    """Create the transactions.db rollups and build them once from existing rows"""
+    conn.executescript(TRANSACTION_ROLLUP_SCHEMA)
+    if conn.execute("SELECT 1 FROM rollup_state WHERE name = 'transactions'").fetchone() is None:
+        rebuild_transaction_rollups(conn)
+
+
+def rebuild_transaction_rollups(conn):
+    """Recompute every transactions.db rollup from the transactions table"""
+    cursor = conn.cursor()
+    for table in ("daily_rollup", "bank_rollup", "individual_bank_rollup", "individual_rollup"):
+        cursor.execute(f"DELETE FROM {table}")
+    cursor.execute("""
+        INSERT INTO daily_rollup (day, tx_count, total_amount)
+        SELECT substr(timestamp, 1, 10), COUNT(*), SUM(amount) FROM transactions GROUP BY 1
+    """)
+    cursor.execute("""
+        INSERT INTO bank_rollup (bank_name, tx_count, total_amount)
+        SELECT bank_name, COUNT(*), SUM(amount) FROM transactions GROUP BY bank_name
+    """)
+    cursor.execute("""
+        INSERT INTO individual_bank_rollup (individual_id, bank_name, tx_count, total_amount)
+        SELECT individual_id, bank_name, COUNT(*), SUM(amount) FROM transactions GROUP BY individual_id, bank_name
+    """)
+    cursor.execute("""
+        INSERT INTO individual_rollup (individual_id, tx_count, total_amount, bank_count)
+        SELECT individual_id, SUM(tx_count), SUM(total_amount), COUNT(*)
+        FROM individual_bank_rollup GROUP BY individual_id
+    """)
+    cursor.execute("INSERT OR REPLACE INTO rollup_state (name) VALUES ('transactions')")
+    conn.commit()
+    logger.info("Rebuilt transaction rollups")
+
+
+def apply_staged_transactions(cursor, staging_table="staging_transactions"):
+    """
+    Roll up newly inserted transactions held in a staging table.
+
+    The staging table must contain only rows that were not stored before, so
+    each transaction is counted once.
+    """
+    cursor.execute(f"""
+        INSERT INTO daily_rollup (day, tx_count, total_amount)
+        SELECT substr(timestamp, 1, 10), COUNT(*), SUM(amount)
+        FROM {staging_table}
+        WHERE true
+        GROUP BY 1
+        ON CONFLICT (day) DO UPDATE SET
+            tx_count = tx_count + excluded.tx_count,
+            total_amount = total_amount + excluded.total_amount
+    """)
+    cursor.execute(f"""
+        INSERT INTO bank_rollup (bank_name, tx_count, total_amount)
+        SELECT bank_name, COUNT(*), SUM(amount)
+        FROM {staging_table}
+        WHERE true
+        GROUP BY bank_name
+        ON CONFLICT (bank_name) DO UPDATE SET
+            tx_count = tx_count + excluded.tx_count,
+            total_amount = total_amount + excluded.total_amount
+    """)
+    cursor.execute(f"""
+        INSERT INTO individual_bank_rollup (individual_id, bank_name, tx_count, total_amount)
+        SELECT individual_id, bank_name, COUNT(*), SUM(amount)
+        FROM {staging_table}
+        WHERE true
+        GROUP BY individual_id, bank_name
+        ON CONFLICT (individual_id, bank_name) DO UPDATE SET
+            tx_count = tx_count + excluded.tx_count,
+            total_amount = total_amount + excluded.total_amount
+    """)
+    cursor.execute(f"""
+        INSERT INTO individual_rollup (individual_id, tx_count, total_amount, bank_count)
+        SELECT s.individual_id, COUNT(*), SUM(s.amount),
+               (SELECT COUNT(*) FROM individual_bank_rollup b WHERE b.individual_id = s.individual_id)
+        FROM {staging_table} s
+        WHERE true
+        GROUP BY s.individual_id
+        ON CONFLICT (individual_id) DO UPDATE SET
+            tx_count = tx_count + excluded.tx_count,
+            total_amount = total_amount + excluded.total_amount,
+            bank_count = excluded.bank_count
+    """)
+
+
+def delete_transactions(conn, where="", params=()):
+    """
+    Delete transactions matching a WHERE clause and adjust the rollups set-based.
+
+    The deleted rows are staged once and subtracted from the rollups grouped,
+    instead of firing the row-level trigger for each of them. An empty where
+    deletes everything and simply clears the rollups. The deleted days are
+    queued in deleted_days either way. Commits and returns the number of
+    deleted transactions.
+    """
+    cursor = conn.cursor()
+    condition = f"WHERE {where}" if where else ""
+    try:
+        if not where:
+            cursor.execute("""
+                INSERT INTO deleted_days (individual_id, day)
+                SELECT DISTINCT individual_id, substr(timestamp, 1, 10) FROM transactions
+            """)
+            for table in ("daily_rollup", "bank_rollup", "individual_bank_rollup", "individual_rollup"):
+                cursor.execute(f"DELETE FROM {table}")
+        else:
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS staging_deleted (
+                    individual_id TEXT, bank_name TEXT, amount REAL, timestamp TEXT
+                )
+            """)
+            cursor.execute("DELETE FROM staging_deleted")
+            cursor.execute(f"""
+                INSERT INTO staging_deleted
+                SELECT individual_id, bank_name, amount, timestamp FROM transactions {condition}
+            """, params)
+            cursor.execute("""
+                INSERT INTO deleted_days (individual_id, day)
+                SELECT DISTINCT individual_id, substr(timestamp, 1, 10) FROM staging_deleted
+            """)
+            cursor.execute("""
+                UPDATE daily_rollup SET
+                    tx_count = daily_rollup.tx_count - d.tx_count,
+                    total_amount = daily_rollup.total_amount - d.total_amount
+                FROM (SELECT substr(timestamp, 1, 10) AS day, COUNT(*) AS tx_count, SUM(amount) AS total_amount
+                      FROM staging_deleted GROUP BY 1) AS d
+                WHERE daily_rollup.day = d.day
+            """)
+            cursor.execute("""
+                UPDATE bank_rollup SET
+                    tx_count = bank_rollup.tx_count - d.tx_count,
+                    total_amount = bank_rollup.total_amount - d.total_amount
+                FROM (SELECT bank_name, COUNT(*) AS tx_count, SUM(amount) AS total_amount
+                      FROM staging_deleted GROUP BY bank_name) AS d
+                WHERE bank_rollup.bank_name = d.bank_name
+            """)
+            cursor.execute("""
+                UPDATE individual_bank_rollup SET
+                    tx_count = individual_bank_rollup.tx_count - d.tx_count,
+                    total_amount = individual_bank_rollup.total_amount - d.total_amount
+                FROM (SELECT individual_id, bank_name, COUNT(*) AS tx_count, SUM(amount) AS total_amount
+                      FROM staging_deleted GROUP BY individual_id, bank_name) AS d
+                WHERE individual_bank_rollup.individual_id = d.individual_id
+                  AND individual_bank_rollup.bank_name = d.bank_name
+            """)
+            for table in ("daily_rollup", "bank_rollup", "individual_bank_rollup"):
+                cursor.execute(f"DELETE FROM {table} WHERE tx_count <= 0")
+            cursor.execute("""
+                UPDATE individual_rollup SET
+                    tx_count = individual_rollup.tx_count - d.tx_count,
+                    total_amount = individual_rollup.total_amount - d.total_amount,
+                    bank_count = (SELECT COUNT(*) FROM individual_bank_rollup b
+                                  WHERE b.individual_id = individual_rollup.individual_id)
+                FROM (SELECT individual_id, COUNT(*) AS tx_count, SUM(amount) AS total_amount
+                      FROM staging_deleted GROUP BY individual_id) AS d
+                WHERE individual_rollup.individual_id = d.individual_id
+            """)
+            cursor.execute("DELETE FROM individual_rollup WHERE tx_count <= 0")
+            cursor.execute("DELETE FROM staging_deleted")
+
+        cursor.execute("UPDATE rollup_state SET suspended = 1 WHERE name = 'transactions'")
+        cursor.execute(f"DELETE FROM transactions {condition}", params)
+        count = cursor.rowcount
+        cursor.execute("UPDATE rollup_state SET suspended = 0 WHERE name = 'transactions'")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return count
+
+
+def transaction_stats(conn):
+    """Totals, distinct individuals and multi-bank individuals from the rollups"""
+    row = conn.execute("""
+        SELECT
+            (SELECT COALESCE(SUM(tx_count), 0) FROM bank_rollup),
+            (SELECT COUNT(*) FROM individual_rollup),
+            (SELECT COALESCE(SUM(total_amount), 0) FROM bank_rollup),
+            (SELECT COUNT(*) FROM individual_rollup WHERE bank_count > 1)
+    """).fetchone()
+    return {
+        "total_records": row[0],
+        "unique_individuals": row[1],
+        "total_amount": row[2],
+        "multiple_accounts_count": row[3]
+    }
+
+
+def ensure_fraud_rollups(conn, table):
+    """Create the fraud result rollups and triggers and build them once from existing rows"""
+    conn.executescript(FRAUD_ROLLUP_SCHEMA.replace("{table}", table))
+    if conn.execute("SELECT 1 FROM rollup_state WHERE name = ?", (table,)).fetchone() is None:
+        rebuild_fraud_rollups(conn, table)
+
+
+def fraud_stats(conn, table, recent_days=7):
+    """Result counts, timestamp range, status distribution and recent activity"""
+    totals = conn.execute("""
+        SELECT
+            COALESCE(SUM(tx_count), 0),
+            COALESCE(SUM(CASE WHEN predicted_suspicious = 1 THEN tx_count ELSE 0 END), 0)
+        FROM fraud_day_rollup
+    """).fetchone()
+    date_range = conn.execute(
+        f"SELECT (SELECT MIN(timestamp) FROM {table}), (SELECT MAX(timestamp) FROM {table})"
+    ).fetchone()
+    status_counts = conn.execute("""
+        SELECT NULLIF(status, ''), SUM(tx_count)
+        FROM fraud_status_rollup
+        GROUP BY status
+        HAVING SUM(tx_count) > 0
+    """).fetchall()
+    recent_activity = conn.execute("""
+        SELECT NULLIF(processed_day, ''), SUM(tx_count)
+        FROM fraud_status_rollup
+        GROUP BY processed_day
+        HAVING SUM(tx_count) > 0
+        ORDER BY processed_day DESC
+        LIMIT ?
+    """, (recent_days,)).fetchall()
+    return {
+        "total_records": totals[0],
+        "suspicious_count": totals[1],
+        "date_range": (date_range[0], date_range[1]),
+        "status_distribution": {row[0]: row[1] for row in status_counts},
+        "recent_activity": {row[0]: row[1] for row in recent_activity}
+    }
+
+
+def rebuild_fraud_rollups(conn, table):
+    """Recompute the fraud result rollups from the results table"""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM fraud_day_rollup")
+    cursor.execute("DELETE FROM fraud_status_rollup")
+    cursor.execute(f"""
+        INSERT INTO fraud_day_rollup (day, predicted_suspicious, tx_count)
+        SELECT IFNULL(date(timestamp), ''), IFNULL(predicted_suspicious, 0), COUNT(*)
+        FROM {table} GROUP BY 1, 2
+    """)
+    cursor.execute(f"""
+        INSERT INTO fraud_status_rollup (processed_day, status, tx_count)
+        SELECT IFNULL(strftime('%Y-%m-%d', processed_at), ''), IFNULL(status, ''), COUNT(*)
+        FROM {table} GROUP BY 1, 2
+    """)
+    cursor.execute("INSERT OR REPLACE INTO rollup_state (name) VALUES (?)", (table,))
+    conn.commit()
+    logger.info(f"Rebuilt fraud rollups for {table}")
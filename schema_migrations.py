@@ -0,0 +1,383 @@
+"""
+Index provisioning and query-plan audit for the app's SQLite databases.
+
+INDEXES lists the composite indexes each database needs for the filters the
+pages actually run. Every index ends in a timestamp column, so an equality
+filter plus the newest-first (timestamp, id) order of the browsing views is
+served by one index seek; id is the rowid and is stored in every index
+anyway. ensure_indexes creates the missing ones for tables that exist.
+
+QUERIES is a registry of the app's hot queries. audit runs EXPLAIN QUERY PLAN
+over it and flags full table scans, unbounded index scans that still read the
+table, and temp B-tree sorts. Run both from the command line:
+
+    python schema_migrations.py              # create missing indexes, then audit
+    python schema_migrations.py --audit      # audit only
+    python schema_migrations.py --benchmark  # old vs sargable date filters
+"""
+import argparse
+import logging
+import re
+import sqlite3
+import sys
+import time
+
+import alert_analytics
+import db_pool
+import kpi_engine
+
+logger = logging.getLogger(__name__)
+
+# Database files by key
+DATABASES = {
+    "accounts": "transactions.db",
+    "limits": "transaction_monitoring.db",
+    "fraud": "fraud_detection.db",
+    "alerts": "financial_alerts.db"
+}
+
+ALERT_TABLES = [
+    "daily_balance_alerts",
+    "large_transaction_alerts",
+    "pattern_deviation_alerts",
+    "account_status_alerts"
+]
+
+# Tables (and CTEs) that stay small, so scanning them is expected
+SMALL_TABLES = {
+    "daily_rollup", "bank_rollup", "fraud_day_rollup", "fraud_status_rollup", "months",
+    "settings", "uploaded_files", "alert_settings", "users"
+}
+
+# (table, index name, columns) per database
+INDEXES = {
+    "accounts": [
+        ("transactions", "idx_transactions_individual_timestamp", "individual_id, timestamp"),
+        ("transactions", "idx_transactions_bank_timestamp", "bank_name, timestamp")
+    ],
+    "limits": [
+        ("violations", "idx_violations_created_at", "created_at"),
+        ("violations", "idx_violations_period_type_created_at", "period_type, created_at"),
+        ("violations", "idx_violations_individual_created_at", "individual_id, created_at")
+    ],
+    "fraud": [
+        ("fraud_detection_results", "idx_fraud_detection_results_timestamp", "timestamp"),
+        ("fraud_detection_results", "idx_fraud_detection_results_status_timestamp", "status, timestamp"),
+        ("fraud_detection_results", "idx_fraud_detection_results_suspicious_timestamp",
+         "predicted_suspicious, timestamp"),
+        ("fraud_detection_results", "idx_fraud_detection_results_bank_timestamp", "bank_name, timestamp"),
+        ("fraud_detection_results", "idx_fraud_detection_results_account_timestamp", "account_id, timestamp"),
+        # Per-individual views of federated
+        ("fraud_detection_results", "idx_fraud_detection_results_individual_timestamp", "individual_id, timestamp")
+    ],
+    "alerts": [
+        index
+        for table in ALERT_TABLES
+        for index in (
+            (table, f"idx_{table}_timestamp", "timestamp"),
+            (table, f"idx_{table}_status_timestamp", "status, timestamp")
+        )
+    ] + [
+        ("pattern_deviation_alerts", "idx_pattern_deviation_alerts_severity_timestamp", "severity, timestamp"),
+        # Duplicate and recent-alert checks of alert_engine
+        ("large_transaction_alerts", "idx_large_transaction_alerts_transaction_id", "transaction_id"),
+        ("pattern_deviation_alerts", "idx_pattern_deviation_alerts_transaction_id", "transaction_id"),
+        ("daily_balance_alerts", "idx_daily_balance_alerts_account_timestamp", "account_id, timestamp"),
+        ("account_status_alerts", "idx_account_status_alerts_account_timestamp", "account_id, timestamp"),
+        # Per-account alert lookups of federated
+        ("large_transaction_alerts", "idx_large_transaction_alerts_account_timestamp", "account_id, timestamp"),
+        ("pattern_deviation_alerts", "idx_pattern_deviation_alerts_account_timestamp", "account_id, timestamp")
+    ]
+}
+
+# (database key, name, SQL) of the queries the pages run
+QUERIES = [
+    ("accounts", "transactions page",
+     "SELECT * FROM transactions WHERE (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT ?"),
+    ("accounts", "transactions page by bank",
+     "SELECT * FROM transactions WHERE bank_name = ? AND (timestamp, id) < (?, ?) "
+     "ORDER BY timestamp DESC, id DESC LIMIT ?"),
+    ("accounts", "transactions page by multi-bank individuals",
+     "SELECT * FROM transactions "
+     "WHERE +individual_id IN (SELECT individual_id FROM individual_rollup WHERE bank_count >= ?) "
+     "ORDER BY timestamp DESC, id DESC LIMIT ?"),
+    ("accounts", "transactions count by date",
+     "SELECT COUNT(*) FROM transactions WHERE timestamp >= date(?) AND timestamp < date(?, '+1 day')"),
+    ("accounts", "individual transactions",
+     "SELECT * FROM transactions WHERE individual_id = ? ORDER BY timestamp"),
+    ("accounts", "multiple accounts summary",
+     "SELECT individual_id, COUNT(DISTINCT bank_name), SUM(amount) FROM transactions "
+     "GROUP BY individual_id HAVING COUNT(DISTINCT bank_name) > 1"),
+    ("accounts", "dashboard KPIs", kpi_engine.ACCOUNTS_KPI_QUERY),
+
+    ("limits", "recent violations",
+     "SELECT * FROM violations ORDER BY created_at DESC LIMIT ?"),
+    ("limits", "recent violations by period",
+     "SELECT * FROM violations WHERE period_type = ? ORDER BY created_at DESC LIMIT ?"),
+    ("limits", "violations by period",
+     "SELECT period_type, COUNT(*) FROM violations GROUP BY period_type"),
+    ("limits", "top individuals",
+     "SELECT individual_id, COUNT(*) AS count FROM violations GROUP BY individual_id ORDER BY count DESC LIMIT 5"),
+    ("limits", "individual violations",
+     "SELECT * FROM violations WHERE individual_id = ? ORDER BY created_at DESC"),
+    ("limits", "dashboard KPIs", kpi_engine.LIMITS_KPI_QUERY),
+
+    ("fraud", "results page",
+     "SELECT * FROM fraud_detection_results WHERE (timestamp, id) < (?, ?) "
+     "ORDER BY timestamp DESC, id DESC LIMIT ?"),
+    ("fraud", "results page by status",
+     "SELECT * FROM fraud_detection_results WHERE status = ? AND (timestamp, id) < (?, ?) "
+     "ORDER BY timestamp DESC, id DESC LIMIT ?"),
+    ("fraud", "results page by risk level",
+     "SELECT * FROM fraud_detection_results WHERE predicted_suspicious = ? AND (timestamp, id) < (?, ?) "
+     "ORDER BY timestamp DESC, id DESC LIMIT ?"),
+    ("fraud", "results page by bank",
+     "SELECT * FROM fraud_detection_results WHERE bank_name = ? AND (timestamp, id) < (?, ?) "
+     "ORDER BY timestamp DESC, id DESC LIMIT ?"),
+    ("fraud", "results page by date",
+     "SELECT * FROM fraud_detection_results WHERE timestamp >= date(?) AND timestamp < date(?, '+1 day') "
+     "ORDER BY timestamp DESC, id DESC LIMIT ?"),
+    ("fraud", "results count by date",
+     "SELECT COUNT(*) FROM fraud_detection_results WHERE timestamp >= date(?) AND timestamp < date(?, '+1 day')"),
+    ("fraud", "bank list",
+     "SELECT DISTINCT bank_name FROM fraud_detection_results ORDER BY bank_name"),
+    ("fraud", "dashboard KPIs", kpi_engine.FRAUD_KPI_QUERY)
+] + [
+    query
+    for table in ALERT_TABLES
+    for query in (
+        ("alerts", f"{table} list",
+         f"SELECT * FROM {table} ORDER BY timestamp DESC LIMIT ?"),
+        ("alerts", f"{table} list by status",
+         f"SELECT * FROM {table} WHERE status = ? ORDER BY timestamp DESC LIMIT ?"),
+        ("alerts", f"{table} list by date",
+         f"SELECT * FROM {table} WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp DESC LIMIT ?"),
+        ("alerts", f"{table} status counts",
+         f"SELECT status, COUNT(*) FROM {table} GROUP BY status"),
+        ("alerts", f"{table} trend",
+         f"SELECT date(timestamp), COUNT(*) FROM {table} "
+         f"WHERE timestamp >= date('now', '-30 day') GROUP BY date(timestamp)")
+    )
+] + [
+    ("alerts", "dashboard summary", alert_analytics.summary_query())
+]
+
+# (database key, name, parameter SQL, before SQL, after SQL) comparing the old
+# function-wrapped date filters with their sargable rewrites. The parameter
+# SQL picks a 7-day window at the start of the data (the worst case for a
+# newest-first scan) and its month, as named parameters.
+BENCHMARKS = [
+    ("fraud", "results page by date",
+     "SELECT date(MIN(timestamp)) AS start_day, date(MIN(timestamp), '+6 day') AS end_day "
+     "FROM fraud_detection_results",
+     "SELECT * FROM fraud_detection_results WHERE date(timestamp) BETWEEN :start_day AND :end_day "
+     "ORDER BY timestamp DESC, id DESC LIMIT 51",
+     "SELECT * FROM fraud_detection_results WHERE timestamp >= date(:start_day) "
+     "AND timestamp < date(:end_day, '+1 day') ORDER BY timestamp DESC, id DESC LIMIT 51"),
+    ("fraud", "results count by date",
+     "SELECT date(MIN(timestamp)) AS start_day, date(MIN(timestamp), '+6 day') AS end_day "
+     "FROM fraud_detection_results",
+     "SELECT COUNT(*) FROM fraud_detection_results WHERE date(timestamp) BETWEEN :start_day AND :end_day",
+     "SELECT COUNT(*) FROM fraud_detection_results WHERE timestamp >= date(:start_day) "
+     "AND timestamp < date(:end_day, '+1 day')"),
+    ("accounts", "transactions in month",
+     "SELECT strftime('%Y-%m', MIN(timestamp)) AS month, date(MIN(timestamp), 'start of month') AS month_start "
+     "FROM transactions",
+     "SELECT COUNT(*) FROM transactions WHERE strftime('%Y-%m', timestamp) = :month",
+     "SELECT COUNT(*) FROM transactions WHERE timestamp >= :month_start "
+     "AND timestamp < date(:month_start, '+1 month')"),
+    ("alerts", "daily balance alerts by date",
+     "SELECT date(MIN(timestamp)) AS start_day, date(MIN(timestamp), '+7 day') AS end_day "
+     "FROM daily_balance_alerts",
+     "SELECT * FROM daily_balance_alerts WHERE date(timestamp) BETWEEN :start_day AND :end_day "
+     "ORDER BY timestamp DESC LIMIT 100",
+     "SELECT * FROM daily_balance_alerts WHERE timestamp >= :start_day AND timestamp < :end_day "
+     "ORDER BY timestamp DESC LIMIT 100")
+]
+
+
+def _existing_tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def ensure_indexes(conn, database):
+    """
+    Create the INDEXES of one database key that are missing.
+
+    Tables, or columns, that don't exist yet are skipped. Runs PRAGMA optimize afterwards
+    so the planner has statistics for new indexes. Returns the names of the
+    indexes created.
+    """
+    tables = _existing_tables(conn)
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    created = []
+    for table, name, columns in INDEXES.get(database, []):
+        if table in tables and name not in existing:
+            # Columns added by a later schema version may not exist yet
+            table_columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if not all(column.strip() in table_columns for column in columns.split(",")):
+                continue
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+            created.append(name)
+    if created:
+        conn.execute("PRAGMA optimize")
+        logger.info(f"Created indexes: {', '.join(created)}")
+    conn.commit()
+    return created
+
+
+def migrate(db_file, database):
+    """Open db_file and create the missing indexes of a database key"""
+    conn = db_pool.connect(db_file)
+    try:
+        return ensure_indexes(conn, database)
+    finally:
+        conn.close()
+
+
+def explain(conn, query):
+    """Return the EXPLAIN QUERY PLAN detail lines of a query, binding NULLs to its parameters"""
+    names = re.findall(r"[:@$](\w+)", query)
+    if names:
+        params = {name: None for name in names}
+    else:
+        params = [None] * query.count("?")
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def plan_issues(plan, query=""):
+    """
+    Return the plan lines that read a whole table or sort rows in a temp B-tree.
+
+    Scans of SMALL_TABLES and covering-index scans are not flagged, nor are
+    ordered index walks in a query with LIMIT and no GROUP BY, which stop
+    after the limit. Sorts of grouped results are expected and not flagged.
+    """
+    grouped = re.search(r"\bGROUP\s+BY\b", query, re.IGNORECASE) is not None
+    bounded = re.search(r"\bLIMIT\b", query, re.IGNORECASE) is not None and not grouped
+    issues = []
+    for detail in plan:
+        scan = re.match(r"SCAN (\w+)", detail)
+        if scan:
+            if scan.group(1) in SMALL_TABLES or "COVERING INDEX" in detail or "CONSTANT ROW" in detail:
+                continue
+            if bounded and "USING INDEX" in detail:
+                continue
+            issues.append(detail)
+        elif detail.startswith("USE TEMP B-TREE FOR ORDER BY") and not grouped:
+            issues.append(detail)
+    return issues
+
+
+def audit(databases=DATABASES, queries=QUERIES):
+    """
+    Explain every registered query against its database.
+
+    Returns one dict per query with database, name, plan, issues and error
+    (set when the query could not be planned, e.g. its table is missing).
+    """
+    results = []
+    for database, name, query in queries:
+        result = {"database": database, "name": name, "plan": [], "issues": [], "error": None}
+        try:
+            conn = db_pool.connect(databases[database])
+            try:
+                result["plan"] = explain(conn, query)
+            finally:
+                conn.close()
+            result["issues"] = plan_issues(result["plan"], query)
+        except sqlite3.Error as e:
+            result["error"] = str(e)
+        results.append(result)
+    return results
+
+
+def _time_query(conn, query, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(query, params).fetchall()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], rows
+
+
+def benchmark(databases=DATABASES, benchmarks=BENCHMARKS, repeat=5):
+    """
+    Run each before/after pair of BENCHMARKS and compare plans and timings.
+
+    Returns one dict per pair with database, name, before_plan, after_plan,
+    before_ms, after_ms (median of repeat runs), same_result and error.
+    """
+    results = []
+    for database, name, params_query, before, after in benchmarks:
+        result = {"database": database, "name": name, "error": None}
+        try:
+            conn = db_pool.connect(databases[database])
+            try:
+                cursor = conn.execute(params_query)
+                params = dict(zip([col[0] for col in cursor.description], cursor.fetchone()))
+                result["before_plan"] = explain(conn, before)
+                result["after_plan"] = explain(conn, after)
+                before_seconds, before_rows = _time_query(conn, before, params, repeat)
+                after_seconds, after_rows = _time_query(conn, after, params, repeat)
+            finally:
+                conn.close()
+            result["before_ms"] = before_seconds * 1000
+            result["after_ms"] = after_seconds * 1000
+            result["same_result"] = before_rows == after_rows
+        except sqlite3.Error as e:
+            result["error"] = str(e)
+        results.append(result)
+    return results
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Provision indexes and audit query plans")
+    parser.add_argument("--audit", action="store_true", help="Only audit, don't create indexes")
+    parser.add_argument("--verbose", action="store_true", help="Print the full plan of every query")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare the old function-wrapped date filters with their sargable rewrites")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        for result in benchmark():
+            label = f"[{result['database']}] {result['name']}"
+            if result["error"]:
+                print(f"SKIP  {label}: {result['error']}")
+                continue
+            print(label + ("" if result["same_result"] else "  (results differ)"))
+            print(f"    before {result['before_ms']:9.2f} ms  {'; '.join(result['before_plan'])}")
+            print(f"    after  {result['after_ms']:9.2f} ms  {'; '.join(result['after_plan'])}")
+        return 0
+
+    if not args.audit:
+        for database, db_file in DATABASES.items():
+            created = migrate(db_file, database)
+            print(f"{db_file}: {len(created)} index(es) created" + (f" ({', '.join(created)})" if created else ""))
+
+    flagged = 0
+    for result in audit():
+        label = f"[{result['database']}] {result['name']}"
+        if result["error"]:
+            print(f"SKIP  {label}: {result['error']}")
+            continue
+        if result["issues"]:
+            flagged += 1
+            print(f"SCAN  {label}")
+            for issue in result["issues"]:
+                print(f"        {issue}")
+        else:
+            print(f"OK    {label}")
+        if args.verbose:
+            for detail in result["plan"]:
+                print(f"        | {detail}")
+
+    print(f"{flagged} quer{'y' if flagged == 1 else 'ies'} with full scans or sorts")
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
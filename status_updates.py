@@ -0,0 +1,64 @@
+"""
+Bulk status updates for the review tables.
+
+The fraud history editor and the alert manager change the status of many
+rows at once. changed_rows finds the edited rows by comparing whole columns
+instead of looping over rows, and apply_updates writes them with a single
+executemany in one transaction, so a bulk triage of thousands of rows is one
+commit, and a row that violates a constraint leaves none of them applied.
+
+    updates = status_updates.changed_rows(original_df, edited_df, key="transaction_id")
+    status_updates.apply_updates(conn, "fraud_detection_results", updates, key="transaction_id")
+"""
+import logging
+
+import pandas as pd
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+
+def changed_rows(original, edited, key="id", column="status"):
+    """
+    Rows of edited whose column differs from the original row with the same key.
+
+    Returns a DataFrame of key and column, in edited order. Rows of edited
+    missing from original count as changed; NaN equals NaN.
+    """
+    before = original.drop_duplicates(key).set_index(key)[column].reindex(edited[key]).to_numpy()
+    after = edited[column].to_numpy()
+    differs = (before != after) & ~(pd.isna(before) & pd.isna(after))
+    return edited.loc[differs, [key, column]].reset_index(drop=True)
+
+
+def apply_updates(conn, table, updates, key="id", column="status"):
+    """
+    Write updates (key and column values) to table in one transaction.
+
+    Returns the number of rows updated. Any error rolls the whole batch back
+    and is raised.
+    """
+    if updates is None or len(updates) == 0:
+        return 0
+    values = updates[column].astype(object).where(updates[column].notna(), None)
+    params = list(zip(values.tolist(), updates[key].tolist()))
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(f"UPDATE {table} SET {column} = ? WHERE {key} = ?", params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(f"Updated {column} of {cursor.rowcount} rows in {table}")
+    return cursor.rowcount
+
+
+def set_status(db_file, table, ids, status, key="id", column="status"):
+    """Set the same status on every row of table whose key is in ids"""
+    updates = pd.DataFrame({key: list(ids), column: status})
+    conn = db_pool.connect(db_file)
+    try:
+        return apply_updates(conn, table, updates, key, column)
+    finally:
+        conn.close()